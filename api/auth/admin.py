@@ -0,0 +1,20 @@
+import hmac
+import os
+from typing import Optional
+from fastapi import Request, HTTPException
+
+# Shared secret for the debug/ops endpoints, sent as the X-Admin-Token header.
+# When unset those endpoints are disabled.
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+
+def is_admin(token: Optional[str]) -> bool:
+    return bool(ADMIN_TOKEN) and bool(token) and hmac.compare_digest(token, ADMIN_TOKEN)
+
+
+async def require_admin(request: Request):
+    """Dependency for ops endpoints; 404 when disabled so they are not discoverable."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin(request.headers.get("x-admin-token")):
+        raise HTTPException(status_code=403, detail="Admin token required")
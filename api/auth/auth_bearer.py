@@ -1,6 +1,11 @@
 from fastapi import Request, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from starlette.concurrency import run_in_threadpool
+import time
 from .auth_handler import verify_supabase_token
+from ..config import ratelimit
+from ..config.resilience import BackendUnavailable
+from ..observability.metrics import registry, route_template
 
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True):
@@ -11,22 +16,44 @@ class JWTBearer(HTTPBearer):
             if not credentials.scheme == "Bearer":
                 raise HTTPException(status_code=403, detail="Invalid authentication scheme.")
             
-            decoded_token = self.verify_jwt(credentials.credentials)
+            # Routes declare JWTBearer twice (dependencies=[...] and current_user),
+            # so reuse the verification done earlier in the same request
+            cached = getattr(request.state, "jwt_payload", None)
+            if cached and cached.get("_token") == credentials.credentials:
+                return dict(cached)
+
+            # Verification may call PocketBase (with retry sleeps) and the rate limiter takes a
+            # file lock, so both run on the threadpool rather than the event loop
+            decoded_token = await run_in_threadpool(
+                self.authenticate, credentials.credentials, request.method, route_template(request.scope))
             if not decoded_token:
                 raise HTTPException(status_code=403, detail="Invalid token or expired token.")
 
             # Include raw token so routes can forward it to PocketBase
             decoded_token["_token"] = credentials.credentials
-            return decoded_token
+            request.state.jwt_payload = decoded_token
+            return dict(decoded_token)
         else:
             raise HTTPException(status_code=403, detail="Invalid authorization code.")
 
+    def authenticate(self, token: str, method: str, path_template: str) -> dict:
+        """Verify the token, then charge the request to the user's rate limit; None if invalid."""
+        start = time.perf_counter()
+        decoded_token = self.verify_jwt(token)
+        registry.observe("auth_verify_duration_seconds", time.perf_counter() - start)
+        if decoded_token:
+            # Once per request (the cached path in __call__ skips it), per user and route class
+            ratelimit.check(decoded_token.get("id"), method, path_template)
+        return decoded_token
+
     def verify_jwt(self, token: str) -> dict:
         try:
             decoded_token = verify_supabase_token(token)
             if decoded_token is None:
                 return None
             return decoded_token
+        except BackendUnavailable:
+            raise
         except Exception as e:
             print(f"An error occurred: {e}")
             return None
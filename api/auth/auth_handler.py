@@ -23,41 +23,70 @@
 
 import json
 import base64
-import requests
-from fastapi import HTTPException
+import hashlib
+import time
+from ..config import resilience
+from ..config.cache import TOKEN_CACHE_TTL, token_cache
+from ..config.database import POCKETBASE_URL
+
+def decode_token_payload(token: str) -> dict:
+    """Decode the (unverified) JWT payload; None if the token is malformed.
+    PocketBase JWTs contain: id, type, collectionId, exp"""
+    parts = token.split(".")
+    if len(parts) != 3:
+        return None
+
+    # Decode payload (add padding if needed)
+    payload = parts[1]
+    payload += "=" * (-len(payload) % 4)
+    try:
+        decoded = json.loads(base64.urlsafe_b64decode(payload))
+    except ValueError:
+        return None
+    return decoded if isinstance(decoded, dict) else None
 
 def verify_pocketbase_token(token: str) -> dict:
     """PocketBase token verification - decode JWT and verify with PocketBase"""
     try:
-        # Decode the JWT payload to get the user ID
-        # PocketBase JWTs contain: id, type, collectionId, exp
-        parts = token.split(".")
-        if len(parts) != 3:
+        decoded = decode_token_payload(token)
+        if not decoded:
             return None
 
-        # Decode payload (add padding if needed)
-        payload = parts[1]
-        payload += "=" * (4 - len(payload) % 4)
-        decoded = json.loads(base64.urlsafe_b64decode(payload))
-
         user_id = decoded.get("id")
         if not user_id:
             return None
 
-        # Verify the token is still valid by calling PocketBase auth-refresh
-        response = requests.post(
-            "http://127.0.0.1:8090/api/collections/users/auth-refresh",
+        # Tokens are stored hashed: the cache file is readable on the box
+        cache_key = hashlib.sha256(token.encode()).hexdigest()
+        cached = token_cache.get(cache_key) if TOKEN_CACHE_TTL > 0 else None
+        if cached:
+            return dict(cached)
+
+        # Verify the token is still valid by calling PocketBase auth-refresh.
+        # It has no side effects, so it is retried like a read.
+        response = resilience.request(
+            "users", "POST",
+            f"{POCKETBASE_URL}/api/collections/users/auth-refresh",
+            idempotent=True,
             headers={"Authorization": f"Bearer {token}"}
         )
 
         if response.status_code == 200:
             user_data = response.json().get("record", {})
-            return {
+            user = {
                 "id": user_data.get("id", user_id),
                 "email": user_data.get("email", ""),
                 "role": "authenticated"
             }
+            # Never trust a cached answer past the token's own expiry
+            ttl = min(TOKEN_CACHE_TTL, float(decoded.get("exp", 0)) - time.time())
+            if ttl > 0:
+                token_cache.set(cache_key, user, ttl=ttl)
+            return user
         return None
+    except resilience.BackendUnavailable:
+        # PocketBase is down: answer 503, not "invalid token"
+        raise
     except Exception as e:
         print(f"Token verification error: {str(e)}")
         return None
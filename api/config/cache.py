@@ -0,0 +1,202 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Set, Tuple
+
+from .shared_cache import SharedCache
+
+# "shared" (SQLite file seen by every worker, see shared_cache.py) or "memory"
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "shared")
+
+
+class TTLCache:
+    """Small thread-safe in-process cache with per-entry expiry and a size bound."""
+
+    def __init__(self, ttl: float = 30.0, maxsize: int = 10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidation_failures = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return default
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def version(self, name: str) -> int:
+        return self._versions.get(name, 0)
+
+    def bump(self, name: str) -> bool:
+        """Invalidate entries that were stored under the previous version of `name`."""
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+        return True
+
+    def __len__(self):
+        return len(self._data)
+
+
+class SWRCache:
+    """Stale-while-revalidate on top of a TTLCache or SharedCache store.
+
+    Entries go fresh -> stale -> expired. get() says which: a stale entry is
+    still served while the caller refreshes it in the background, and an
+    expired one is only kept for get_expired() (serving through backend
+    errors). Keys are tuples whose second element is the collection. Each
+    entry records the collection's version when it was fetched, and
+    invalidate(collection) bumps that version, so older entries, and
+    refreshes that started before a write, stop counting. With a
+    SharedCache store the invalidation reaches every worker.
+    """
+
+    FRESH, STALE = "fresh", "stale"
+
+    def __init__(self, store, stale: float = 120.0):
+        self.store = store
+        self.ttl = store.ttl
+        self.stale = stale
+        self._refreshing: Set[tuple] = set()
+        # collection -> until when this worker neither serves nor stores it (a lost invalidation)
+        self._bypass: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+
+    @property
+    def invalidation_failures(self) -> int:
+        return self.store.invalidation_failures
+
+    def _bypassed(self, collection: str) -> bool:
+        until = self._bypass.get(collection)
+        if until is None:
+            return False
+        if until > time.time():
+            return True
+        self._bypass.pop(collection, None)
+        return False
+
+    def _entry(self, key: tuple) -> Optional[list]:
+        # [value, fresh_until (wall clock, comparable across workers), version]
+        if self._bypassed(key[1]):
+            return None
+        entry = self.store.get(key)
+        if entry is None or entry[2] != self.store.version(key[1]):
+            return None
+        return entry
+
+    def get(self, key: tuple) -> Tuple[Any, Optional[str]]:
+        """(value, FRESH | STALE), or (None, None) on a miss."""
+        entry = self._entry(key)
+        now = time.time()
+        if entry is None or entry[1] + self.stale < now:
+            self.misses += 1
+            return None, None
+        self.hits += 1
+        if entry[1] >= now:
+            return entry[0], self.FRESH
+        self.stale_hits += 1
+        return entry[0], self.STALE
+
+    def get_expired(self, key: tuple) -> Any:
+        """Whatever is still held for `key`, however old (for serving on backend errors)."""
+        entry = self._entry(key)
+        return entry[0] if entry else None
+
+    def generation(self, collection: str) -> int:
+        return self.store.version(collection)
+
+    def set(self, key: tuple, value: Any, ttl: Optional[float] = None, generation: Optional[int] = None):
+        """Store `value`; skipped if `generation` is given and the collection was invalidated since."""
+        ttl = self.ttl if ttl is None else ttl
+        if self._bypassed(key[1]):
+            return
+        current = self.generation(key[1])
+        if generation is not None and generation != current:
+            return
+        # Held for another stale window after it stops being served, for get_expired()
+        self.store.set(key, [value, time.time() + ttl, current], ttl=ttl + 2 * self.stale)
+
+    def start_refresh(self, key: tuple) -> bool:
+        """Claim the background refresh of `key`; False if one is already running."""
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            return True
+
+    def end_refresh(self, key: tuple):
+        with self._lock:
+            self._refreshing.discard(key)
+
+    def invalidate(self, collection: str):
+        if not self.store.bump(collection):
+            # Entries from before the write still look current: stop using them here until
+            # they could no longer be served anyway
+            with self._lock:
+                self._bypass[collection] = time.time() + self.ttl + 2 * self.stale
+
+    def clear(self):
+        self.store.clear()
+
+    def __len__(self):
+        return len(self.store)
+
+
+def make_cache(name: str, ttl: float, maxsize: int):
+    """A cache for `name`: shared by all workers (CACHE_BACKEND=shared, the default)
+    or private to this process (CACHE_BACKEND=memory)."""
+    if CACHE_BACKEND == "shared":
+        return SharedCache(name, ttl=ttl, maxsize=maxsize)
+    return TTLCache(ttl=ttl, maxsize=maxsize)
+
+
+# Positive ownership checks (collection, record_id, user_id) -> True.
+# Kept short so a record deleted through another worker stops resolving quickly.
+ownership_cache = make_cache("ownership", ttl=30.0, maxsize=20000)
+
+# List reads that opted in with Table.cached(): (subject, collection, *Table.query_key()) -> response.
+# Invalidated per collection by writes made through the client in any worker.
+read_cache = SWRCache(
+    make_cache("reads", ttl=float(os.environ.get("READ_CACHE_TTL", "10")),
+               maxsize=int(os.environ.get("READ_CACHE_SIZE", "2000"))),
+    stale=float(os.environ.get("READ_CACHE_STALE", "120")),
+)
+
+# Tag posting lists (user_id, tag) -> [user's version, session ids], see services/session_tags.py.
+# A user's entries are dropped together by bumping the user's version.
+tag_index = make_cache("tag_index", ttl=float(os.environ.get("TAG_INDEX_TTL", "300")), maxsize=5000)
+
+# Tokens PocketBase confirmed valid: sha256(token) -> user. 0 disables.
+TOKEN_CACHE_TTL = float(os.environ.get("TOKEN_CACHE_TTL", "60"))
+token_cache = make_cache("tokens", ttl=TOKEN_CACHE_TTL, maxsize=20000)
@@ -0,0 +1,155 @@
+"""
+Response compression.
+
+CompressionMiddleware compresses single-body responses of compressible
+content types once they reach COMPRESS_MIN_BYTES. It uses brotli when the
+client accepts it and the module is installed, and gzip otherwise. The level
+depends on the route class (ratelimit.route_class). Small, frequent live and
+write responses get the fastest setting, because latency matters more there
+than ratio. The big heavy lists get a stronger setting, which pays off on
+mobile links. Other content types (images) and responses that already carry
+a Content-Encoding pass through untouched, still streamed.
+
+Precompressed holds an immutable JSON payload that was serialised and
+compressed once, at the highest levels, and picks the variant per request.
+It also carries an ETag and answers a matching If-None-Match with 304.
+
+brotli is optional; without it only gzip is offered.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+from starlette.datastructures import Headers, MutableHeaders
+
+from .ratelimit import parse_limits, route_class
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get("COMPRESS_MIN_BYTES", "1024"))
+# route class -> (gzip level 1-9, brotli quality 0-11); COMPRESS_LEVELS="heavy=9:6" overrides
+COMPRESS_LEVELS: Dict[str, Tuple[float, float]] = {
+    **parse_limits("live=1:1,write=1:1,read=5:4,heavy=6:5"),
+    **parse_limits(os.environ.get("COMPRESS_LEVELS", "")),
+}
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for an Accept-Encoding header: "br", "gzip" or None."""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    if brotli is not None and accepted.get("br", wildcard) > 0:
+        return "br"
+    if accepted.get("gzip", wildcard) > 0:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+
+class CompressionMiddleware:
+    def __init__(self, app, minimum_size: int = COMPRESS_MIN_BYTES):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding", ""))
+        gzip_level, br_quality = COMPRESS_LEVELS.get(route_class(scope["method"], scope["path"]),
+                                                     COMPRESS_LEVELS["read"])
+        level = int(br_quality if encoding == "br" else gzip_level)
+        start = None
+        compressible = False
+        chunks = []
+
+        async def send_compressed(message):
+            nonlocal start, compressible
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=message["headers"])
+                compressible = (headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                                and "content-encoding" not in headers)
+                if compressible:
+                    start = message
+                else:
+                    await send(message)
+                return
+            if not compressible or message["type"] != "http.response.body":
+                await send(message)
+                return
+            # Compressible bodies are JSON/text built in memory anyway; collect every chunk
+            # (the @app.middleware layers re-chunk them) and compress the whole body once
+            chunks.append(message.get("body", b""))
+            if message.get("more_body"):
+                return
+            body = b"".join(chunks)
+            headers = MutableHeaders(raw=start["headers"])
+            if len(body) >= self.minimum_size:
+                if "accept-encoding" not in headers.get("vary", "").lower():
+                    headers.add_vary_header("Accept-Encoding")
+                if encoding:
+                    body = compress(body, encoding, level)
+                    headers["Content-Encoding"] = encoding
+                    headers["Content-Length"] = str(len(body))
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+
+class Precompressed:
+    """A JSON payload serialised once and compressed once per supported encoding."""
+
+    def __init__(self, content: Any, headers: Optional[Dict[str, str]] = None):
+        # Same serialisation as JSONResponse
+        self.body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                               separators=(",", ":")).encode("utf-8")
+        # Weak: the gzip and brotli variants are different bytes of the same content
+        self.etag = f'W/"{hashlib.sha256(self.body).hexdigest()[:32]}"'
+        self.headers = {"Vary": "Accept-Encoding", "ETag": self.etag, **(headers or {})}
+        self.variants: Dict[str, bytes] = {}
+        if len(self.body) >= COMPRESS_MIN_BYTES:
+            self.variants["gzip"] = compress(self.body, "gzip", 9)
+            if brotli is not None:
+                self.variants["br"] = compress(self.body, "br", 11)
+
+    def not_modified(self, request: Request) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if not if_none_match:
+            return False
+        tags = {t.strip() for t in if_none_match.split(",")}
+        # Weak comparison, as If-None-Match requires
+        return "*" in tags or self.etag in tags or self.etag[2:] in tags
+
+    def response(self, request: Request, status_code: int = 200) -> Response:
+        if status_code == 200 and self.not_modified(request):
+            return Response(status_code=304, headers=self.headers)
+        encoding = negotiate(request.headers.get("accept-encoding", ""))
+        if encoding in self.variants:
+            return Response(self.variants[encoding], status_code=status_code, media_type="application/json",
+                            headers={**self.headers, "Content-Encoding": encoding})
+        return Response(self.body, status_code=status_code, media_type="application/json", headers=self.headers)
@@ -1,77 +1,609 @@
-import requests
-from typing import Dict, Any, List, Optional
+import base64
+import copy
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Any, List, Optional, Tuple
+from . import resilience
+from .cache import ownership_cache, read_cache
+from .multipart import MultipartStream
+
+POCKETBASE_URL = os.environ.get("POCKETBASE_URL", "http://127.0.0.1:8090")
+PB_URL = f"{POCKETBASE_URL}/api/collections"
+
+# Superuser login for the collections no user token may reach (image_blobs, see schema.api_rules)
+POCKETBASE_ADMIN_EMAIL = os.environ.get("POCKETBASE_ADMIN_EMAIL", "")
+POCKETBASE_ADMIN_PASSWORD = os.environ.get("POCKETBASE_ADMIN_PASSWORD", "")
+# Log in again this long before the superuser token expires
+SERVICE_TOKEN_MARGIN = 300
+
+# "pocketbase" (default) or "sqlite" for the embedded backend in sqlite_backend.py
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "pocketbase")
+
+# PocketBase's largest perPage; unbounded list reads fetch pages of this size
+PER_PAGE = 1000
+# Page sizes for the cursor-paginated list endpoints
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# Per-request memo of list reads: {(collection, *Table.query_key()): response}.
+# None outside of a request_scope(), in which case every read goes to the backend.
+_request_memo: ContextVar[Optional[dict]] = ContextVar("pocketbase_request_memo", default=None)
+
+
+@contextmanager
+def request_scope():
+    """Collapse identical reads issued while handling a single request."""
+    reset_token = _request_memo.set({})
+    try:
+        yield
+    finally:
+        _request_memo.reset(reset_token)
+
+
+# Callbacks run after every table operation with an event dict:
+# collection, op, filter, shape, seconds, rows, bytes, error, memo_hit, cache, backend.
+# memo_hit is set when no backend call was made; cache then names what answered
+# ("request_memo" or "read_cache"), and is None for backend calls.
+_observers: List[Callable[[dict], None]] = []
+
+
+def add_observer(fn: Callable[[dict], None]):
+    """Register `fn` to be called after every table operation (metrics, tracing)."""
+    if fn not in _observers:
+        _observers.append(fn)
+
+
+def _notify(event: dict):
+    for fn in _observers:
+        try:
+            fn(event)
+        except Exception as e:
+            print(f"Table observer error: {e}")
+
+
+def _forget_collection(table_name: str):
+    read_cache.invalidate(table_name)
+    memo = _request_memo.get()
+    if memo:
+        for key in [k for k in memo if k[0] == table_name]:
+            del memo[key]
+
+
+# Background refreshes of stale read_cache entries
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="read-cache-refresh")
+
+
+def _token_subject(token: Optional[str]) -> str:
+    """Whose data a cached read is: the token's user id ("" when anonymous)."""
+    if not token:
+        return ""
+    from ..auth.auth_handler import decode_token_payload
+    payload = decode_token_payload(token) or {}
+    return payload.get("id") or token
+
+
+def _literal(value: Any) -> str:
+    """A value as a PocketBase filter literal."""
+    if isinstance(value, bool) or value is None:
+        return json.dumps(value)
+    if isinstance(value, (int, float)):
+        return repr(value)
+    return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def sort_value(item: dict, field: str) -> Any:
+    """What `item` sorts by for a sort field; "a|b" means a, or b where a is blank (in-memory only)."""
+    for name in field.lstrip("+-").split("|"):
+        value = item.get(name)
+        if value is not None and value != "":
+            return value
+    return ""
+
+
+def encode_cursor(item: dict, sort: List[str]) -> str:
+    """An opaque cursor for the row after `item` in `sort` order."""
+    payload = {"s": sort, "k": [sort_value(item, f) for f in sort]}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: List[str]) -> List[Any]:
+    """The keyset values in `cursor`; ValueError if it is malformed or from another sort order."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        keys = payload["k"]
+        same_sort = payload["s"] == sort
+    except (ValueError, TypeError, KeyError):
+        raise ValueError("Invalid cursor")
+    if not same_sort or not isinstance(keys, list) or len(keys) != len(sort):
+        raise ValueError("Cursor does not match this query's sort order")
+    return keys
+
+
+def keyset_sort(sort: List[str]) -> List[str]:
+    """`sort` with "id" appended (in the direction of the last field) so every row has a unique key."""
+    if any(f.lstrip("+-") == "id" for f in sort):
+        return list(sort)
+    return list(sort) + ["-id" if sort and sort[-1].startswith("-") else "id"]
+
+
+def sort_items(items: List[dict], sort: List[str]) -> List[dict]:
+    for field in reversed(sort):
+        items = sorted(items, key=lambda r: sort_value(r, field), reverse=field.startswith("-"))
+    return items
+
+
+def page_items(items: List[dict], sort: List[str], limit: Optional[int] = None,
+               cursor: Optional[str] = None) -> dict:
+    """Table.page() over rows already in memory, for reads the backend could not order or filter.
+
+    Same sort fields, cursors and result shape, so a client can't tell which one served a page.
+    """
+    limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    sort = keyset_sort(sort)
+    items = sort_items(items, sort)
+    if cursor:
+        keys = decode_cursor(cursor, sort)
+        items = [r for r in items if _after(r, keys, sort)]
+    next_cursor = encode_cursor(items[limit - 1], sort) if len(items) > limit else None
+    return {"items": items[:limit], "next_cursor": next_cursor}
+
+
+def _after(item: dict, keys: List[Any], sort: List[str]) -> bool:
+    for field, key in zip(sort, keys):
+        value = sort_value(item, field)
+        key = "" if key is None else key
+        if value != key:
+            return value < key if field.startswith("-") else value > key
+    return False
+
+
+_service_lock = threading.Lock()
+_service_token = {"token": None, "expires": 0.0}
+
+
+def service_token() -> str:
+    """A superuser token for POCKETBASE_ADMIN_EMAIL, shared by the process until shortly before it expires."""
+    with _service_lock:
+        if _service_token["token"] and time.time() < _service_token["expires"]:
+            return _service_token["token"]
+        if not (POCKETBASE_ADMIN_EMAIL and POCKETBASE_ADMIN_PASSWORD):
+            raise ValueError("POCKETBASE_ADMIN_EMAIL and POCKETBASE_ADMIN_PASSWORD must be set "
+                             "to reach server-only collections")
+        response = resilience.request(
+            "admins", "POST", f"{POCKETBASE_URL}/api/admins/auth-with-password", idempotent=True,
+            json={"identity": POCKETBASE_ADMIN_EMAIL, "password": POCKETBASE_ADMIN_PASSWORD},
+        )
+        if response.status_code != 200:
+            raise ValueError(f"PocketBase superuser login failed: HTTP {response.status_code}")
+        from ..auth.auth_handler import decode_token_payload
+        token = response.json()["token"]
+        expires = float((decode_token_payload(token) or {}).get("exp", 0))
+        _service_token.update(token=token, expires=expires - SERVICE_TOKEN_MARGIN)
+        return token
 
-PB_URL = "http://127.0.0.1:8090/api/collections"
 
 class PocketBaseClient:
-    def __init__(self):
+    def __init__(self, backend: str = STORAGE_BACKEND):
         self.base_url = PB_URL
+        self.backend = backend
 
     def table(self, table_name: str, token: str = None):
+        if self.backend == "sqlite":
+            from .sqlite_backend import SQLiteTable
+            return SQLiteTable(table_name, token=token)
         return PocketBaseTable(self.base_url, table_name, token=token)
 
-class PocketBaseTable:
-    def __init__(self, base_url: str, table_name: str, token: str = None):
-        self.url = f"{base_url}/{table_name}/records"
-        self.filters: List[str] = []
+    def service_table(self, table_name: str):
+        """A table opened with the server's own credentials, for server-only collections."""
+        if self.backend == "sqlite":
+            from .sqlite_backend import SQLiteTable
+            return SQLiteTable(table_name, service=True)
+        return PocketBaseTable(self.base_url, table_name, token=service_token())
+
+    def file_url(self, collection: str, record_id: str, filename: str) -> str:
+        """Where a client downloads a stored file: PocketBase itself, or this app for SQLite."""
+        path = f"/api/files/{collection}/{record_id}/{filename}"
+        return path if self.backend == "sqlite" else f"{POCKETBASE_URL}{path}"
+
+    def owns(self, table_name: str, record_id: str, user_id: str, token: str = None,
+             owner_field: str = "user_id") -> bool:
+        """Ownership guard backed by a short cross-request cache of positive answers."""
+        key = (table_name, record_id, user_id)
+        if ownership_cache.get(key):
+            return True
+        result = self.table(table_name, token=token).eq("id", record_id).eq(owner_field, user_id).execute()
+        if result.get("items"):
+            ownership_cache.set(key, True)
+            return True
+        return False
+
+    def forget_owner(self, table_name: str, record_id: str, user_id: str):
+        ownership_cache.delete((table_name, record_id, user_id))
+
+
+class Table:
+    """Query builder shared by the storage backends.
+
+    Filters are kept as (field, op, values) conditions, and the sort fields,
+    keyset and row limit alongside them, so each backend can translate them;
+    subclasses implement the _list/_insert/_update/_delete/_upload primitives
+    and return PocketBase-shaped results ({"items": [...]}).
+    """
+
+    backend = "base"
+
+    def __init__(self, table_name: str, token: str = None):
+        self.table_name = table_name
+        self.conditions: List[Tuple[str, str, List[Any]]] = []
         self.columns = "*"
+        # PocketBase sort fields ("-session_date"), the keyset to start after, and a row limit
+        self.sort: List[str] = []
+        self.seek: Optional[List[Any]] = None
+        self.row_limit: Optional[int] = None
         self.token = token
-
-    def _auth_headers(self):
-        if self.token:
-            return {"Authorization": f"Bearer {self.token}"}
-        return {}
+        # Seconds a list read may be served from read_cache; None = not cached
+        self.cache_ttl: Optional[float] = None
+        # Bytes read from the backend by the current operation, for observers
+        self.response_bytes = 0
 
     def select(self, columns: str = "*"):
         self.columns = columns
         return self
 
+    def cached(self, ttl: Optional[float] = None):
+        """Serve this list read from the shared read cache (stale-while-revalidate).
+
+        For read-mostly data: a fresh hit skips PocketBase, a stale hit is
+        returned at once and refreshed in the background, and if PocketBase
+        fails the last cached value is served instead. Writes through this
+        client invalidate the collection's entries.
+        """
+        self.cache_ttl = read_cache.ttl if ttl is None else ttl
+        return self
+
     def eq(self, field: str, value: str):
-        self.filters.append(f'{field}="{value}"')
+        self.conditions.append((field, "=", [value]))
+        return self
+
+    def in_(self, field: str, values: List[str]):
+        """Match any of `values`."""
+        self.conditions.append((field, "in", list(values)))
+        return self
+
+    def lte(self, field: str, value: Any):
+        """Match values less than or equal to `value`."""
+        self.conditions.append((field, "<=", [value]))
         return self
 
+    def order(self, *fields: str):
+        """Sort by PocketBase sort fields, e.g. order("-session_date", "-id")."""
+        self.sort = list(fields)
+        return self
+
+    def limit(self, rows: int):
+        self.row_limit = rows
+        return self
+
+    def after(self, values: List[Any]):
+        """Only rows strictly after the row whose sort fields hold `values` (keyset pagination)."""
+        if len(values) != len(self.sort):
+            raise ValueError("Keyset needs one value per sort field")
+        self.seek = list(values)
+        return self
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+        """One page of an ordered read: {"items": [...], "next_cursor": str or None}.
+
+        `cursor` is the next_cursor of the previous page. "id" is added as the
+        last sort field so the keyset is unique; the backend reads only this
+        page (plus one row to tell whether another follows), however many
+        rows precede it.
+        """
+        limit = min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+        self.sort = keyset_sort(self.sort)
+        if cursor:
+            self.after(decode_cursor(cursor, self.sort))
+        items = self.limit(limit + 1).execute().get("items", [])
+        next_cursor = encode_cursor(items[limit - 1], self.sort) if len(items) > limit else None
+        return {"items": items[:limit], "next_cursor": next_cursor}
+
+    def sort_string(self) -> str:
+        return ",".join(self.sort)
+
+    def seek_terms(self) -> List[List[Tuple[str, str, Any]]]:
+        """The keyset as OR-ed AND-groups of (field, op, value): (a > x) || (a = x && b > y) ..."""
+        if self.seek is None:
+            return []
+        groups = []
+        for i, (field, value) in enumerate(zip(self.sort, self.seek)):
+            terms = [(f.lstrip("+-"), "=", v) for f, v in zip(self.sort[:i], self.seek[:i])]
+            terms.append((field.lstrip("+-"), "<" if field.startswith("-") else ">", value))
+            groups.append(terms)
+        return groups
+
+    def filter_string(self) -> str:
+        """The conditions in PocketBase filter syntax (also the memo key)."""
+        parts = []
+        for field, op, values in self.conditions:
+            clauses = [f'{field}={_literal(value)}' for value in values]
+            if op == "=":
+                parts.append(clauses[0])
+            elif op == "<=":
+                parts.append(f"{field}<={_literal(values[0])}")
+            else:
+                # PocketBase has no IN operator, so OR the equalities
+                parts.append(f"({' || '.join(clauses)})" if clauses else 'id=""')
+        groups = self.seek_terms()
+        if groups:
+            parts.append("(" + " || ".join(
+                "(" + " && ".join(f"{field}{op}{_literal(value)}" for field, op, value in terms) + ")"
+                for terms in groups) + ")")
+        return " && ".join(parts)
+
+    def query_shape(self) -> str:
+        """The filter without its values, e.g. 'user_id=? && section_id IN(?)'."""
+        shape = " && ".join(f"{field} IN(?)" if op == "in" else f"{field}{op}?"
+                            for field, op, _ in self.conditions)
+        if self.sort:
+            shape += f" sort {self.sort_string()}"
+        if self.seek is not None:
+            shape += " after ?"
+        if self.row_limit:
+            shape += " limit ?"
+        return shape.strip()
+
+    def query_key(self) -> tuple:
+        """Everything that determines the result of a list read, for the memo and read_cache."""
+        return self.filter_string(), self.columns, self.sort_string(), self.row_limit
+
+    def _observed(self, op: str, call: Callable, *args):
+        """Run a backend primitive and report it to the observers."""
+        if not _observers:
+            return call(*args)
+        self.response_bytes = 0
+        start = time.perf_counter()
+        result, error = None, None
+        try:
+            result = call(*args)
+            return result
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            data = result[0] if isinstance(result, tuple) else result
+            if error is not None:
+                error_name = type(error).__name__
+            elif isinstance(data, dict) and data.get("error") or isinstance(result, tuple) and not result[1]:
+                # Backend answered with an error payload rather than raising
+                error_name = "BackendError"
+            else:
+                error_name = None
+            _notify({
+                "collection": self.table_name,
+                "op":         op,
+                "filter":     self.filter_string(),
+                "shape":      self.query_shape(),
+                "seconds":    time.perf_counter() - start,
+                "rows":       len(data.get("items", [])) if isinstance(data, dict) else 0,
+                "bytes":      self.response_bytes,
+                "error":      error_name,
+                "memo_hit":   False,
+                "cache":      None,
+                "backend":    self.backend,
+            })
+
+    def _notify_hit(self, data: dict, cache: str):
+        if _observers:
+            _notify({"collection": self.table_name, "op": "list", "filter": self.filter_string(),
+                     "shape": self.query_shape(), "seconds": 0.0,
+                     "rows": len(data.get("items", [])), "bytes": 0, "error": None,
+                     "memo_hit": True, "cache": cache, "backend": self.backend})
+
     def execute(self):
-        filter_str = " && ".join(self.filters) if self.filters else ""
-        params = {"perPage": 1000}
+        memo = _request_memo.get()
+        key = (self.table_name, *self.query_key())
+        if memo is not None and key in memo:
+            # Routes sort and rewrite items in place, so hand out a private copy
+            data = copy.deepcopy(memo[key])
+            self._notify_hit(data, "request_memo")
+            return data
+        if self.cache_ttl is not None:
+            data, cacheable = self._cached_list()
+        else:
+            data, cacheable = self._observed("list", self._list)
+        if memo is not None and cacheable:
+            memo[key] = copy.deepcopy(data)
+        return data
+
+    def _cached_list(self) -> Tuple[dict, bool]:
+        key = (_token_subject(self.token), self.table_name, *self.query_key())
+        value, state = read_cache.get(key)
+        if state is not None:
+            self._notify_hit(value, "read_cache")
+            if state == read_cache.STALE and read_cache.start_refresh(key):
+                _refresh_pool.submit(copy.copy(self)._refresh, key)
+            return copy.deepcopy(value), True
+        generation = read_cache.generation(self.table_name)
+        try:
+            data, cacheable = self._observed("list", self._list)
+        except Exception as e:
+            fallback = read_cache.get_expired(key)
+            if fallback is None:
+                raise
+            print(f"Serving expired {self.table_name} read after backend error: {e}")
+            return copy.deepcopy(fallback), True
+        if cacheable:
+            read_cache.set(key, copy.deepcopy(data), ttl=self.cache_ttl, generation=generation)
+        return data, cacheable
+
+    def _refresh(self, key: tuple):
+        # Read before the backend, as in _cached_list(): a write that lands meanwhile invalidates after
+        # committing, so this result is refused rather than stored as fresh
+        generation = read_cache.generation(self.table_name)
+        try:
+            data, cacheable = self._observed("list", self._list)
+            if cacheable:
+                read_cache.set(key, data, ttl=self.cache_ttl, generation=generation)
+        except Exception as e:
+            print(f"Background refresh of {self.table_name} failed: {e}")
+        finally:
+            read_cache.end_refresh(key)
+
+    def _write(self, op: str, fn, *args):
+        try:
+            return self._observed(op, fn, *args)
+        finally:
+            # Only once the write has landed (or failed part way): a read that started before
+            # this point then either saw the new rows or had its result refused by read_cache.set()
+            _forget_collection(self.table_name)
+
+    def insert(self, data: Dict[str, Any]):
+        return self._write("insert", self._insert, data)
+
+    def update(self, data: Dict[str, Any]):
+        record_id = data.pop("id", None)
+        if not record_id:
+            raise ValueError("Update needs 'id' field")
+        return self._write("update", self._update, record_id, data)
+
+    def upload(self, data: Dict[str, Any], file_field: str, upload, record_id: str = None):
+        """Create (or patch `record_id`) with a file streamed from `upload`.
+
+        `upload` is anything with filename, content_type, fileobj and size,
+        e.g. api.services.images.ImageUpload.
+        """
+        return self._write("upload", self._upload, data, file_field, upload, record_id)
+
+    def delete(self):
+        if not self.conditions:
+            raise ValueError("Delete needs filter")
+        return self._write("delete", self._delete)
+
+    def download(self, record: Dict[str, Any], file_field: str, out) -> bool:
+        """Write the file stored in `record[file_field]` to `out`; False if the record has none."""
+        if not record.get(file_field):
+            return False
+        return self._observed("download", self._download, record["id"], record[file_field], out)
+
+    def _list(self) -> Tuple[dict, bool]:
+        raise NotImplementedError
+
+    def _insert(self, data: Dict[str, Any]) -> dict:
+        raise NotImplementedError
+
+    def _update(self, record_id: str, data: Dict[str, Any]) -> dict:
+        raise NotImplementedError
+
+    def _upload(self, data: Dict[str, Any], file_field: str, upload, record_id: Optional[str]) -> dict:
+        raise NotImplementedError
+
+    def _delete(self) -> dict:
+        raise NotImplementedError
+
+    def _download(self, record_id: str, filename: str, out) -> bool:
+        raise NotImplementedError
+
+
+class PocketBaseTable(Table):
+    backend = "pocketbase"
+
+    def __init__(self, base_url: str, table_name: str, token: str = None):
+        super().__init__(table_name, token=token)
+        self.url = f"{base_url}/{table_name}/records"
+
+    def _auth_headers(self):
+        if self.token:
+            return {"Authorization": f"Bearer {self.token}"}
+        return {}
+
+    def _send(self, method: str, url: str, **kwargs):
+        kwargs.setdefault("headers", self._auth_headers())
+        response = resilience.request(self.table_name, method, url, **kwargs)
+        self.response_bytes += len(response.content)
+        return response
+
+    @staticmethod
+    def _json(response) -> dict:
+        try:
+            return response.json()
+        except ValueError:
+            raise ValueError(f"PocketBase returned HTTP {response.status_code} with a non-JSON body: "
+                             f"{response.text[:200]!r}")
+
+    def _list(self):
+        filter_str = self.filter_string()
+        params = {"perPage": min(self.row_limit or PER_PAGE, PER_PAGE)}
         if filter_str:
             params["filter"] = filter_str
-        response = requests.get(self.url, params=params, headers=self._auth_headers())
-        data = response.json()
+        if self.sort:
+            params["sort"] = self.sort_string()
+        if self.columns != "*":
+            params["fields"] = self.columns
+        if self.row_limit:
+            # No COUNT(*) over the whole match for a single page
+            params["skipTotal"] = 1
+        response = self._send("GET", self.url, params=params)
+        data = self._json(response)
         if "items" not in data:
             data["items"] = []
-        return data
+        # Unbounded reads follow the pages instead of stopping at the first PER_PAGE rows
+        page = 1
+        while not self.row_limit and response.status_code == 200 and page < data.get("totalPages", 1):
+            page += 1
+            response = self._send("GET", self.url, params={**params, "page": page})
+            data["items"].extend(self._json(response).get("items", []))
+        return data, response.status_code == 200
 
-    def insert(self, data: Dict[str, Any]):
-        response = requests.post(self.url, json=data, headers=self._auth_headers())
-        result = response.json()
+    def _created(self, result: dict):
         if "id" in result:
             return {"items": [result]}
         msg = result.get("message", "Unknown PocketBase error")
         fields = result.get("data", {})
         raise ValueError(f"{msg} | fields: {fields}")
 
-    def update(self, data: Dict[str, Any]):
-        record_id = data.pop("id", None)
-        if not record_id:
-            raise ValueError("Update needs 'id' field")
-        response = requests.patch(f"{self.url}/{record_id}", json=data, headers=self._auth_headers())
-        result = response.json()
+    def _insert(self, data):
+        return self._created(self._json(self._send("POST", self.url, json=data)))
+
+    def _update(self, record_id, data):
+        result = self._json(self._send("PATCH", f"{self.url}/{record_id}", json=data))
         if "id" in result:
             return {"items": [result]}
         return {"items": [], "error": result}
 
-    def delete(self):
-        filter_str = " && ".join(self.filters) if self.filters else ""
-        if not filter_str:
-            raise ValueError("Delete needs filter")
-        list_response = requests.get(self.url, params={"filter": filter_str}, headers=self._auth_headers())
-        records = list_response.json().get("items", [])
+    def _upload(self, data, file_field, upload, record_id):
+        body = MultipartStream(data, file_field, upload.filename, upload.content_type,
+                               upload.fileobj, upload.size)
+        headers = {**self._auth_headers(), "Content-Type": body.content_type}
+        if record_id:
+            response = self._send("PATCH", f"{self.url}/{record_id}", data=body, headers=headers)
+        else:
+            response = self._send("POST", self.url, data=body, headers=headers)
+        return self._created(self._json(response))
+
+    def _delete(self):
+        list_response = self._send("GET", self.url, params={"filter": self.filter_string()})
+        records = self._json(list_response).get("items", [])
         deleted = []
         for record in records:
-            del_response = requests.delete(f"{self.url}/{record['id']}", headers=self._auth_headers())
+            del_response = self._send("DELETE", f"{self.url}/{record['id']}")
             if del_response.status_code == 204:
                 deleted.append(record)
         return {"items": deleted}
 
+    def _download(self, record_id, filename, out):
+        response = self._send("GET", f"{POCKETBASE_URL}/api/files/{self.table_name}/{record_id}/{filename}")
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise ValueError(f"PocketBase returned HTTP {response.status_code} for {self.table_name} file")
+        out.write(response.content)
+        return True
+
 # Global client
 pocketbase = PocketBaseClient()
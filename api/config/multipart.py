@@ -0,0 +1,59 @@
+import uuid
+from typing import Any, BinaryIO, Dict, Iterator
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _quote(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', "%22").replace("\r", "").replace("\n", "")
+
+
+class MultipartStream:
+    """multipart/form-data body that yields the file part in chunks.
+
+    `requests` takes the Content-Length from __len__ and iterates the body, so the
+    upload goes out without ever being copied into memory as a whole.
+    """
+
+    def __init__(self, fields: Dict[str, Any], file_field: str, filename: str,
+                 content_type: str, fileobj: BinaryIO, size: int, chunk_size: int = CHUNK_SIZE):
+        self.boundary = uuid.uuid4().hex
+        self.fileobj = fileobj
+        self.size = size
+        self.chunk_size = chunk_size
+
+        parts = []
+        for name, value in fields.items():
+            if value is None:
+                continue
+            parts.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n'
+                f"{value}\r\n"
+            )
+        parts.append(
+            f"--{self.boundary}\r\n"
+            f'Content-Disposition: form-data; name="{_quote(file_field)}"; filename="{_quote(filename or "upload")}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n"
+        )
+        self._head = "".join(parts).encode("utf-8")
+        self._tail = f"\r\n--{self.boundary}--\r\n".encode("ascii")
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self) -> int:
+        return len(self._head) + self.size + len(self._tail)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self._head
+        self.fileobj.seek(0)
+        remaining = self.size
+        while remaining > 0:
+            chunk = self.fileobj.read(min(self.chunk_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+        yield self._tail
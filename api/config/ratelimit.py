@@ -0,0 +1,272 @@
+"""
+Per-user rate limiting and global admission control.
+
+Rate limiting: each authenticated user has a token bucket per route class,
+kept in the shared cache file so every worker draws from the same bucket.
+A request that finds its bucket empty gets 429 with Retry-After. Classes and
+their budgets, as "<class>=<tokens per second>:<burst>":
+
+    live    the active-workout endpoints (set logging, polling current)
+    heavy   reads that fan out to many backend calls (library, stats, charts, trees)
+    write   every other POST/PUT/PATCH/DELETE
+    read    every other GET
+
+RATE_LIMITS overrides them, e.g. "heavy=0.5:5,read=10:40". RATE_LIMITS=off
+disables rate limiting.
+
+Admission control: resilience.request() counts the PocketBase calls in flight
+in this worker, and each worker publishes its count to the shared file. When
+the sum over all workers is above MAX_BACKEND_INFLIGHT, new requests get 503
+with Retry-After, and requests already running finish normally.
+MAX_BACKEND_INFLIGHT=0 disables admission control.
+
+Each worker runs a heartbeat thread that reads the other workers' counts every
+INFLIGHT_PUBLISH_INTERVAL, so the admission check itself never touches the
+file. The thread also republishes a busy worker's count every
+INFLIGHT_HEARTBEAT_INTERVAL, so rows older than INFLIGHT_ROW_MAX_AGE (and rows
+of processes that no longer exist) belong to dead workers and are not counted.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from .shared_cache import BUSY_TIMEOUT, SHARED_CACHE_FILE, connect
+
+DEFAULT_RATE_LIMITS = "live=5:30,heavy=1:10,write=3:20,read=5:40"
+MAX_BACKEND_INFLIGHT = int(os.environ.get("MAX_BACKEND_INFLIGHT", "32"))
+# How stale this worker's view of the other workers' in-flight counts may be (the heartbeat's period)
+INFLIGHT_PUBLISH_INTERVAL = 0.05
+INFLIGHT_HEARTBEAT_INTERVAL = 1.0
+INFLIGHT_ROW_MAX_AGE = 3.0
+# A bucket update waits this long for the file lock, then lets the request through
+RATE_LIMIT_BUSY_TIMEOUT_MS = 50
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+# Matches both route templates and concrete paths
+HEAVY_ROUTES = re.compile(r"^/api/(exercise-library/$|stats/|exercise-logs/chart/|folders/[^/]+/tree/)")
+
+
+def parse_limits(spec: str) -> Dict[str, Tuple[float, float]]:
+    limits = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        name, _, budget = part.partition("=")
+        rate, _, burst = budget.partition(":")
+        limits[name.strip()] = (float(rate), float(burst or rate))
+    return limits
+
+
+_limits_env = os.environ.get("RATE_LIMITS", "")
+RATE_LIMITS: Dict[str, Tuple[float, float]] = {} if _limits_env == "off" else {
+    **parse_limits(DEFAULT_RATE_LIMITS), **parse_limits(_limits_env)}
+
+
+class RateLimited(HTTPException):
+    def __init__(self, route_class: str, retry_after: float):
+        super().__init__(status_code=429, detail=f"Too many '{route_class}' requests, slow down",
+                         headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+
+
+def route_class(method: str, path_template: str) -> str:
+    """live, heavy, write or read for a route template (or a concrete request path)."""
+    if path_template.startswith("/api/active-workout/"):
+        return "live"
+    if method in WRITE_METHODS:
+        return "write"
+    if HEAVY_ROUTES.match(path_template):
+        return "heavy"
+    return "read"
+
+
+# (counter, label) -> count since start, read by the metrics collector
+_counters: Dict[tuple, int] = {}
+_checks = 0
+
+
+def _count(name: str, label: str):
+    key = (name, label)
+    _counters[key] = _counters.get(key, 0) + 1
+
+
+def stats() -> dict:
+    return {"counters": dict(_counters), "inflight": _inflight}
+
+
+def take(user_id: str, cls: str, now: Optional[float] = None) -> float:
+    """Take a token from the user's bucket for `cls`; 0 if allowed, else seconds until one is available."""
+    global _checks
+    if cls not in RATE_LIMITS or not user_id:
+        return 0.0
+    rate, burst = RATE_LIMITS[cls]
+    now = time.time() if now is None else now
+    key = f"{cls}:{user_id}"
+    try:
+        conn = connect(SHARED_CACHE_FILE)
+        conn.execute(f"PRAGMA busy_timeout = {RATE_LIMIT_BUSY_TIMEOUT_MS}")
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated FROM rate_buckets WHERE key = ?", (key,)).fetchone()
+                tokens = burst if row is None else min(burst, row[0] + max(0.0, now - row[1]) * rate)
+                wait = 0.0 if tokens >= 1 else (1 - tokens) / rate
+                if not wait:
+                    tokens -= 1
+                conn.execute("INSERT OR REPLACE INTO rate_buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                             (key, tokens, now))
+                _checks += 1
+                if _checks % 1000 == 0:
+                    # A bucket idle this long is full again; forget it
+                    conn.execute("DELETE FROM rate_buckets WHERE updated < ?", (now - 3600,))
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.execute(f"PRAGMA busy_timeout = {int(BUSY_TIMEOUT * 1000)}")
+    except sqlite3.OperationalError as e:
+        # Fail open, fast: a contended or broken cache file must not stall or lock users out
+        _count("rate_limit_skipped", "locked" if "locked" in str(e) else "error")
+        if "locked" not in str(e):
+            print(f"Rate limiter error: {e}")
+        return 0.0
+    except sqlite3.Error as e:
+        print(f"Rate limiter error: {e}")
+        return 0.0
+    if wait:
+        _count("rate_limited", cls)
+    return wait
+
+
+def check(user_id: str, method: str, path_template: str):
+    """Raise RateLimited when the user is over budget for this route's class."""
+    cls = route_class(method, path_template)
+    wait = take(user_id, cls)
+    if wait:
+        raise RateLimited(cls, wait)
+
+
+_inflight = 0
+_inflight_lock = threading.Lock()
+_published = (0, 0.0)  # (count, at)
+_others = 0            # sum over the other workers, as of the last heartbeat
+_heartbeat_pid = None
+
+
+def _publish(count: int, now: float):
+    global _published
+    _published = (count, now)
+    try:
+        connect(SHARED_CACHE_FILE).execute(
+            "INSERT OR REPLACE INTO backend_inflight (pid, count, updated) VALUES (?, ?, ?)",
+            (os.getpid(), count, time.time()))
+    except sqlite3.Error as e:
+        print(f"Admission control error: {e}")
+
+
+def _read_others() -> int:
+    rows = connect(SHARED_CACHE_FILE).execute(
+        "SELECT pid, count FROM backend_inflight WHERE pid != ? AND updated > ? AND count > 0",
+        (os.getpid(), time.time() - INFLIGHT_ROW_MAX_AGE)).fetchall()
+    # A killed worker never publishes going idle; skip its row rather than wait for it to age out
+    from ..observability.metrics import pid_alive  # metrics imports this module
+    return sum(count for pid, count in rows if pid_alive(pid))
+
+
+def _heartbeat():
+    """Refresh the other workers' sum, and republish this worker's count while calls run
+    so a long call never ages out of theirs."""
+    global _others
+    while True:
+        time.sleep(INFLIGHT_PUBLISH_INTERVAL)
+        try:
+            _others = _read_others()
+        except sqlite3.Error as e:
+            print(f"Admission control error: {e}")
+            _others = 0
+        count = _inflight
+        if count and time.monotonic() - _published[1] >= INFLIGHT_HEARTBEAT_INTERVAL:
+            _publish(count, time.monotonic())
+
+
+def _start_heartbeat():
+    # One thread per process; a forked worker starts its own
+    global _heartbeat_pid
+    with _inflight_lock:
+        if _heartbeat_pid == os.getpid():
+            return
+        _heartbeat_pid = os.getpid()
+    threading.Thread(target=_heartbeat, name="inflight-heartbeat", daemon=True).start()
+
+
+@contextmanager
+def backend_call():
+    """Count a PocketBase call as in flight for admission control."""
+    global _inflight
+    if MAX_BACKEND_INFLIGHT and _heartbeat_pid != os.getpid():
+        _start_heartbeat()
+    with _inflight_lock:
+        _inflight += 1
+        count = _inflight
+    now = time.monotonic()
+    if MAX_BACKEND_INFLIGHT and now - _published[1] >= INFLIGHT_PUBLISH_INTERVAL:
+        _publish(count, now)
+    try:
+        yield
+    finally:
+        with _inflight_lock:
+            _inflight -= 1
+            count = _inflight
+        now = time.monotonic()
+        # Always publish going idle, so other workers don't keep counting finished calls
+        if MAX_BACKEND_INFLIGHT and (now - _published[1] >= INFLIGHT_PUBLISH_INTERVAL
+                                     or (count == 0 and _published[0])):
+            _publish(count, now)
+
+
+def global_inflight() -> int:
+    """PocketBase calls in flight over all workers (the others' at most INFLIGHT_PUBLISH_INTERVAL stale).
+
+    Reads only memory: it runs on the event loop for every request.
+    """
+    return _others + _inflight
+
+
+def admit() -> Optional[float]:
+    """None to admit a new request, else the Retry-After seconds for a 503."""
+    if not MAX_BACKEND_INFLIGHT:
+        return None
+    if _heartbeat_pid != os.getpid():
+        _start_heartbeat()
+    if global_inflight() <= MAX_BACKEND_INFLIGHT:
+        return None
+    _count("admission_rejected", "")
+    return 1.0
+
+
+class AdmissionControl:
+    """ASGI middleware answering 503 to new requests under `prefix` while admit() refuses.
+
+    Plain ASGI rather than @app.middleware: it runs on every request and the
+    BaseHTTPMiddleware wrapper costs more than the check itself.
+    """
+
+    def __init__(self, app, prefix: str = "/api/"):
+        self.app = app
+        self.prefix = prefix
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.prefix):
+            retry_after = admit()
+            if retry_after is not None:
+                response = JSONResponse(status_code=503, headers={"Retry-After": str(int(retry_after))},
+                                        content={"detail": "Server is busy, retry shortly"})
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
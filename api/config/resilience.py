@@ -0,0 +1,211 @@
+"""
+Resilient HTTP calls to PocketBase.
+
+- Every call has a connect/read timeout, so a hung backend cannot hold a
+  worker forever.
+- Reads (GET) are retried on connection errors, timeouts and 5xx responses,
+  with capped exponential backoff and full jitter. Writes are never retried.
+- A circuit breaker per collection opens after PB_BREAKER_FAILURES
+  consecutive failures. While it is open, calls fail fast with
+  BackendUnavailable (503 + Retry-After). After PB_BREAKER_RESET_S one trial
+  call is let through (half-open), and its outcome closes or re-opens the
+  breaker.
+- With PB_HEDGE_AFTER_MS > 0, a read that has not answered within that time
+  gets a second, identical request, and whichever answers first wins. This
+  trims tail latency at the cost of some extra load, so it is off by default.
+"""
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Optional
+
+import requests
+from fastapi import HTTPException
+from requests.adapters import HTTPAdapter
+
+from . import ratelimit
+
+CONNECT_TIMEOUT = float(os.environ.get("PB_CONNECT_TIMEOUT", "3"))
+READ_TIMEOUT = float(os.environ.get("PB_READ_TIMEOUT", "10"))
+WRITE_TIMEOUT = float(os.environ.get("PB_WRITE_TIMEOUT", "30"))
+READ_RETRIES = int(os.environ.get("PB_READ_RETRIES", "2"))
+RETRY_BASE = float(os.environ.get("PB_RETRY_BASE_MS", "50")) / 1000
+RETRY_MAX = float(os.environ.get("PB_RETRY_MAX_MS", "1000")) / 1000
+BREAKER_FAILURES = int(os.environ.get("PB_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.environ.get("PB_BREAKER_RESET_S", "10"))
+HEDGE_AFTER = float(os.environ.get("PB_HEDGE_AFTER_MS", "0")) / 1000
+
+CLOSED, HALF_OPEN, OPEN = "closed", "half_open", "open"
+STATES = (CLOSED, HALF_OPEN, OPEN)
+
+
+class BackendUnavailable(HTTPException):
+    """PocketBase is unreachable, failing or shed by its circuit breaker.
+
+    An HTTPException, so the routes' `except HTTPException: raise` lets it
+    through as a 503 instead of a generic 400.
+    """
+
+    def __init__(self, detail: str, retry_after: float = 1.0):
+        super().__init__(status_code=503, detail=detail,
+                         headers={"Retry-After": str(max(1, int(retry_after + 0.999)))})
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failures: int = BREAKER_FAILURES, reset_after: float = BREAKER_RESET):
+        self.name = name
+        self.failure_threshold = failures
+        self.reset_after = reset_after
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.reset_after:
+                self.state = HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_after - (time.monotonic() - self.opened_at))
+
+    def record_success(self):
+        with self._lock:
+            self.state = CLOSED
+            self.failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != OPEN:
+                    _count("breaker_opened", self.name)
+                self.state = OPEN
+                self.opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+# (counter, collection) -> count since start, read by the metrics collector
+_counters: Dict[tuple, int] = {}
+_session: Optional[requests.Session] = None
+_session_pid = None
+_hedge_pool: Optional[ThreadPoolExecutor] = None
+
+
+def breaker_for(collection: str) -> CircuitBreaker:
+    breaker = _breakers.get(collection)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(collection, CircuitBreaker(collection))
+    return breaker
+
+
+def _count(name: str, collection: str):
+    key = (name, collection)
+    _counters[key] = _counters.get(key, 0) + 1
+
+
+def stats() -> dict:
+    """Breaker states and retry/hedge/rejection counters for metrics."""
+    return {
+        "breakers": {name: b.state for name, b in list(_breakers.items())},
+        "counters": dict(_counters),
+    }
+
+
+def session() -> requests.Session:
+    """Process-wide pooled session (recreated after fork so workers don't share sockets)."""
+    global _session, _session_pid
+    if _session is None or _session_pid != os.getpid():
+        s = requests.Session()
+        adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64)
+        s.mount("http://", adapter)
+        s.mount("https://", adapter)
+        _session, _session_pid = s, os.getpid()
+    return _session
+
+
+def _backoff(attempt: int) -> float:
+    # "Full jitter": uniform over [0, min(cap, base * 2^attempt)]
+    return random.uniform(0, min(RETRY_MAX, RETRY_BASE * (2 ** attempt)))
+
+
+def _send(method: str, url: str, timeout: tuple, kwargs: dict) -> requests.Response:
+    return session().request(method, url, timeout=timeout, **kwargs)
+
+
+def _hedged(method: str, url: str, timeout: tuple, kwargs: dict, collection: str) -> requests.Response:
+    global _hedge_pool
+    if _hedge_pool is None:
+        _hedge_pool = ThreadPoolExecutor(max_workers=16, thread_name_prefix="pb-hedge")
+    primary = _hedge_pool.submit(_send, method, url, timeout, kwargs)
+    done, _ = wait([primary], timeout=HEDGE_AFTER)
+    if done:
+        return primary.result()
+    _count("hedged", collection)
+    futures = [primary, _hedge_pool.submit(_send, method, url, timeout, kwargs)]
+    error = None
+    while futures:
+        done, pending = wait(futures, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is None:
+                return future.result()
+            error = future.exception()
+        futures = list(pending)
+    raise error
+
+
+def request(collection: str, method: str, url: str, idempotent: Optional[bool] = None,
+            **kwargs) -> requests.Response:
+    """Send one PocketBase request under the collection's breaker, retrying reads."""
+    method = method.upper()
+    if idempotent is None:
+        idempotent = method in ("GET", "HEAD")
+    breaker = breaker_for(collection)
+    timeout = (CONNECT_TIMEOUT, READ_TIMEOUT if idempotent else WRITE_TIMEOUT)
+    attempts = 1 + (READ_RETRIES if idempotent else 0)
+    problem = "no attempt made"
+
+    for attempt in range(attempts):
+        if not breaker.allow():
+            _count("rejected", collection)
+            raise BackendUnavailable(f"PocketBase '{collection}' is unavailable (circuit open)",
+                                     retry_after=breaker.retry_after())
+        try:
+            with ratelimit.backend_call():
+                if idempotent and HEDGE_AFTER > 0:
+                    response = _hedged(method, url, timeout, kwargs, collection)
+                else:
+                    response = _send(method, url, timeout, kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            breaker.record_failure()
+            problem = f"{type(e).__name__}: {e}"
+        else:
+            if response.status_code < 500:
+                breaker.record_success()
+                return response
+            breaker.record_failure()
+            problem = f"HTTP {response.status_code}"
+            if attempt + 1 == attempts and not idempotent:
+                # Let the caller report the write's error payload
+                return response
+        if attempt + 1 < attempts:
+            _count("retries", collection)
+            time.sleep(_backoff(attempt))
+
+    raise BackendUnavailable(f"PocketBase '{collection}' {method} failed after {attempts} attempt(s): {problem}",
+                             retry_after=breaker.retry_after() if breaker.state == OPEN else 1.0)
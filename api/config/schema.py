@@ -0,0 +1,234 @@
+"""
+Declarative schema for every PocketBase collection the API uses.
+
+Indexes are declared as field tuples covering the filter combinations the
+routes issue (plus the field the result is sorted by), so a per-user query
+touches only that user's rows. pb_setup.py renders them to PocketBase's SQL
+index strings; the SQLite backend builds the same indexes on json_extract().
+
+Every collection a user token can reach has an owner_field, child records
+(sections, exercises, template exercises, active sets) included, so the
+ownership rules never depend on a parent lookup. Collections marked
+server_only are reachable only with the superuser credentials.
+"""
+
+from typing import Dict, List
+
+
+def text(name: str, required: bool = False) -> dict:
+    return {"name": name, "type": "text", "required": required}
+
+
+def number(name: str) -> dict:
+    # PocketBase treats 0 as "blank", so required numbers would reject zero sets/weights
+    return {"name": name, "type": "number", "required": False}
+
+
+def boolean(name: str) -> dict:
+    return {"name": name, "type": "bool", "required": False}
+
+
+def file(name: str, max_size: int = 10 * 1024 * 1024) -> dict:
+    return {"name": name, "type": "file", "required": False,
+            "options": {"maxSelect": 1, "maxSize": max_size,
+                        "mimeTypes": ["image/jpeg", "image/png", "image/webp", "image/gif",
+                                      "image/heic", "image/heif"]}}
+
+
+def index(*fields: str, unique: bool = False) -> dict:
+    return {"fields": fields, "unique": unique}
+
+
+COLLECTIONS: List[dict] = [
+    {
+        "name": "folders",
+        "owner_field": "user_id",
+        "schema": [text("user_id", True), text("name", True)],
+        "indexes": [index("user_id")],
+    },
+    {
+        "name": "sections",
+        "owner_field": "user_id",
+        "schema": [text("user_id", True), text("folder_id", True), text("name", True), text("description")],
+        "indexes": [index("user_id", "folder_id")],
+    },
+    {
+        "name": "exercise",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("section_id", True), text("name", True), text("description"),
+            number("target_sets"), number("target_reps"),
+            file("image"), text("image_url"), text("image_hash"),
+        ],
+        "indexes": [index("user_id", "section_id"), index("image_hash")],
+    },
+    {
+        # Shared across users by content hash; only the server reads or writes it (api/services/images.py)
+        "name": "image_blobs",
+        "server_only": True,
+        "schema": [
+            text("hash", True), file("file"), number("ref_count"),
+            text("content_type"), number("size"),
+        ],
+        "indexes": [index("hash", unique=True)],
+    },
+    {
+        "name": "exercise_logs",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("exercise_id"), text("exercise_library_id"), text("exercise_name"),
+            number("sets"), number("reps"), number("weight_kg"), text("notes"),
+            text("logged_at"), text("session_id"), boolean("is_pr"),
+        ],
+        "indexes": [
+            index("user_id", "logged_at"),
+            index("user_id", "exercise_id", "logged_at"),
+            index("user_id", "exercise_library_id"),
+            index("session_id"),
+        ],
+    },
+    {
+        "name": "workout_logs",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("folder_id"), text("folder_name"),
+            text("logged_date"), text("notes"),
+        ],
+        "indexes": [index("user_id", "logged_date")],
+    },
+    {
+        "name": "measurements",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), number("weight_kg"), number("body_fat_pct"), number("chest_cm"),
+            number("waist_cm"), number("hips_cm"), number("arms_cm"), number("legs_cm"), text("logged_at"),
+        ],
+        "indexes": [index("user_id", "logged_at")],
+    },
+    {
+        "name": "workout_sessions",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("workout_id"), text("workout_name"), text("workout_type"),
+            text("category"), text("level"), text("tags"), text("session_date"), text("notes"),
+            number("duration_seconds"), number("total_volume_kg"), number("set_count"), number("exercise_count"),
+        ],
+        # One per filter get_sessions pushes down, each followed by the default sort field,
+        # plus the other sort fields it offers (see services/query_plan.py)
+        "indexes": [
+            index("user_id", "session_date"),
+            index("user_id", "workout_type", "session_date"),
+            index("user_id", "category", "session_date"),
+            index("user_id", "level", "session_date"),
+            index("user_id", "workout_name"),
+            index("user_id", "created"),
+        ],
+    },
+    {
+        # One row per (session, tag), so a tag filter is an indexed lookup (api/services/session_tags.py)
+        "name": "session_tags",
+        "owner_field": "user_id",
+        "schema": [text("user_id", True), text("session_id", True), text("tag", True)],
+        "indexes": [index("user_id", "tag"), index("session_id")],
+    },
+    {
+        "name": "custom_exercises",
+        "owner_field": "created_by",
+        "schema": [
+            text("name", True), text("muscle_group"), text("secondary_muscles"), text("equipment"),
+            text("category"), text("difficulty"), text("description"), text("instructions"),
+            boolean("is_custom"), text("created_by", True),
+        ],
+        "indexes": [index("created_by")],
+    },
+    {
+        "name": "workout_templates",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("name", True), text("workout_type"), number("estimated_duration_min"),
+            text("difficulty"), text("description"), text("last_used_at"),
+        ],
+        "indexes": [index("user_id", "last_used_at")],
+    },
+    {
+        "name": "template_exercises",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("template_id", True), text("exercise_library_id"), text("exercise_name"),
+            number("order_index"), number("target_sets"), number("target_reps"),
+            number("target_weight_kg"), number("rest_seconds"),
+        ],
+        "indexes": [index("user_id", "template_id", "order_index")],
+    },
+    {
+        "name": "active_workout_sessions",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("template_id"), text("workout_name"),
+            text("started_at"), text("status"),
+        ],
+        "indexes": [index("user_id", "status")],
+    },
+    {
+        "name": "active_session_sets",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("session_id", True), text("exercise_library_id"), text("exercise_name"),
+            number("set_number"), number("reps"), number("weight_kg"), boolean("is_completed"),
+            number("rest_seconds_after"), text("logged_at"),
+        ],
+        "indexes": [index("user_id", "session_id")],
+    },
+    {
+        "name": "personal_records",
+        "owner_field": "user_id",
+        "schema": [
+            text("user_id", True), text("exercise_library_id"), text("exercise_name"),
+            number("max_weight_kg"), number("max_reps"), number("best_volume"),
+            number("best_1rm_estimate"), text("achieved_at"),
+            # JSON text kept by api/services/personal_records.py
+            text("rep_maxes"), text("holders"),
+        ],
+        # Unique, so concurrent first logs of an exercise cannot both insert a row
+        "indexes": [index("user_id", "exercise_library_id", unique=True), index("user_id", "achieved_at")],
+    },
+]
+
+COLLECTIONS_BY_NAME: Dict[str, dict] = {c["name"]: c for c in COLLECTIONS}
+
+
+def index_name(collection: str, spec: dict) -> str:
+    return f"idx_{collection}_{'_'.join(spec['fields'])}"
+
+
+def index_sql(collection: str, spec: dict) -> str:
+    """PocketBase index definition, e.g. CREATE INDEX `idx_x_a_b` ON `x` (`a`, `b`)."""
+    columns = ", ".join(f"`{f}`" for f in spec["fields"])
+    unique = "UNIQUE " if spec["unique"] else ""
+    return f"CREATE {unique}INDEX `{index_name(collection, spec)}` ON `{collection}` ({columns})"
+
+
+def api_rules(collection: dict) -> dict:
+    """Owner-only rules; creates must name the caller as owner and updates may not change it.
+
+    Server-only collections get null rules, which PocketBase reads as superusers only.
+    """
+    owner = collection.get("owner_field")
+    if collection.get("server_only") or not owner:
+        return {"listRule": None, "viewRule": None, "createRule": None, "updateRule": None, "deleteRule": None}
+    rule = f"{owner} = @request.auth.id"
+    create_rule = f'@request.auth.id != "" && @request.data.{owner} = @request.auth.id'
+    update_rule = f"{rule} && (@request.data.{owner}:isset = false || @request.data.{owner} = @request.auth.id)"
+    return {"listRule": rule, "viewRule": rule, "createRule": create_rule,
+            "updateRule": update_rule, "deleteRule": rule}
+
+
+def to_pocketbase(collection: dict) -> dict:
+    """Collection create payload for the PocketBase admin API."""
+    return {
+        "name": collection["name"],
+        "type": collection.get("type", "base"),
+        "schema": collection["schema"],
+        "indexes": [index_sql(collection["name"], spec) for spec in collection["indexes"]],
+        **api_rules(collection),
+    }
@@ -0,0 +1,132 @@
+"""
+Production server settings.
+
+gunicorn_config.py loads gunicorn_settings() from here, so the worker count,
+event loop and timeouts are decided in one place:
+
+- workers: WEB_CONCURRENCY if set, otherwise 2 * CPUs + 1 capped by the
+  memory available to the container (WORKER_MEMORY_MB per worker). CPU and
+  memory limits come from cgroups when present, so a 1-CPU / 512 MB
+  instance gets a sensible count instead of the host's.
+- workers are uvicorn-worker's UvicornWorker, whose "auto" loop and http
+  settings pick uvloop and httptools when installed, else asyncio and h11.
+- the app is preloaded in the master so workers share its memory
+  copy-on-write.
+
+    python -m api.config.server      # print the effective settings
+"""
+
+import importlib.util
+import os
+from typing import Optional
+
+WORKER_MEMORY_MB = int(os.environ.get("WORKER_MEMORY_MB", "150"))
+MAX_WORKERS = int(os.environ.get("MAX_WORKERS", "16"))
+
+
+def _read(path: str) -> Optional[str]:
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def detect_cpus() -> float:
+    """CPUs this process may use: cgroup quota, else affinity mask, else cpu_count()."""
+    quota = None
+    cpu_max = _read("/sys/fs/cgroup/cpu.max")  # cgroup v2: "<quota> <period>" or "max <period>"
+    if cpu_max and not cpu_max.startswith("max"):
+        q, p = cpu_max.split()[:2]
+        quota = int(q) / int(p)
+    else:
+        q, p = _read("/sys/fs/cgroup/cpu/cpu.cfs_quota_us"), _read("/sys/fs/cgroup/cpu/cpu.cfs_period_us")
+        if q and p and int(q) > 0:
+            quota = int(q) / int(p)
+    try:
+        available = len(os.sched_getaffinity(0))
+    except AttributeError:
+        available = os.cpu_count() or 1
+    return min(quota, available) if quota else float(available)
+
+
+def detect_memory_mb() -> Optional[int]:
+    """Memory limit in MB: cgroup limit, else physical memory; None if unknown."""
+    limit = _read("/sys/fs/cgroup/memory.max") or _read("/sys/fs/cgroup/memory/memory.limit_in_bytes")
+    total = None
+    meminfo = _read("/proc/meminfo")
+    if meminfo:
+        for line in meminfo.splitlines():
+            if line.startswith("MemTotal:"):
+                total = int(line.split()[1]) * 1024
+                break
+    if total is None:
+        try:
+            total = os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+        except (ValueError, OSError, AttributeError):
+            total = None
+    if limit and limit.isdigit() and (total is None or int(limit) < total):
+        total = int(limit)
+    return total // (1024 * 1024) if total else None
+
+
+def worker_count(cpus: float, memory_mb: Optional[int]) -> int:
+    if os.environ.get("WEB_CONCURRENCY"):
+        return max(1, int(os.environ["WEB_CONCURRENCY"]))
+    workers = int(2 * cpus) + 1
+    if memory_mb:
+        # Leave ~20% for the master, page cache and PocketBase on small instances
+        workers = min(workers, int(memory_mb * 0.8) // WORKER_MEMORY_MB)
+    return max(1, min(workers, MAX_WORKERS))
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+# What the worker's "auto" loop and http settings resolve to, for report()
+EVENT_LOOP = "uvloop" if _installed("uvloop") else "asyncio"
+HTTP_IMPL = "httptools" if _installed("httptools") else "h11"
+
+
+def gunicorn_settings() -> dict:
+    cpus = detect_cpus()
+    memory_mb = detect_memory_mb()
+    return {
+        "bind": f"0.0.0.0:{os.environ.get('PORT', '8000')}",
+        "workers": worker_count(cpus, memory_mb),
+        "worker_class": "uvicorn_worker.UvicornWorker",
+        "preload_app": os.environ.get("PRELOAD_APP", "1") != "0",
+        # Longer than the platform load balancer's idle timeout, so it never reuses a closed socket
+        "keepalive": int(os.environ.get("KEEPALIVE", "75")),
+        "backlog": int(os.environ.get("BACKLOG", "2048")),
+        "timeout": int(os.environ.get("WORKER_TIMEOUT", "60")),
+        "graceful_timeout": int(os.environ.get("GRACEFUL_TIMEOUT", "30")),
+        # Recycle workers now and then to bound slow memory growth; jitter avoids restarting all at once
+        "max_requests": int(os.environ.get("MAX_REQUESTS", "5000")),
+        "max_requests_jitter": int(os.environ.get("MAX_REQUESTS_JITTER", "500")),
+        # Heartbeat files on tmpfs so a slow disk cannot make the arbiter kill healthy workers
+        "worker_tmp_dir": "/dev/shm" if os.path.isdir("/dev/shm") else None,
+        "accesslog": os.environ.get("ACCESS_LOG") or None,
+        "_detected": {"cpus": cpus, "memory_mb": memory_mb},
+    }
+
+
+def report(settings: dict) -> str:
+    detected = settings.get("_detected", {})
+    lines = [
+        "Server settings:",
+        f"  detected cpus={detected.get('cpus')} memory_mb={detected.get('memory_mb')}",
+        f"  workers={settings['workers']} worker_class={settings['worker_class']} "
+        f"loop={EVENT_LOOP} http={HTTP_IMPL}",
+        f"  bind={settings['bind']} backlog={settings['backlog']} keepalive={settings['keepalive']}s",
+        f"  timeout={settings['timeout']}s graceful_timeout={settings['graceful_timeout']}s "
+        f"preload_app={settings['preload_app']}",
+        f"  max_requests={settings['max_requests']}±{settings['max_requests_jitter']} "
+        f"worker_tmp_dir={settings['worker_tmp_dir']}",
+    ]
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    print(report(gunicorn_settings()))
@@ -0,0 +1,159 @@
+"""
+Cache shared by every worker process on the box, stored in a SQLite file.
+
+SharedCache has the same interface as TTLCache (get/set/delete/clear/len,
+hits/misses, version/bump), so either can back any cache in the API. Values
+are stored as JSON, so they must be JSON-serialisable, and keys as the JSON of
+the key tuple. Entries expire by TTL. Every EVICT_EVERY writes, expired
+entries are dropped and the namespace is trimmed to maxsize, oldest entries
+first.
+
+Invalidation needs no messaging between workers: version(name) and bump(name)
+are counters in the same file. A cache stores the version with each entry and
+treats an entry with an older version as a miss, so a bump in one worker is
+seen by all of them on their next read.
+
+The file lives in SHARED_CACHE_DIR, which defaults to the temp directory. It
+uses WAL mode, so readers never block the writer. Any SQLite error is logged
+and treated as a miss, so a broken cache file slows requests down but never
+fails them.
+"""
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Hashable, Optional
+
+SHARED_CACHE_DIR = os.environ.get("SHARED_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "workout_tracker_cache")
+SHARED_CACHE_FILE = os.path.join(SHARED_CACHE_DIR, "cache.sqlite3")
+EVICT_EVERY = 200
+# Seconds a write waits for another process's lock before giving up
+BUSY_TIMEOUT = 2.0
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    ns         TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    stored_at  REAL NOT NULL,
+    PRIMARY KEY (ns, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS entries_stored ON entries (ns, stored_at);
+CREATE TABLE IF NOT EXISTS versions (
+    ns      TEXT NOT NULL,
+    name    TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    PRIMARY KEY (ns, name)
+) WITHOUT ROWID;
+-- ratelimit.py: per-user token buckets and each worker's in-flight backend calls
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key     TEXT PRIMARY KEY,
+    tokens  REAL NOT NULL,
+    updated REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS backend_inflight (
+    pid     INTEGER PRIMARY KEY,
+    count   INTEGER NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+
+_local = threading.local()
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """One connection per thread and process; opened after fork, never inherited."""
+    conns = getattr(_local, "conns", None)
+    if conns is None or getattr(_local, "pid", None) != os.getpid():
+        conns = _local.conns = {}
+        _local.pid = os.getpid()
+    conn = conns.get(path)
+    if conn is None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        conn = sqlite3.connect(path, timeout=BUSY_TIMEOUT, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conns[path] = conn
+    return conn
+
+
+def _key(key: Hashable) -> str:
+    return json.dumps(key, separators=(",", ":"), default=str)
+
+
+class SharedCache:
+    def __init__(self, namespace: str, ttl: float = 30.0, maxsize: int = 10000, path: str = SHARED_CACHE_FILE):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self.invalidation_failures = 0
+        self._writes = 0
+
+    def _run(self, sql: str, params: tuple = (), fetch: bool = False, default: Any = None):
+        try:
+            cursor = connect(self.path).execute(sql, params)
+            return cursor.fetchone() if fetch else None
+        except sqlite3.Error as e:
+            print(f"Shared cache '{self.namespace}' error: {e}")
+            return default
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        row = self._run("SELECT value, expires_at FROM entries WHERE ns = ? AND key = ?",
+                        (self.namespace, _key(key)), fetch=True)
+        if row is None or row[1] < time.time():
+            self.misses += 1
+            return default
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._run("INSERT OR REPLACE INTO entries (ns, key, value, expires_at, stored_at) VALUES (?, ?, ?, ?, ?)",
+                  (self.namespace, _key(key), json.dumps(value, separators=(",", ":")), expires_at, now))
+        self._writes += 1
+        if self._writes % EVICT_EVERY == 0:
+            self.evict()
+
+    def delete(self, key: Hashable):
+        self._run("DELETE FROM entries WHERE ns = ? AND key = ?", (self.namespace, _key(key)))
+
+    def evict(self):
+        """Drop expired entries, then the oldest ones beyond maxsize."""
+        self._run("DELETE FROM entries WHERE ns = ? AND expires_at < ?", (self.namespace, time.time()))
+        self._run("DELETE FROM entries WHERE ns = ? AND key IN ("
+                  "SELECT key FROM entries WHERE ns = ? ORDER BY stored_at DESC LIMIT -1 OFFSET ?)",
+                  (self.namespace, self.namespace, self.maxsize))
+
+    def clear(self):
+        self._run("DELETE FROM entries WHERE ns = ?", (self.namespace,))
+
+    def version(self, name: str) -> int:
+        row = self._run("SELECT version FROM versions WHERE ns = ? AND name = ?",
+                        (self.namespace, name), fetch=True)
+        return row[0] if row else 0
+
+    def bump(self, name: str) -> bool:
+        """Raise the version of `name`; False if the write failed and old entries are still current."""
+        try:
+            connect(self.path).execute("INSERT INTO versions (ns, name, version) VALUES (?, ?, 1) "
+                                       "ON CONFLICT (ns, name) DO UPDATE SET version = version + 1",
+                                       (self.namespace, name))
+            return True
+        except sqlite3.Error as e:
+            self.invalidation_failures += 1
+            print(f"Shared cache '{self.namespace}' lost an invalidation of '{name}': {e}")
+            return False
+
+    def __len__(self):
+        row = self._run("SELECT COUNT(*) FROM entries WHERE ns = ? AND expires_at >= ?",
+                        (self.namespace, time.time()), fetch=True)
+        return row[0] if row else 0
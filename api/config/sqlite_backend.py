@@ -0,0 +1,332 @@
+"""
+Embedded SQLite storage backend (STORAGE_BACKEND=sqlite).
+
+Each collection is a table of (id, created, updated, data) where `data` holds
+the record as JSON. Filters compile to json_extract() expressions, and the
+composite indexes from api/config/schema.py are built on exactly those
+expressions so SQLite can use them. Records come back in the same shape
+PocketBase returns, so the routes do not know which backend they are talking to.
+
+The database runs in WAL mode; every worker process/thread gets its own
+connection.
+
+The collection rules PocketBase would apply (schema.api_rules) are enforced
+here from the token's verified user id: reads and deletes only see that
+user's rows, creates must name them as owner, and updates can neither touch
+another user's row nor change its owner. Collections without an owner field
+are reachable only through pocketbase.service_table().
+"""
+
+import datetime
+import json
+import os
+import re
+import secrets
+import shutil
+import sqlite3
+import string
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from .database import PER_PAGE, Table
+from .schema import COLLECTIONS_BY_NAME, index_name
+
+SQLITE_PATH = os.environ.get("SQLITE_PATH", "workout_tracker.db")
+SQLITE_FILES_DIR = os.environ.get("SQLITE_FILES_DIR", "pb_files")
+
+_NAME_RE = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+_RECORD_ID_RE = re.compile(r"^[A-Za-z0-9_]+$")
+_ID_ALPHABET = string.ascii_lowercase + string.digits
+_COLUMNS = ("id", "created", "updated")
+
+_local = threading.local()
+_ready_lock = threading.Lock()
+_ready_tables = set()
+
+
+def _check_name(name: str) -> str:
+    if not _NAME_RE.match(name):
+        raise ValueError(f"Invalid identifier: {name!r}")
+    return name
+
+
+def _field_expr(field: str) -> str:
+    if field in _COLUMNS:
+        return field
+    return f"json_extract(data, '$.{_check_name(field)}')"
+
+
+def _blank_record(table_name: str) -> Dict[str, Any]:
+    """PocketBase's zero values for every schema field, which it returns for fields never set."""
+    zero = {"text": "", "number": 0, "bool": False, "file": ""}
+    return {f["name"]: zero.get(f["type"]) for f in COLLECTIONS_BY_NAME.get(table_name, {}).get("schema", [])}
+
+
+def _verified_subject(token: Optional[str]) -> Optional[str]:
+    """The user id `token` was issued to, checked with PocketBase (auth_handler caches the answer)."""
+    if not token:
+        return None
+    from ..auth.auth_handler import verify_pocketbase_token
+    user = verify_pocketbase_token(token)
+    return user.get("id") if user else None
+
+
+def _now() -> str:
+    return datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + "Z"
+
+
+def _new_id() -> str:
+    return "".join(secrets.choice(_ID_ALPHABET) for _ in range(15))
+
+
+def file_path(collection: str, record_id: str, filename: str) -> Optional[str]:
+    """The stored file behind /api/files/{collection}/{record_id}/{filename}, or None."""
+    if not (_NAME_RE.match(collection) and _RECORD_ID_RE.match(record_id)) or filename != os.path.basename(filename):
+        return None
+    path = os.path.join(SQLITE_FILES_DIR, collection, record_id, filename)
+    return path if filename and os.path.isfile(path) else None
+
+
+def connection() -> sqlite3.Connection:
+    """This thread's connection; reopened after a fork so workers never share one."""
+    conn = getattr(_local, "conn", None)
+    if conn is None or getattr(_local, "pid", None) != os.getpid():
+        conn = sqlite3.connect(SQLITE_PATH, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        _local.conn = conn
+        _local.pid = os.getpid()
+    return conn
+
+
+def ensure_table(conn: sqlite3.Connection, table_name: str):
+    key = (os.getpid(), SQLITE_PATH, table_name)
+    if key in _ready_tables:
+        return
+    with _ready_lock:
+        name = _check_name(table_name)
+        conn.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" '
+            "(id TEXT PRIMARY KEY, created TEXT NOT NULL, updated TEXT NOT NULL, data TEXT NOT NULL)"
+        )
+        # Same indexes as api/config/schema.py declares for PocketBase
+        live = {row[1]: bool(row[2]) for row in conn.execute(f'PRAGMA index_list("{name}")')}
+        for spec in COLLECTIONS_BY_NAME.get(name, {}).get("indexes", []):
+            index = index_name(name, spec)
+            exprs = ", ".join(_field_expr(f) for f in spec["fields"])
+            if index in live and live[index] != spec["unique"]:
+                # Declared uniqueness changed since the index was built
+                conn.execute(f'DROP INDEX "{index}"')
+            try:
+                conn.execute(
+                    f'CREATE {"UNIQUE " if spec["unique"] else ""}INDEX IF NOT EXISTS "{index}" ON "{name}" ({exprs})'
+                )
+            except sqlite3.IntegrityError:
+                # Existing rows repeat a key; serve from a plain index and retry on the next start
+                print(f"SQLite index {index} left non-unique: existing rows repeat a key")
+                conn.execute(f'CREATE INDEX IF NOT EXISTS "{index}" ON "{name}" ({exprs})')
+        _ready_tables.add(key)
+
+
+class SQLiteTable(Table):
+    backend = "sqlite"
+
+    def __init__(self, table_name: str, token: str = None, service: bool = False):
+        super().__init__(table_name, token=token)
+        self.service = service
+        self.subject: Optional[str] = None
+        self.conn = connection()
+        ensure_table(self.conn, table_name)
+
+    def _owner(self) -> Optional[Tuple[str, str]]:
+        """(owner field, user id) every row this table reads or writes must carry; None for service tables."""
+        if self.service:
+            return None
+        collection = COLLECTIONS_BY_NAME.get(self.table_name, {})
+        owner_field = collection.get("owner_field")
+        if not owner_field or collection.get("server_only"):
+            raise PermissionError(f"Only the server can access {self.table_name}")
+        if self.subject is None:
+            self.subject = _verified_subject(self.token)
+            if not self.subject:
+                raise PermissionError("The request requires a valid user token")
+        return owner_field, self.subject
+
+    def _check_create(self, data: Dict[str, Any]):
+        owner = self._owner()
+        if owner and data.get(owner[0]) != owner[1]:
+            raise ValueError(f"Failed to create record. | fields: {{'{owner[0]}': 'must be the authenticated user'}}")
+
+    def _owns(self, owner: Optional[Tuple[str, str]], record: Dict[str, Any], data: Dict[str, Any]) -> bool:
+        """Whether the update of `record` with `data` passes the owner rule."""
+        if owner is None:
+            return True
+        field, subject = owner
+        return record.get(field) == subject and data.get(field, subject) == subject
+
+    def _where(self):
+        clauses, params = [], []
+        owner = self._owner()
+        if owner:
+            clauses.append(f"{_field_expr(owner[0])} = ?")
+            params.append(owner[1])
+        for field, op, values in self.conditions:
+            expr = _field_expr(field)
+            if op in ("=", "<="):
+                clauses.append(f"{expr} {op} ?")
+                params.append(values[0])
+            elif values:
+                clauses.append(f"{expr} IN ({', '.join('?' for _ in values)})")
+                params.extend(values)
+            else:
+                clauses.append("0")
+        groups = self.seek_terms()
+        if groups:
+            # The leading bound alone lets SQLite range-scan the index to the page start;
+            # the OR-ed groups then break ties on the later sort fields
+            field, op, value = groups[0][-1]
+            clauses.append(f"{_field_expr(field)} {op}= ?")
+            params.append(value)
+            ors = []
+            for terms in groups:
+                ors.append("(" + " AND ".join(f"{_field_expr(f)} {o} ?" for f, o, _ in terms) + ")")
+                params.extend(v for _, _, v in terms)
+            clauses.append("(" + " OR ".join(ors) + ")")
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _order_by(self) -> str:
+        if not self.sort:
+            return " ORDER BY rowid"
+        return " ORDER BY " + ", ".join(
+            f"{_field_expr(f.lstrip('+-'))} {'DESC' if f.startswith('-') else 'ASC'}" for f in self.sort)
+
+    def _record(self, row: sqlite3.Row) -> Dict[str, Any]:
+        record = json.loads(row["data"])
+        record.update(id=row["id"], created=row["created"], updated=row["updated"],
+                      collectionName=self.table_name)
+        if self.columns != "*":
+            wanted = {c.strip() for c in self.columns.split(",")}
+            record = {k: v for k, v in record.items() if k in wanted}
+        return record
+
+    def _rows(self, limit: Optional[int] = None) -> List[sqlite3.Row]:
+        where, params = self._where()
+        sql = f'SELECT id, created, updated, data FROM "{self.table_name}"{where}{self._order_by()}'
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return self.conn.execute(sql, params).fetchall()
+
+    def _list(self):
+        items = [self._record(row) for row in self._rows(self.row_limit)]
+        if self.row_limit:
+            # Like PocketBase with skipTotal
+            return {"page": 1, "perPage": self.row_limit, "totalItems": -1, "totalPages": -1, "items": items}, True
+        return {"page": 1, "perPage": max(len(items), PER_PAGE), "totalItems": len(items), "totalPages": 1,
+                "items": items}, True
+
+    def _insert(self, data):
+        self._check_create(data)
+        data = {**_blank_record(self.table_name), **data}
+        record_id = data.pop("id", None) or _new_id()
+        now = _now()
+        try:
+            self.conn.execute(
+                f'INSERT INTO "{self.table_name}" (id, created, updated, data) VALUES (?, ?, ?, ?)',
+                (record_id, now, now, json.dumps(data)),
+            )
+        except sqlite3.IntegrityError as e:
+            raise ValueError(f"Failed to create record. | fields: {str(e)}")
+        return {"items": [{**data, "id": record_id, "created": now, "updated": now,
+                           "collectionName": self.table_name}]}
+
+    def _update(self, record_id, data):
+        owner = self._owner()
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(f'SELECT data, created FROM "{self.table_name}" WHERE id = ?', (record_id,)).fetchone()
+            current = json.loads(row["data"]) if row is not None else None
+            if current is None or not self._owns(owner, current, data):
+                # Like PocketBase, a row the rules hide is reported as missing
+                conn.execute("ROLLBACK")
+                return {"items": [], "error": {"code": 404, "message": "The requested resource wasn't found."}}
+            for key, value in data.items():
+                # PocketBase "field+" / "field-" number modifiers
+                if key.endswith("+") or key.endswith("-"):
+                    field, sign = key[:-1], (1 if key.endswith("+") else -1)
+                    current[field] = (current.get(field) or 0) + sign * value
+                else:
+                    current[key] = value
+            now = _now()
+            conn.execute(f'UPDATE "{self.table_name}" SET data = ?, updated = ? WHERE id = ?',
+                         (json.dumps(current), now, record_id))
+            conn.execute("COMMIT")
+        except sqlite3.IntegrityError as e:
+            conn.execute("ROLLBACK")
+            return {"items": [], "error": {"code": 400, "message": str(e)}}
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return {"items": [{**current, "id": record_id, "created": row["created"], "updated": now,
+                           "collectionName": self.table_name}]}
+
+    def _file_dir(self, record_id: str) -> str:
+        return os.path.join(SQLITE_FILES_DIR, self.table_name, record_id)
+
+    def _upload(self, data, file_field, upload, record_id):
+        # Check the rules before the file lands in the record's directory
+        if record_id:
+            row = self.conn.execute(f'SELECT data FROM "{self.table_name}" WHERE id = ?', (record_id,)).fetchone()
+            if row is None or not self._owns(self._owner(), json.loads(row["data"]), data):
+                raise ValueError("The requested resource wasn't found. | fields: {}")
+        else:
+            self._check_create(data)
+        target_id = record_id or _new_id()
+        stem, ext = os.path.splitext(os.path.basename(upload.filename or "upload"))
+        filename = f"{re.sub(r'[^A-Za-z0-9_-]', '_', stem) or 'file'}_{_new_id()[:10]}{ext}"
+        file_dir = self._file_dir(target_id)
+        os.makedirs(file_dir, exist_ok=True)
+        upload.fileobj.seek(0)
+        with open(os.path.join(file_dir, filename), "wb") as out:
+            shutil.copyfileobj(upload.fileobj, out, 64 * 1024)
+        upload.fileobj.seek(0)
+
+        fields = {**data, file_field: filename}
+        if record_id:
+            result = self._update(record_id, fields)
+            if not result.get("items"):
+                raise ValueError(f"{result['error'].get('message')} | fields: {{}}")
+            return result
+        return self._insert({**fields, "id": target_id})
+
+    def _delete(self):
+        # Resolved first: verifying the token may call PocketBase, which must not happen under the write lock
+        self._owner()
+        # One transaction, so a filtered delete (e.g. ref_count <= 0) sees no concurrent update in between
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = self._rows(limit=None)
+            ids = [row["id"] for row in rows]
+            if ids:
+                self.conn.execute(
+                    f'DELETE FROM "{self.table_name}" WHERE id IN ({", ".join("?" for _ in ids)})', ids
+                )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        for record_id in ids:
+            shutil.rmtree(self._file_dir(record_id), ignore_errors=True)
+        return {"items": [self._record(row) for row in rows]}
+
+    def _download(self, record_id, filename, out):
+        row = self.conn.execute(f'SELECT data FROM "{self.table_name}" WHERE id = ?', (record_id,)).fetchone()
+        if row is None or not self._owns(self._owner(), json.loads(row["data"]), {}):
+            return False
+        path = file_path(self.table_name, record_id, filename)
+        if not path:
+            return False
+        with open(path, "rb") as source:
+            shutil.copyfileobj(source, out, 64 * 1024)
+        return True
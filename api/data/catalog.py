@@ -0,0 +1,124 @@
+"""
+Immutable catalogs served as prebuilt responses.
+
+Workout types, the seed exercise library and its muscle-group and equipment
+lists cannot change while the app runs. So each response for them is built
+once, as serialised JSON with an ETag and gzip/brotli variants (see
+compression.Precompressed), and routes hand back the stored bytes.
+
+The unfiltered lists, single exercises and option lists are built at import
+time; with preload_app that happens once, in the gunicorn master. The
+~1.8k filter combinations are built the first time each is requested, so
+startup and every max_requests recycle skip compressing the long tail.
+Free-text searches and unknown filter values fall back to building the
+response per request.
+"""
+
+import threading
+from itertools import product
+from typing import Callable, Dict, List, Optional, Tuple
+
+from ..config.compression import Precompressed
+from ..services.workouts import filter_exercises
+from .exercise_seed import SEED_EXERCISES
+from .workout_types import WORKOUT_TYPE_META
+
+# The library listing gains the user's custom exercises once they add one, so clients revalidate
+# it every time; the rest only changes with a deploy
+REVALIDATE = {"Cache-Control": "private, no-cache"}
+STATIC = {"Cache-Control": "private, max-age=3600"}
+PUBLIC = {"Cache-Control": "public, max-age=3600"}
+
+
+def workout_type_items(category: Optional[str] = None, level: Optional[str] = None,
+                       tag: Optional[str] = None) -> List[dict]:
+    """Workout types matching the filters, shaped like WorkoutTypeInfo."""
+    items = []
+    for wtype, meta in WORKOUT_TYPE_META.items():
+        if category and meta["category"] != category:
+            continue
+        if level and meta["level"] not in (level, "all"):
+            continue
+        if tag and tag.lower() not in [t.lower() for t in meta["tags"]]:
+            continue
+        items.append({
+            "type":     wtype.value,
+            "label":    meta["label"],
+            "category": meta["category"],
+            "level":    meta["level"],
+            "tags":     meta["tags"],
+        })
+    return items
+
+
+def _options(values) -> list:
+    return [None] + sorted(set(values))
+
+
+def _seed_list(key: Tuple) -> Precompressed:
+    return Precompressed(filter_exercises(SEED_EXERCISES, None, *key, is_custom=False, created_by=None), REVALIDATE)
+
+
+def _workout_type_list(key: Tuple) -> Precompressed:
+    return Precompressed(workout_type_items(*key), PUBLIC)
+
+
+_build_lock = threading.Lock()
+
+
+def _built(payloads: Dict[Tuple, Precompressed], key: Tuple, build: Callable[[Tuple], Precompressed]) -> Precompressed:
+    """payloads[key], building it on first use; `key` must be a known filter combination."""
+    payload = payloads.get(key)
+    if payload is None:
+        with _build_lock:
+            payload = payloads.get(key)
+            if payload is None:
+                payload = payloads[key] = build(key)
+    return payload
+
+
+_CATEGORIES = _options(m["category"] for m in WORKOUT_TYPE_META.values())
+_LEVELS = _options(m["level"] for m in WORKOUT_TYPE_META.values())
+_TAGS = _options(t.lower() for m in WORKOUT_TYPE_META.values() for t in m["tags"])
+_WORKOUT_TYPE_KEYS = set(product(_CATEGORIES, _LEVELS, _TAGS))
+_WORKOUT_TYPES: Dict[Tuple, Precompressed] = {(None, None, None): _workout_type_list((None, None, None))}
+
+_MUSCLE_GROUPS = _options(ex["muscle_group"] for ex in SEED_EXERCISES)
+_EQUIPMENT = _options(ex["equipment"] for ex in SEED_EXERCISES)
+_DIFFICULTIES = _options(ex["difficulty"] for ex in SEED_EXERCISES)
+_SEED_LIST_KEYS = set(product(_MUSCLE_GROUPS, _EQUIPMENT, _DIFFICULTIES))
+_SEED_LISTS: Dict[Tuple, Precompressed] = {(None, None, None): _seed_list((None, None, None))}
+_SEED_BY_ID: Dict[str, Precompressed] = {
+    ex["id"]: Precompressed({**ex, "is_custom": False, "created_by": None}, STATIC)
+    for ex in SEED_EXERCISES
+}
+_SEED_NAMES: Dict[str, str] = {ex["id"]: ex["name"] for ex in SEED_EXERCISES}
+
+MUSCLE_GROUPS = Precompressed(_MUSCLE_GROUPS[1:], STATIC)
+EQUIPMENT = Precompressed(_EQUIPMENT[1:], STATIC)
+
+
+def workout_types(category: Optional[str] = None, level: Optional[str] = None,
+                  tag: Optional[str] = None) -> Precompressed:
+    key = (category or None, level or None, tag.lower() if tag else None)
+    if key not in _WORKOUT_TYPE_KEYS:
+        # Not a value any workout type has; build it for this request only
+        return _workout_type_list(key)
+    return _built(_WORKOUT_TYPES, key, _workout_type_list)
+
+
+def seed_exercises(muscle_group: Optional[str] = None, equipment: Optional[str] = None,
+                   difficulty: Optional[str] = None) -> Optional[Precompressed]:
+    """The seed library for these filters; None if a value is unknown (filter per request)."""
+    key = (muscle_group or None, equipment or None, difficulty or None)
+    if key not in _SEED_LIST_KEYS:
+        return None
+    return _built(_SEED_LISTS, key, _seed_list)
+
+
+def seed_exercise(exercise_id: str) -> Optional[Precompressed]:
+    return _SEED_BY_ID.get(exercise_id)
+
+
+def seed_exercise_name(exercise_id: str) -> Optional[str]:
+    return _SEED_NAMES.get(exercise_id)
@@ -0,0 +1,117 @@
+"""
+Workout types a session can be tagged with, and their label, category, level
+and searchable tags. Served by /workout-types/ (see catalog.py) and copied
+onto each session when it is created.
+"""
+
+from enum import Enum
+
+
+class WorkoutType(str, Enum):
+    # HIIT / Cardio
+    HIIT                = "hiit"
+    # Gym / Equipment
+    GYM                 = "gym"
+    MACHINE             = "machine"
+    EQUIPMENT           = "equipment"
+    # Skill-level general
+    BEGINNER            = "beginner"
+    INTERMEDIATE        = "intermediate"
+    PRO                 = "pro"
+    # Yoga
+    YOGA                = "yoga"
+    MAT_YOGA            = "mat_yoga"
+    BEGINNER_YOGA       = "beginner_yoga"
+    INTERMEDIATE_YOGA   = "intermediate_yoga"
+    MORNING_YOGA        = "morning_yoga"
+    RELAXATION_YOGA     = "relaxation_yoga"
+    STRESS_RELIEF_YOGA  = "stress_relief_yoga"
+
+
+# Metadata: label, category, level, searchable tags
+WORKOUT_TYPE_META: dict = {
+    WorkoutType.HIIT: {
+        "label":    "HIIT",
+        "category": "cardio",
+        "level":    "intermediate",
+        "tags":     ["hiit", "cardio", "high-intensity", "fat-burn", "interval"],
+    },
+    WorkoutType.GYM: {
+        "label":    "Gym Workout",
+        "category": "gym",
+        "level":    "all",
+        "tags":     ["gym", "weights", "strength", "resistance"],
+    },
+    WorkoutType.MACHINE: {
+        "label":    "Machine Workout",
+        "category": "gym",
+        "level":    "all",
+        "tags":     ["machine", "gym", "equipment", "isolation", "cable"],
+    },
+    WorkoutType.EQUIPMENT: {
+        "label":    "Equipment Workout",
+        "category": "gym",
+        "level":    "all",
+        "tags":     ["equipment", "dumbbells", "barbells", "free-weights", "kettlebell"],
+    },
+    WorkoutType.BEGINNER: {
+        "label":    "Beginner Level",
+        "category": "general",
+        "level":    "beginner",
+        "tags":     ["beginner", "starter", "easy", "no-equipment", "bodyweight"],
+    },
+    WorkoutType.INTERMEDIATE: {
+        "label":    "Intermediate Level",
+        "category": "general",
+        "level":    "intermediate",
+        "tags":     ["intermediate", "moderate", "progression"],
+    },
+    WorkoutType.PRO: {
+        "label":    "Pro / Advanced",
+        "category": "general",
+        "level":    "advanced",
+        "tags":     ["pro", "advanced", "intense", "high-performance", "athlete"],
+    },
+    WorkoutType.YOGA: {
+        "label":    "Yoga",
+        "category": "yoga",
+        "level":    "all",
+        "tags":     ["yoga", "flexibility", "mindfulness", "balance", "stretch"],
+    },
+    WorkoutType.MAT_YOGA: {
+        "label":    "Mat Yoga",
+        "category": "yoga",
+        "level":    "all",
+        "tags":     ["mat-yoga", "yoga", "floor", "flexibility", "core"],
+    },
+    WorkoutType.BEGINNER_YOGA: {
+        "label":    "Beginner Yoga",
+        "category": "yoga",
+        "level":    "beginner",
+        "tags":     ["beginner-yoga", "yoga", "starter", "easy", "gentle"],
+    },
+    WorkoutType.INTERMEDIATE_YOGA: {
+        "label":    "Intermediate Yoga",
+        "category": "yoga",
+        "level":    "intermediate",
+        "tags":     ["intermediate-yoga", "yoga", "balance", "strength"],
+    },
+    WorkoutType.MORNING_YOGA: {
+        "label":    "Morning Yoga",
+        "category": "yoga",
+        "level":    "all",
+        "tags":     ["morning-yoga", "yoga", "energizing", "wake-up", "sunrise"],
+    },
+    WorkoutType.RELAXATION_YOGA: {
+        "label":    "Relaxation Yoga",
+        "category": "yoga",
+        "level":    "all",
+        "tags":     ["relaxation", "yoga", "calm", "restore", "yin", "restorative"],
+    },
+    WorkoutType.STRESS_RELIEF_YOGA: {
+        "label":    "Stress Relief Yoga",
+        "category": "yoga",
+        "level":    "all",
+        "tags":     ["stress-relief", "yoga", "mindfulness", "anxiety", "calm", "breathwork"],
+    },
+}
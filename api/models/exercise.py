@@ -1,6 +1,5 @@
 from pydantic import BaseModel
 from typing import Optional
-from datetime import datetime
 
 class FolderCreate(BaseModel):
     name: str
@@ -44,6 +43,8 @@ class ExerciseResponse(BaseModel):
     description: Optional[str] = None
     image: Optional[str] = None
     image_url: Optional[str] = None
+    image_hash: Optional[str] = None
+    thumbnails: Optional[dict] = None
     collectionId: Optional[str] = None
     collectionName: Optional[str] = None
     target_sets: Optional[int] = 3
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Dict, Optional
 
 
 class ExerciseLogCreate(BaseModel):
@@ -55,6 +55,8 @@ class PRResponse(BaseModel):
     max_reps: int
     best_volume: float
     exercise_id: str
+    best_1rm_estimate: float = 0
+    rep_maxes: Dict[str, float] = {}
 
 
 class MeasurementCreate(BaseModel):
@@ -0,0 +1,388 @@
+"""
+Prometheus-style metrics that add up across gunicorn workers.
+
+Every worker keeps its counters and histograms in memory and writes them to
+METRICS_DIR/<pid>.json at most once per METRICS_FLUSH_INTERVAL seconds.
+/metrics merges all the files in the directory, so a scrape reports every
+worker, not only the one that served it. Files left by dead workers are
+removed when merging. That looks like a counter reset, which Prometheus'
+rate() already handles.
+"""
+
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from ..config import ratelimit, resilience
+from ..config.cache import SWRCache, TTLCache, ownership_cache, read_cache, tag_index, token_cache
+from ..config.shared_cache import SharedCache
+from ..config.database import add_observer
+
+METRICS_DIR = os.environ.get("METRICS_DIR") or os.path.join(tempfile.gettempdir(), "workout_tracker_metrics")
+FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1.0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+# name -> (type, help, buckets)
+METRICS: Dict[str, Tuple[str, str, Optional[tuple]]] = {
+    "http_requests_total":
+        ("counter", "HTTP requests by route template, method and status", None),
+    "http_request_duration_seconds":
+        ("histogram", "HTTP request latency by route template and method", LATENCY_BUCKETS),
+    "pocketbase_operations_total":
+        ("counter", "Storage backend operations by collection, operation and outcome", None),
+    "pocketbase_operation_duration_seconds":
+        ("histogram", "Storage backend operation latency by collection and operation", LATENCY_BUCKETS),
+    "pocketbase_response_bytes_total":
+        ("counter", "Bytes read from the storage backend by collection and operation", None),
+    "pocketbase_calls_per_request":
+        ("histogram", "Storage backend operations issued per HTTP request, by route template", COUNT_BUCKETS),
+    "pocketbase_retries_total":
+        ("counter", "Backend reads retried after a connection error, timeout or 5xx, by collection", None),
+    "pocketbase_hedged_requests_total":
+        ("counter", "Backend reads that sent a second, hedged request, by collection", None),
+    "pocketbase_rejected_requests_total":
+        ("counter", "Backend calls failed fast because the collection's circuit was open", None),
+    "pocketbase_circuit_opened_total":
+        ("counter", "Times a collection's circuit breaker opened", None),
+    "pocketbase_circuit_state":
+        ("gauge", "Workers whose circuit breaker for the collection is in each state", None),
+    "rate_limited_requests_total":
+        ("counter", "Requests answered 429 by the per-user rate limiter, by route class", None),
+    "admission_rejected_requests_total":
+        ("counter", "Requests answered 503 because too many backend calls were in flight", None),
+    "rate_limit_skipped_total":
+        ("counter", "Rate limit checks let through unchecked because the bucket file was locked or broken", None),
+    "pocketbase_inflight_calls":
+        ("gauge", "PocketBase calls in flight, summed over workers", None),
+    "auth_verify_duration_seconds":
+        ("histogram", "Time spent verifying bearer tokens with PocketBase", LATENCY_BUCKETS),
+    "cache_hits_total":
+        ("counter", "Cache hits by cache", None),
+    "cache_misses_total":
+        ("counter", "Cache misses by cache", None),
+    "cache_stale_hits_total":
+        ("counter", "Hits served stale while refreshing in the background, by cache", None),
+    "cache_invalidation_failures_total":
+        ("counter", "Invalidations the shared cache file failed to record, by cache", None),
+    "cache_entries":
+        ("gauge", "Entries currently held, summed over workers (shared caches count once per worker)", None),
+    "cache_hit_ratio":
+        ("gauge", "hits / (hits + misses) over all workers since start", None),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+# The current request: its ASGI scope and the backend operations it has issued
+_request: ContextVar[Optional[dict]] = ContextVar("metrics_request", default=None)
+
+
+def _labels(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    def __init__(self, directory: str = METRICS_DIR):
+        self.directory = directory
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.gauges: Dict[Tuple[str, Labels], float] = {}
+        # [per-bucket counts..., +Inf count, sum]
+        self.histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        self.caches: Dict[str, Union[TTLCache, SharedCache, SWRCache]] = {}
+        self.collectors: List[Callable[["Registry"], None]] = []
+        self._lock = threading.Lock()
+        self._last_flush = 0.0
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = (name, _labels(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0.0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self._lock:
+            self.gauges[(name, _labels(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _labels(labels))
+        with self._lock:
+            hist = self.histograms.get(key)
+            if hist is None:
+                hist = self.histograms[key] = [0.0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    hist[i] += 1
+                    break
+            else:
+                hist[len(buckets)] += 1
+            hist[-1] += value
+
+    def set_counter(self, name: str, value: float, **labels):
+        """Set a counter from a running total kept elsewhere."""
+        with self._lock:
+            self.counters[(name, _labels(labels))] = value
+
+    def register_cache(self, name: str, cache: Union[TTLCache, SharedCache, SWRCache]):
+        self.caches[name] = cache
+
+    def add_collector(self, fn: Callable[["Registry"], None]):
+        """`fn(registry)` runs before every flush to refresh gauges (breaker state, ...)."""
+        self.collectors.append(fn)
+
+    def _collect(self):
+        for name, cache in self.caches.items():
+            # TTLCache counts since start, so set rather than increment
+            with self._lock:
+                self.counters[("cache_hits_total", _labels({"cache": name}))] = float(cache.hits)
+                self.counters[("cache_misses_total", _labels({"cache": name}))] = float(cache.misses)
+                self.gauges[("cache_entries", _labels({"cache": name}))] = float(len(cache))
+                if hasattr(cache, "stale_hits"):
+                    self.counters[("cache_stale_hits_total", _labels({"cache": name}))] = float(cache.stale_hits)
+                if cache.invalidation_failures:
+                    self.counters[("cache_invalidation_failures_total", _labels({"cache": name}))] = \
+                        float(cache.invalidation_failures)
+        for fn in self.collectors:
+            try:
+                fn(self)
+            except Exception as e:
+                print(f"Metrics collector error: {e}")
+
+    def snapshot(self) -> dict:
+        self._collect()
+        with self._lock:
+            return {
+                "pid": os.getpid(),
+                "updated": time.time(),
+                "counters": [[n, list(l), v] for (n, l), v in self.counters.items()],
+                "gauges": [[n, list(l), v] for (n, l), v in self.gauges.items()],
+                "histograms": [[n, list(l), list(h)] for (n, l), h in self.histograms.items()],
+            }
+
+    def flush(self, force: bool = False):
+        """Write this worker's snapshot, throttled to FLUSH_INTERVAL unless forced."""
+        now = time.monotonic()
+        if not force and now - self._last_flush < FLUSH_INTERVAL:
+            return
+        self._last_flush = now
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.json")
+            tmp = f"{path}.tmp"
+            with open(tmp, "w") as f:
+                json.dump(self.snapshot(), f)
+            os.replace(tmp, path)
+        except OSError as e:
+            print(f"Metrics flush failed: {e}")
+
+    def merged(self) -> dict:
+        """Sum of every live worker's snapshot in the metrics directory."""
+        self.flush(force=True)
+        counters: Dict[Tuple[str, Labels], float] = {}
+        gauges: Dict[Tuple[str, Labels], float] = {}
+        histograms: Dict[Tuple[str, Labels], List[float]] = {}
+        for filename in os.listdir(self.directory):
+            if not filename.endswith(".json"):
+                continue
+            path = os.path.join(self.directory, filename)
+            pid = int(filename[:-5]) if filename[:-5].isdigit() else None
+            if pid and pid != os.getpid() and not pid_alive(pid):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+                continue
+            try:
+                with open(path) as f:
+                    snap = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, labels, value in snap.get("counters", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                counters[key] = counters.get(key, 0.0) + value
+            for name, labels, value in snap.get("gauges", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                gauges[key] = gauges.get(key, 0.0) + value
+            for name, labels, values in snap.get("histograms", []):
+                key = (name, tuple(tuple(p) for p in labels))
+                if key in histograms:
+                    histograms[key] = [a + b for a, b in zip(histograms[key], values)]
+                else:
+                    histograms[key] = list(values)
+
+        for (name, labels), hits in list(counters.items()):
+            if name == "cache_hits_total":
+                misses = counters.get(("cache_misses_total", labels), 0.0)
+                gauges[("cache_hit_ratio", labels)] = hits / (hits + misses) if hits + misses else 0.0
+        return {"counters": counters, "gauges": gauges, "histograms": histograms}
+
+    def clear(self):
+        """Drop all worker files (including subdirectories such as queries/);
+        call once from the server master before forking."""
+        for root, _, files in os.walk(self.directory):
+            for filename in files:
+                try:
+                    os.remove(os.path.join(root, filename))
+                except OSError:
+                    pass
+
+
+def pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render(merged: dict) -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    by_name: Dict[str, list] = {}
+    for kind in ("counters", "gauges", "histograms"):
+        for (name, labels), value in merged[kind].items():
+            by_name.setdefault(name, []).append((labels, value))
+
+    lines = []
+    for name in sorted(by_name):
+        kind, help_text, buckets = METRICS.get(name, ("untyped", "", None))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for labels, value in sorted(by_name[name]):
+            if kind != "histogram":
+                lines.append(f"{name}{_fmt_labels(labels)} {_fmt_value(value)}")
+                continue
+            cumulative = 0.0
+            for bound, count in zip(list(buckets) + ["+Inf"], value[:-1]):
+                cumulative += count
+                le = bound if bound == "+Inf" else _fmt_value(bound)
+                lines.append(f"{name}_bucket{_fmt_labels(labels, (('le', le),))} {_fmt_value(cumulative)}")
+            lines.append(f"{name}_sum{_fmt_labels(labels)} {_fmt_value(value[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(labels)} {_fmt_value(cumulative)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+registry.register_cache("ownership", ownership_cache)
+registry.register_cache("read_cache", read_cache)
+registry.register_cache("tokens", token_cache)
+registry.register_cache("tag_index", tag_index)
+
+_RESILIENCE_COUNTERS = {
+    "retries":        "pocketbase_retries_total",
+    "hedged":         "pocketbase_hedged_requests_total",
+    "rejected":       "pocketbase_rejected_requests_total",
+    "breaker_opened": "pocketbase_circuit_opened_total",
+}
+
+
+def _collect_resilience(reg: Registry):
+    stats = resilience.stats()
+    for collection, state in stats["breakers"].items():
+        for s in resilience.STATES:
+            reg.set_gauge("pocketbase_circuit_state", 1.0 if s == state else 0.0, collection=collection, state=s)
+    for (name, collection), count in stats["counters"].items():
+        reg.set_counter(_RESILIENCE_COUNTERS[name], float(count), collection=collection)
+
+
+registry.add_collector(_collect_resilience)
+
+
+def _collect_ratelimit(reg: Registry):
+    stats = ratelimit.stats()
+    reg.set_gauge("pocketbase_inflight_calls", float(stats["inflight"]))
+    for (name, label), count in stats["counters"].items():
+        if name == "rate_limited":
+            reg.set_counter("rate_limited_requests_total", float(count), route_class=label)
+        elif name == "rate_limit_skipped":
+            reg.set_counter("rate_limit_skipped_total", float(count), reason=label)
+        else:
+            reg.set_counter("admission_rejected_requests_total", float(count))
+
+
+registry.add_collector(_collect_ratelimit)
+
+
+def route_template(scope: dict) -> str:
+    """The matched route's path template (bounded label cardinality), "unmatched" otherwise."""
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template is None:
+        return "unmatched"
+    path = scope.get("path", "")
+    regex = getattr(route, "path_regex", None)
+    if regex is not None and not regex.match(path):
+        # Newer FastAPI includes routers by reference, so the route lacks the include prefix
+        suffix = re.compile(regex.pattern.lstrip("^")).search(path)
+        if suffix:
+            return path[:suffix.start()] + template
+    return template
+
+
+def begin_request(scope: dict) -> object:
+    """Start counting backend calls for the current request; pass the result to end_request."""
+    return _request.set({"scope": scope, "calls": 0})
+
+
+def current_route() -> Optional[str]:
+    """The "METHOD /route/template" of the request being handled, if any."""
+    request = _request.get()
+    if request is None:
+        return None
+    return f"{request['scope'].get('method', '')} {route_template(request['scope'])}"
+
+
+def end_request(reset_token, route: str, method: str, status: int, seconds: float):
+    request = _request.get()
+    _request.reset(reset_token)
+    registry.inc("http_requests_total", route=route, method=method, status=status)
+    registry.observe("http_request_duration_seconds", seconds, route=route, method=method)
+    if request is not None:
+        registry.observe("pocketbase_calls_per_request", request["calls"], route=route)
+    registry.flush()
+
+
+def _record_table_op(event: dict):
+    if event["memo_hit"]:
+        if event["cache"] == "request_memo":
+            registry.inc("cache_hits_total", cache="request_memo")
+        else:
+            # The memo missed and read_cache answered; read_cache keeps its own hit/miss counts
+            registry.inc("cache_misses_total", cache="request_memo")
+        return
+    if event["op"] == "list":
+        registry.inc("cache_misses_total", cache="request_memo")
+    request = _request.get()
+    if request is not None:
+        request["calls"] += 1
+    outcome = "error" if event["error"] else "ok"
+    registry.inc("pocketbase_operations_total", collection=event["collection"], op=event["op"], outcome=outcome)
+    registry.observe("pocketbase_operation_duration_seconds", event["seconds"],
+                     collection=event["collection"], op=event["op"])
+    if event["bytes"]:
+        registry.inc("pocketbase_response_bytes_total", event["bytes"],
+                     collection=event["collection"], op=event["op"])
+
+
+add_observer(_record_table_op)
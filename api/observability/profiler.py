@@ -0,0 +1,159 @@
+"""
+On-demand sampling profiler for a single worker.
+
+While running, a background thread snapshots every other thread's Python
+stack with sys._current_frames() every `interval` seconds and counts the
+distinct stacks. Nothing is installed when no profile is running, so the
+idle cost is zero. When the run ends the counts are written to PROFILE_DIR as
+either collapsed stacks (flamegraph.pl / speedscope import) or a speedscope
+JSON file. Only one profile can run per worker at a time.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR") or os.path.join(tempfile.gettempdir(), "workout_tracker_profiles")
+PROFILE_MAX_SECONDS = float(os.environ.get("PROFILE_MAX_SECONDS", "120"))
+FORMATS = ("collapsed", "speedscope")
+MAX_DEPTH = 128
+
+_lock = threading.Lock()
+_active: Optional["Profile"] = None
+
+
+class Profile:
+    def __init__(self, seconds: float, interval: float, fmt: str):
+        self.seconds = seconds
+        self.interval = interval
+        self.format = fmt
+        self.started_at = time.time()
+        self.samples = 0
+        self.stacks: Counter = Counter()
+        ext = "collapsed.txt" if fmt == "collapsed" else "speedscope.json"
+        self.path = os.path.join(PROFILE_DIR, f"profile-{os.getpid()}-{int(self.started_at * 1000)}.{ext}")
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def _sample(self, own_ident: int, names: dict):
+        for ident, frame in sys._current_frames().items():
+            if ident == own_ident:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_DEPTH:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            stack.append((f"thread:{names.get(ident, ident)}", "", 0))
+            self.stacks[tuple(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        global _active
+        own_ident = threading.get_ident()
+        deadline = time.perf_counter() + self.seconds
+        try:
+            while time.perf_counter() < deadline:
+                names = {t.ident: t.name for t in threading.enumerate()}
+                self._sample(own_ident, names)
+                time.sleep(self.interval)
+            self._write()
+        except Exception as e:
+            print(f"Profiler error: {e}")
+        finally:
+            with _lock:
+                _active = None
+
+    def _write(self):
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            if self.format == "collapsed":
+                for stack, count in self.stacks.most_common():
+                    f.write(";".join(_frame_name(fr) for fr in stack) + f" {count}\n")
+            else:
+                json.dump(self._speedscope(), f)
+        os.replace(tmp, self.path)
+
+    def _speedscope(self) -> dict:
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.stacks.most_common():
+            ids = []
+            for fr in stack:
+                if fr not in index:
+                    index[fr] = len(frames)
+                    frames.append({"name": fr[0], "file": fr[1], "line": fr[2]} if fr[1] else {"name": fr[0]})
+                ids.append(index[fr])
+            samples.append(ids)
+            weights.append(round(count * self.interval, 6))
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": os.path.basename(self.path),
+            "exporter": "workout_tracker sampling profiler",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": f"pid {os.getpid()}",
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": round(sum(weights), 6),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+    def status(self) -> dict:
+        return {
+            "pid": os.getpid(),
+            "format": self.format,
+            "path": self.path,
+            "interval_ms": self.interval * 1000,
+            "started_at": self.started_at,
+            "ends_at": self.started_at + self.seconds,
+            "samples": self.samples,
+        }
+
+
+def _frame_name(frame: tuple) -> str:
+    name, filename, line = frame
+    if not filename:
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def start(seconds: float = 10.0, interval_ms: float = 10.0, fmt: str = "collapsed") -> Optional[dict]:
+    """Start profiling this worker; returns its status, or None if one is already running."""
+    global _active
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of {', '.join(FORMATS)}")
+    seconds = max(0.1, min(float(seconds), PROFILE_MAX_SECONDS))
+    interval = max(0.001, float(interval_ms) / 1000)
+    with _lock:
+        if _active is not None:
+            return None
+        _active = Profile(seconds, interval, fmt)
+        _active._thread.start()
+        return _active.status()
+
+
+def start_from_header(value: str) -> Optional[dict]:
+    """X-Profile: <seconds>[;speedscope]"""
+    seconds, _, fmt = value.partition(";")
+    try:
+        return start(float(seconds), fmt=fmt.strip() or "collapsed")
+    except ValueError:
+        return None
+
+
+def status() -> dict:
+    active = _active
+    try:
+        files = sorted(f for f in os.listdir(PROFILE_DIR) if f.startswith("profile-") and not f.endswith(".tmp"))
+    except OSError:
+        files = []
+    return {"running": active.status() if active else None, "profile_dir": PROFILE_DIR, "files": files}
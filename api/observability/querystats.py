@@ -0,0 +1,153 @@
+"""
+Query-shape statistics and slow-query log for the storage backend.
+
+Every table operation is reduced to a shape: collection, operation, and the
+filter fields without their values (Table.query_shape()). For each shape the
+worker keeps its count, errors, latency sum and max, and rows and bytes
+returned. Operations slower than SLOW_QUERY_MS are printed together with the
+route that issued them and kept in a short list of recent slow queries.
+
+Like the metrics, each worker writes its stats to METRICS_DIR/queries/<pid>.json
+and report() merges every live worker's file.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from ..config.database import add_observer
+from .metrics import FLUSH_INTERVAL, METRICS_DIR, current_route, pid_alive
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", "200"))
+SLOW_LOG_SIZE = int(os.environ.get("SLOW_LOG_SIZE", "100"))
+QUERIES_DIR = os.path.join(METRICS_DIR, "queries")
+
+SORT_KEYS = ("total_ms", "mean_ms", "max_ms", "count", "rows", "bytes", "errors")
+
+_lock = threading.Lock()
+# (collection, op, shape) -> [count, errors, total_seconds, max_seconds, rows, max_rows, bytes]
+_shapes: Dict[Tuple[str, str, str], list] = {}
+_slow: deque = deque(maxlen=SLOW_LOG_SIZE)
+_last_flush = 0.0
+
+
+def _record(event: dict):
+    if event["memo_hit"]:
+        return
+    key = (event["collection"], event["op"], event["shape"])
+    seconds, rows = event["seconds"], event["rows"]
+    with _lock:
+        stats = _shapes.get(key)
+        if stats is None:
+            stats = _shapes[key] = [0, 0, 0.0, 0.0, 0, 0, 0]
+        stats[0] += 1
+        stats[1] += 1 if event["error"] else 0
+        stats[2] += seconds
+        stats[3] = max(stats[3], seconds)
+        stats[4] += rows
+        stats[5] = max(stats[5], rows)
+        stats[6] += event["bytes"]
+
+    if seconds * 1000 >= SLOW_QUERY_MS:
+        route = current_route() or "-"
+        entry = {
+            "at":         time.time(),
+            "pid":        os.getpid(),
+            "route":      route,
+            "collection": event["collection"],
+            "op":         event["op"],
+            "shape":      event["shape"],
+            "filter":     event["filter"][:200],
+            "ms":         round(seconds * 1000, 3),
+            "rows":       rows,
+            "bytes":      event["bytes"],
+            "error":      event["error"],
+        }
+        _slow.append(entry)
+        print(f"Slow query {entry['ms']:.1f}ms {event['op']} {event['collection']} "
+              f"[{event['shape'] or '*'}] rows={rows} route={route}")
+    flush()
+
+
+def flush(force: bool = False):
+    global _last_flush
+    now = time.monotonic()
+    if not force and now - _last_flush < FLUSH_INTERVAL:
+        return
+    _last_flush = now
+    with _lock:
+        snapshot = {
+            "pid": os.getpid(),
+            "shapes": [[list(k), list(v)] for k, v in _shapes.items()],
+            "slow": list(_slow),
+        }
+    try:
+        os.makedirs(QUERIES_DIR, exist_ok=True)
+        path = os.path.join(QUERIES_DIR, f"{os.getpid()}.json")
+        with open(f"{path}.tmp", "w") as f:
+            json.dump(snapshot, f)
+        os.replace(f"{path}.tmp", path)
+    except OSError as e:
+        print(f"Query stats flush failed: {e}")
+
+
+def report(sort: str = "total_ms", limit: int = 50, collection: Optional[str] = None) -> dict:
+    """Merged shape stats for all live workers, plus their recent slow queries (newest first)."""
+    flush(force=True)
+    merged: Dict[Tuple[str, str, str], list] = {}
+    slow: List[dict] = []
+    for filename in os.listdir(QUERIES_DIR):
+        if not filename.endswith(".json"):
+            continue
+        path = os.path.join(QUERIES_DIR, filename)
+        pid = int(filename[:-5]) if filename[:-5].isdigit() else None
+        if pid and pid != os.getpid() and not pid_alive(pid):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            continue
+        try:
+            with open(path) as f:
+                snap = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for key, v in snap.get("shapes", []):
+            key = tuple(key)
+            m = merged.get(key)
+            if m is None:
+                merged[key] = list(v)
+            else:
+                merged[key] = [m[0] + v[0], m[1] + v[1], m[2] + v[2], max(m[3], v[3]),
+                               m[4] + v[4], max(m[5], v[5]), m[6] + v[6]]
+        slow.extend(snap.get("slow", []))
+
+    shapes = []
+    for (coll, op, shape), (count, errors, total, worst, rows, max_rows, nbytes) in merged.items():
+        if collection and coll != collection:
+            continue
+        shapes.append({
+            "collection": coll,
+            "op":         op,
+            "shape":      shape,
+            "count":      count,
+            "errors":     errors,
+            "total_ms":   round(total * 1000, 3),
+            "mean_ms":    round(total * 1000 / count, 3) if count else 0.0,
+            "max_ms":     round(worst * 1000, 3),
+            "rows":       rows,
+            "mean_rows":  round(rows / count, 1) if count else 0.0,
+            "max_rows":   max_rows,
+            "bytes":      nbytes,
+        })
+    shapes.sort(key=lambda s: s[sort], reverse=True)
+    slow.sort(key=lambda s: s["at"], reverse=True)
+    if collection:
+        slow = [s for s in slow if s["collection"] == collection]
+    return {"slow_query_ms": SLOW_QUERY_MS, "shapes": shapes[:limit], "slow": slow[:limit]}
+
+
+add_observer(_record)
@@ -0,0 +1,168 @@
+"""
+Lightweight request tracing.
+
+A trace is one HTTP request with a child span per table operation
+(collection, op, query shape, filter, rows, bytes, memo hit). Spans are
+collected for every request while tracing is enabled. When the request ends
+the trace is kept if it was head-sampled (TRACE_SAMPLE_RATE), if it was slower
+than TRACE_SLOW_MS, or if an admin forced it with the X-Trace header; all
+other traces are dropped. Kept traces go to an in-memory ring buffer and,
+when TRACE_FILE is set, to a size-rotated JSONL file that every worker
+appends to.
+
+Each trace also lists N+1 suspects: the same collection/op/shape issued
+TRACE_N_PLUS_ONE times or more within one request.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import List, Optional
+
+from ..config.database import add_observer
+
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+TRACE_SLOW_MS = float(os.environ.get("TRACE_SLOW_MS", "500"))
+TRACE_BUFFER_SIZE = int(os.environ.get("TRACE_BUFFER_SIZE", "200"))
+TRACE_FILE = os.environ.get("TRACE_FILE", "")
+TRACE_FILE_MAX_BYTES = int(os.environ.get("TRACE_FILE_MAX_BYTES", str(20 * 1024 * 1024)))
+TRACE_N_PLUS_ONE = int(os.environ.get("TRACE_N_PLUS_ONE", "5"))
+MAX_SPANS = 500
+
+ENABLED = TRACE_SAMPLE_RATE > 0 or TRACE_SLOW_MS > 0
+
+_current: ContextVar[Optional["Trace"]] = ContextVar("current_trace", default=None)
+_buffer: deque = deque(maxlen=TRACE_BUFFER_SIZE)
+_file_lock = threading.Lock()
+
+
+class Trace:
+    def __init__(self, method: str, path: str, sampled: bool):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.method = method
+        self.path = path
+        self.sampled = sampled
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.spans: List[dict] = []
+        self.dropped_spans = 0
+
+    def add_span(self, event: dict):
+        if len(self.spans) >= MAX_SPANS:
+            self.dropped_spans += 1
+            return
+        end = time.perf_counter()
+        self.spans.append({
+            "name":        f"{event['op']} {event['collection']}",
+            "collection":  event["collection"],
+            "op":          event["op"],
+            "shape":       event["shape"],
+            "filter":      event["filter"][:200],
+            "rows":        event["rows"],
+            "bytes":       event["bytes"],
+            "error":       event["error"],
+            "memo_hit":    event["memo_hit"],
+            "cache":       event["cache"],
+            "offset_ms":   round((end - event["seconds"] - self.start) * 1000, 3),
+            "duration_ms": round(event["seconds"] * 1000, 3),
+        })
+
+    def to_dict(self, route: str, status: int, duration: float) -> dict:
+        repeats = Counter((s["collection"], s["op"], s["shape"]) for s in self.spans if not s["memo_hit"])
+        return {
+            "trace_id":      self.trace_id,
+            "pid":           os.getpid(),
+            "method":        self.method,
+            "route":         route,
+            "path":          self.path,
+            "status":        status,
+            "started_at":    self.started_at,
+            "duration_ms":   round(duration * 1000, 3),
+            "backend_calls": sum(1 for s in self.spans if not s["memo_hit"]),
+            "backend_ms":    round(sum(s["duration_ms"] for s in self.spans), 3),
+            "n_plus_one":    [
+                {"collection": c, "op": op, "shape": shape, "count": n}
+                for (c, op, shape), n in repeats.most_common() if n >= TRACE_N_PLUS_ONE
+            ],
+            "dropped_spans": self.dropped_spans,
+            "spans":         self.spans,
+        }
+
+
+def begin_trace(method: str, path: str, force: bool = False):
+    """Start collecting spans for this request; returns a token for end_trace (None if off)."""
+    if not (ENABLED or force):
+        return None
+    sampled = force or (TRACE_SAMPLE_RATE > 0 and random.random() < TRACE_SAMPLE_RATE)
+    return _current.set(Trace(method, path, sampled))
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current.get()
+    return trace.trace_id if trace else None
+
+
+def end_trace(reset_token, route: str, status: int) -> Optional[dict]:
+    if reset_token is None:
+        return None
+    trace = _current.get()
+    _current.reset(reset_token)
+    duration = time.perf_counter() - trace.start
+    if not (trace.sampled or (TRACE_SLOW_MS > 0 and duration * 1000 >= TRACE_SLOW_MS)):
+        return None
+    record = trace.to_dict(route, status, duration)
+    _buffer.append(record)
+    if TRACE_FILE:
+        _write(record)
+    return record
+
+
+def _write(record: dict):
+    line = json.dumps(record, separators=(",", ":")) + "\n"
+    with _file_lock:
+        try:
+            if os.path.exists(TRACE_FILE) and os.path.getsize(TRACE_FILE) + len(line) > TRACE_FILE_MAX_BYTES:
+                os.replace(TRACE_FILE, f"{TRACE_FILE}.1")
+            with open(TRACE_FILE, "a") as f:
+                f.write(line)
+        except OSError as e:
+            print(f"Trace export failed: {e}")
+
+
+def _read_file_traces() -> List[dict]:
+    traces = []
+    for path in (f"{TRACE_FILE}.1", TRACE_FILE):
+        try:
+            with open(path) as f:
+                for line in f:
+                    try:
+                        traces.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return traces
+
+
+def slowest(limit: int = 20, route: Optional[str] = None, min_ms: float = 0.0) -> List[dict]:
+    """Slowest recent kept traces: from TRACE_FILE (all workers) if set, else this worker's buffer."""
+    traces = _read_file_traces() if TRACE_FILE else list(_buffer)
+    if route:
+        traces = [t for t in traces if t["route"] == route]
+    traces = [t for t in traces if t["duration_ms"] >= min_ms]
+    traces.sort(key=lambda t: t["duration_ms"], reverse=True)
+    return traces[:limit]
+
+
+def _record_span(event: dict):
+    trace = _current.get()
+    if trace is not None:
+        trace.add_span(event)
+
+
+add_observer(_record_span)
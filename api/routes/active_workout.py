@@ -6,6 +6,8 @@ from ..models.active_session import (
     ActiveSetCreate, ActiveSetUpdate, ActiveSetResponse,
     WorkoutFinishSummary
 )
+from ..services import personal_records
+from ..services.workouts import set_volume, group_sets_by_exercise
 from api.auth.auth_bearer import JWTBearer
 import datetime
 
@@ -15,7 +17,7 @@ router = APIRouter()
 # ── ACTIVE WORKOUT ROUTES ─────────────────────────────────────────────────────
 
 @router.get("/active-workout/current/", dependencies=[Depends(JWTBearer())])
-async def get_current_session(current_user: dict = Depends(JWTBearer())):
+def get_current_session(current_user: dict = Depends(JWTBearer())):
     """Returns the in-progress session if one exists, else null."""
     try:
         token   = current_user.get("_token")
@@ -28,15 +30,17 @@ async def get_current_session(current_user: dict = Depends(JWTBearer())):
         session = items[0]
 
         sets_result = pocketbase.table("active_session_sets", token=token)\
-                                .eq("session_id", session["id"]).execute()
+                                .eq("user_id", user_id).eq("session_id", session["id"]).execute()
         sets = sorted(sets_result.get("items", []), key=lambda x: (x.get("exercise_name",""), x.get("set_number", 0)))
         return {**session, "sets": sets}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/active-workout/", response_model=ActiveSessionResponse, dependencies=[Depends(JWTBearer())])
-async def start_session(session: ActiveSessionCreate, current_user: dict = Depends(JWTBearer())):
+def start_session(session: ActiveSessionCreate, current_user: dict = Depends(JWTBearer())):
     """Start a new active workout session (blank or from template)."""
     try:
         token   = current_user.get("_token")
@@ -46,7 +50,7 @@ async def start_session(session: ActiveSessionCreate, current_user: dict = Depen
         existing = pocketbase.table("active_workout_sessions", token=token)\
                              .eq("user_id", user_id).eq("status", "active").execute()
         for old in existing.get("items", []):
-            pocketbase.table("active_session_sets", token=token).eq("session_id", old["id"]).delete()
+            pocketbase.table("active_session_sets", token=token).eq("user_id", user_id).eq("session_id", old["id"]).delete()
             pocketbase.table("active_workout_sessions", token=token).eq("id", old["id"]).delete()
 
         data = {
@@ -67,7 +71,7 @@ async def start_session(session: ActiveSessionCreate, current_user: dict = Depen
         if session.template_id:
             try:
                 tex_result = pocketbase.table("template_exercises", token=token)\
-                                       .eq("template_id", session.template_id).execute()
+                                       .eq("user_id", user_id).eq("template_id", session.template_id).execute()
                 template_exercises = sorted(tex_result.get("items", []), key=lambda x: x.get("order_index", 0))
 
                 # Get last session data for pre-filling weights
@@ -80,6 +84,7 @@ async def start_session(session: ActiveSessionCreate, current_user: dict = Depen
                     target_sets = int(tex.get("target_sets") or 3)
                     for s in range(1, target_sets + 1):
                         set_data = {
+                            "user_id":             user_id,
                             "session_id":          new_session["id"],
                             "exercise_library_id": ex_id,
                             "exercise_name":       ex_name,
@@ -117,7 +122,7 @@ def _get_last_weights(token: str, user_id: str) -> dict:
 
 
 @router.get("/active-workout/{session_id}/", dependencies=[Depends(JWTBearer())])
-async def get_session(session_id: str, current_user: dict = Depends(JWTBearer())):
+def get_session(session_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
@@ -129,7 +134,7 @@ async def get_session(session_id: str, current_user: dict = Depends(JWTBearer())
         session = s_result["items"][0]
 
         sets_result = pocketbase.table("active_session_sets", token=token)\
-                                .eq("session_id", session_id).execute()
+                                .eq("user_id", user_id).eq("session_id", session_id).execute()
         sets = sorted(sets_result.get("items", []), key=lambda x: (x.get("exercise_name",""), x.get("set_number", 0)))
         return {**session, "sets": sets}
     except HTTPException:
@@ -140,10 +145,14 @@ async def get_session(session_id: str, current_user: dict = Depends(JWTBearer())
 
 @router.post("/active-workout/{session_id}/sets/",
              response_model=ActiveSetResponse, dependencies=[Depends(JWTBearer())])
-async def add_set(session_id: str, set_data: ActiveSetCreate, current_user: dict = Depends(JWTBearer())):
+def add_set(session_id: str, set_data: ActiveSetCreate, current_user: dict = Depends(JWTBearer())):
     try:
-        token = current_user.get("_token")
+        token   = current_user.get("_token")
+        user_id = current_user.get("id")
+        if not pocketbase.owns("active_workout_sessions", session_id, user_id, token=token):
+            raise HTTPException(status_code=404, detail="Session not found")
         data  = {
+            "user_id":             user_id,
             "session_id":          session_id,
             "exercise_library_id": set_data.exercise_library_id,
             "exercise_name":       set_data.exercise_name,
@@ -166,13 +175,18 @@ async def add_set(session_id: str, set_data: ActiveSetCreate, current_user: dict
 
 @router.put("/active-workout/{session_id}/sets/{set_id}/",
             response_model=ActiveSetResponse, dependencies=[Depends(JWTBearer())])
-async def update_set(
+def update_set(
     session_id: str, set_id: str,
     set_data: ActiveSetUpdate,
     current_user: dict = Depends(JWTBearer())
 ):
     try:
-        token = current_user.get("_token")
+        token   = current_user.get("_token")
+        user_id = current_user.get("id")
+        existing = pocketbase.table("active_session_sets", token=token).eq("id", set_id)\
+                             .eq("user_id", user_id).eq("session_id", session_id).execute()
+        if not existing.get("items"):
+            raise HTTPException(status_code=404, detail="Set not found")
         data  = {"id": set_id}
         if set_data.reps is not None:         data["reps"] = set_data.reps
         if set_data.weight_kg is not None:    data["weight_kg"] = set_data.weight_kg
@@ -192,18 +206,22 @@ async def update_set(
 
 
 @router.delete("/active-workout/{session_id}/sets/{set_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_set(session_id: str, set_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_set(session_id: str, set_id: str, current_user: dict = Depends(JWTBearer())):
     try:
-        token = current_user.get("_token")
-        pocketbase.table("active_session_sets", token=token).eq("id", set_id).eq("session_id", session_id).delete()
+        token   = current_user.get("_token")
+        user_id = current_user.get("id")
+        pocketbase.table("active_session_sets", token=token).eq("id", set_id).eq("user_id", user_id)\
+                  .eq("session_id", session_id).delete()
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/active-workout/{session_id}/finish/",
              response_model=WorkoutFinishSummary, dependencies=[Depends(JWTBearer())])
-async def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer())):
+def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer())):
     """
     Finalise the active workout:
     1. Save to workout_sessions
@@ -224,7 +242,7 @@ async def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer
 
         # Get all sets
         sets_result = pocketbase.table("active_session_sets", token=token)\
-                                .eq("session_id", session_id).execute()
+                                .eq("user_id", user_id).eq("session_id", session_id).execute()
         all_sets     = sets_result.get("items", [])
         completed    = [s for s in all_sets if s.get("is_completed")]
 
@@ -237,11 +255,9 @@ async def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer
             duration = 0
 
         # Compute totals
-        total_volume = sum(
-            float(s.get("reps") or 0) * float(s.get("weight_kg") or 0)
-            for s in completed
-        )
-        unique_exercises = list({s.get("exercise_library_id") for s in completed if s.get("exercise_library_id")})
+        total_volume = sum(set_volume(s) for s in completed)
+        sets_by_exercise = group_sets_by_exercise(completed)
+        unique_exercises = list(sets_by_exercise)
 
         # Save to workout_sessions
         session_data = {
@@ -264,6 +280,7 @@ async def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer
 
         # Save exercise logs
         now_iso = datetime.datetime.utcnow().isoformat() + "Z"
+        logs_by_exercise = {}
         for s in completed:
             log_data = {
                 "user_id":             user_id,
@@ -278,65 +295,21 @@ async def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer
                 "session_id":          workout_session_id or "",
                 "is_pr":               False,
             }
-            pocketbase.table("exercise_logs", token=token).insert(log_data)
+            log_result = pocketbase.table("exercise_logs", token=token).insert(log_data)
+            if log_result.get("items") and log_data["exercise_id"]:
+                logs_by_exercise.setdefault(log_data["exercise_id"], []).append(log_result["items"][0])
 
-        # Detect PRs per exercise
+        # Fold the new logs into each exercise's records (services/personal_records.py)
         new_prs = []
-        for ex_id in unique_exercises:
-            ex_sets = [s for s in completed if s.get("exercise_library_id") == ex_id]
-            if not ex_sets:
-                continue
-
-            session_max_weight = max(float(s.get("weight_kg") or 0) for s in ex_sets)
-            session_max_reps   = max(int(s.get("reps") or 0) for s in ex_sets)
-            session_volume     = sum(float(s.get("reps") or 0) * float(s.get("weight_kg") or 0) for s in ex_sets)
-            # Epley 1RM estimate
-            best_set = max(ex_sets, key=lambda s: float(s.get("weight_kg") or 0))
-            w = float(best_set.get("weight_kg") or 0)
-            r = int(best_set.get("reps") or 0)
-            one_rm = round(w * (1 + r / 30), 2) if r > 0 else w
-
-            # Check existing PR
-            pr_result = pocketbase.table("personal_records", token=token)\
-                                  .eq("user_id", user_id).eq("exercise_library_id", ex_id).execute()
-            pr_items  = pr_result.get("items", [])
-
-            is_new_pr = False
-            if pr_items:
-                pr = pr_items[0]
-                if (session_max_weight > float(pr.get("max_weight_kg") or 0) or
-                    session_max_reps   > int(pr.get("max_reps") or 0) or
-                    session_volume     > float(pr.get("best_volume") or 0)):
-                    is_new_pr = True
-                    pr_data = {
-                        "id":                pr["id"],
-                        "max_weight_kg":     max(session_max_weight, float(pr.get("max_weight_kg") or 0)),
-                        "max_reps":          max(session_max_reps, int(pr.get("max_reps") or 0)),
-                        "best_volume":       max(session_volume, float(pr.get("best_volume") or 0)),
-                        "best_1rm_estimate": max(one_rm, float(pr.get("best_1rm_estimate") or 0)),
-                        "achieved_at":       now_iso,
-                    }
-                    pocketbase.table("personal_records", token=token).update(pr_data)
-            else:
-                is_new_pr = True
-                pr_data = {
-                    "user_id":             user_id,
-                    "exercise_library_id": ex_id,
-                    "exercise_name":       ex_sets[0].get("exercise_name", ""),
-                    "max_weight_kg":       session_max_weight,
-                    "max_reps":            session_max_reps,
-                    "best_volume":         session_volume,
-                    "best_1rm_estimate":   one_rm,
-                    "achieved_at":         now_iso,
-                }
-                pocketbase.table("personal_records", token=token).insert(pr_data)
-
-            if is_new_pr:
-                new_prs.append(ex_sets[0].get("exercise_name", ex_id))
+        for ex_id, ex_sets in sets_by_exercise.items():
+            name = ex_sets[0].get("exercise_name", "")
+            if personal_records.record(token, user_id, ex_id, name, logs_by_exercise.get(ex_id, []), now_iso):
+                new_prs.append(name or ex_id)
 
         # Delete active session + sets
-        pocketbase.table("active_session_sets", token=token).eq("session_id", session_id).delete()
+        pocketbase.table("active_session_sets", token=token).eq("user_id", user_id).eq("session_id", session_id).delete()
         pocketbase.table("active_workout_sessions", token=token).eq("id", session_id).delete()
+        pocketbase.forget_owner("active_workout_sessions", session_id, user_id)
 
         # Update template last_used_at
         if session.get("template_id"):
@@ -365,14 +338,17 @@ async def finish_workout(session_id: str, current_user: dict = Depends(JWTBearer
 
 
 @router.delete("/active-workout/{session_id}/", dependencies=[Depends(JWTBearer())])
-async def discard_session(session_id: str, current_user: dict = Depends(JWTBearer())):
+def discard_session(session_id: str, current_user: dict = Depends(JWTBearer())):
     """Discard an active workout without saving."""
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
-        pocketbase.table("active_session_sets", token=token).eq("session_id", session_id).delete()
+        pocketbase.table("active_session_sets", token=token).eq("user_id", user_id).eq("session_id", session_id).delete()
         pocketbase.table("active_workout_sessions", token=token)\
                   .eq("id", session_id).eq("user_id", user_id).delete()
+        pocketbase.forget_owner("active_workout_sessions", session_id, user_id)
         return {"discarded": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,30 +1,20 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request
 from typing import List, Optional
 from ..config.database import pocketbase
 from ..models.exercise_library import ExerciseLibraryCreate, ExerciseLibraryResponse
+from ..data import catalog
 from ..data.exercise_seed import SEED_EXERCISES
+from ..services.workouts import filter_exercises
 from api.auth.auth_bearer import JWTBearer
 
 router = APIRouter()
 
 
-def _exercise_matches(ex: dict, search: Optional[str], muscle_group: Optional[str],
-                      equipment: Optional[str], difficulty: Optional[str]) -> bool:
-    if search and search.lower() not in ex["name"].lower():
-        return False
-    if muscle_group and ex["muscle_group"] != muscle_group:
-        return False
-    if equipment and ex["equipment"] != equipment:
-        return False
-    if difficulty and ex["difficulty"] != difficulty:
-        return False
-    return True
-
-
 # ── EXERCISE LIBRARY ROUTES ───────────────────────────────────────────────────
 
 @router.get("/exercise-library/", dependencies=[Depends(JWTBearer())])
-async def list_exercises(
+def list_exercises(
+    request:      Request,
     current_user: dict = Depends(JWTBearer()),
     search:       Optional[str] = Query(None),
     muscle_group: Optional[str] = Query(None),
@@ -36,38 +26,51 @@ async def list_exercises(
         token   = current_user.get("_token")
         user_id = current_user.get("id")
 
-        # Filter seed exercises
-        filtered = [
-            {**ex, "is_custom": False, "created_by": None}
-            for ex in SEED_EXERCISES
-            if _exercise_matches(ex, search, muscle_group, equipment, difficulty)
-        ]
-
         # Fetch user's custom exercises from PocketBase
         try:
-            result = pocketbase.table("custom_exercises", token=token).eq("created_by", user_id).execute()
+            result = pocketbase.table("custom_exercises", token=token).eq("created_by", user_id).cached().execute()
             custom = result.get("items", [])
-            custom_filtered = [
-                {**ex, "is_custom": True}
-                for ex in custom
-                if _exercise_matches(ex, search, muscle_group, equipment, difficulty)
-            ]
-            filtered.extend(custom_filtered)
         except Exception:
-            pass  # custom_exercises collection may not exist yet
+            custom = []  # custom_exercises collection may not exist yet
+
+        # Seed exercises only: serve the prebuilt response for these filters
+        if not custom and not search:
+            payload = catalog.seed_exercises(muscle_group, equipment, difficulty)
+            if payload is not None:
+                return payload.response(request)
+
+        # Filter seed exercises
+        filtered = filter_exercises(SEED_EXERCISES, search, muscle_group, equipment, difficulty,
+                                    is_custom=False, created_by=None)
+        filtered.extend(filter_exercises(custom, search, muscle_group, equipment, difficulty, is_custom=True))
 
         return filtered
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
+# Declared before /exercise-library/{exercise_id}/, which would otherwise match these paths
+@router.get("/exercise-library/muscle-groups/", dependencies=[Depends(JWTBearer())])
+async def list_muscle_groups(request: Request):
+    """Return unique muscle groups from seed data."""
+    return catalog.MUSCLE_GROUPS.response(request)
+
+
+@router.get("/exercise-library/equipment-list/", dependencies=[Depends(JWTBearer())])
+async def list_equipment(request: Request):
+    """Return unique equipment types from seed data."""
+    return catalog.EQUIPMENT.response(request)
+
+
 @router.get("/exercise-library/{exercise_id}/", dependencies=[Depends(JWTBearer())])
-async def get_exercise(exercise_id: str, current_user: dict = Depends(JWTBearer())):
+def get_exercise(exercise_id: str, request: Request, current_user: dict = Depends(JWTBearer())):
     """Get a single exercise by id (seed or custom)."""
     # Check seed first
-    for ex in SEED_EXERCISES:
-        if ex["id"] == exercise_id:
-            return {**ex, "is_custom": False, "created_by": None}
+    payload = catalog.seed_exercise(exercise_id)
+    if payload is not None:
+        return payload.response(request)
 
     # Check custom exercises
     try:
@@ -84,7 +87,7 @@ async def get_exercise(exercise_id: str, current_user: dict = Depends(JWTBearer(
 
 @router.post("/exercise-library/custom/", response_model=ExerciseLibraryResponse,
              dependencies=[Depends(JWTBearer())])
-async def create_custom_exercise(
+def create_custom_exercise(
     exercise: ExerciseLibraryCreate,
     current_user: dict = Depends(JWTBearer())
 ):
@@ -115,25 +118,13 @@ async def create_custom_exercise(
 
 
 @router.delete("/exercise-library/custom/{exercise_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_custom_exercise(exercise_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_custom_exercise(exercise_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
         pocketbase.table("custom_exercises", token=token).eq("id", exercise_id).eq("created_by", user_id).delete()
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-
-
-@router.get("/exercise-library/muscle-groups/", dependencies=[Depends(JWTBearer())])
-async def list_muscle_groups():
-    """Return unique muscle groups from seed data."""
-    groups = sorted(set(ex["muscle_group"] for ex in SEED_EXERCISES))
-    return groups
-
-
-@router.get("/exercise-library/equipment-list/", dependencies=[Depends(JWTBearer())])
-async def list_equipment():
-    """Return unique equipment types from seed data."""
-    equip = sorted(set(ex["equipment"] for ex in SEED_EXERCISES))
-    return equip
@@ -1,11 +1,14 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Union
 from ..config.database import pocketbase
 from ..models.logs import (
     ExerciseLogCreate, ExerciseLogResponse,
     WorkoutLogCreate, WorkoutLogResponse,
     PRResponse
 )
+from ..models.page import Page
+from ..services import personal_records
+from ..services.query_plan import ListQuery, PageParams
 from api.auth.auth_bearer import JWTBearer
 import datetime
 
@@ -15,7 +18,7 @@ router = APIRouter()
 # ── EXERCISE LOG ROUTES ───────────────────────────────────────────────────────
 
 @router.post("/exercise-logs/", response_model=ExerciseLogResponse, dependencies=[Depends(JWTBearer())])
-async def create_exercise_log(log: ExerciseLogCreate, current_user: dict = Depends(JWTBearer())):
+def create_exercise_log(log: ExerciseLogCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
@@ -31,66 +34,75 @@ async def create_exercise_log(log: ExerciseLogCreate, current_user: dict = Depen
         result = pocketbase.table("exercise_logs", token=token).insert(data)
         if not result.get("items"):
             raise HTTPException(status_code=400, detail=f"Failed to create log: {result.get('error')}")
-        return result["items"][0]
+        item = result["items"][0]
+        personal_records.record(token, user_id, log.exercise_id,
+                                personal_records.exercise_name(token, user_id, log.exercise_id),
+                                [item], data["logged_at"])
+        return item
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/exercise-logs/", response_model=List[ExerciseLogResponse], dependencies=[Depends(JWTBearer())])
-async def get_exercise_logs(exercise_id: str, current_user: dict = Depends(JWTBearer())):
+@router.get("/exercise-logs/", response_model=Union[List[ExerciseLogResponse], Page[ExerciseLogResponse]],
+            dependencies=[Depends(JWTBearer())])
+def get_exercise_logs(
+    exercise_id: str,
+    response: Response,
+    current_user: dict = Depends(JWTBearer()),
+    paging: PageParams = Depends(),
+):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        result = pocketbase.table("exercise_logs", token=token).eq("user_id", user_id).eq("exercise_id", exercise_id).execute()
-        items = result.get("items", [])
-        # Sort by logged_at desc, return last 5
-        items_sorted = sorted(items, key=lambda x: x.get("logged_at", x.get("created", "")), reverse=True)
-        return items_sorted[:20]
+        query = ListQuery("exercise_logs", token, user_id).where("exercise_id", exercise_id).order("-logged_at", "-id")
+        # The legacy response is the latest 20 by logged_at
+        result = paging.run(query, response, legacy_limit=20)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.delete("/exercise-logs/{log_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_exercise_log(log_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_exercise_log(log_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
-        result = pocketbase.table("exercise_logs", token=token).eq("id", log_id).delete()
+        user_id = current_user.get("id")
+        result = pocketbase.table("exercise_logs", token=token).eq("id", log_id).eq("user_id", user_id).delete()
+        for item in result.get("items", []):
+            personal_records.forget(token, user_id, item)
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/exercise-logs/pr/", response_model=PRResponse, dependencies=[Depends(JWTBearer())])
-async def get_exercise_pr(exercise_id: str, current_user: dict = Depends(JWTBearer())):
+def get_exercise_pr(exercise_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        result = pocketbase.table("exercise_logs", token=token).eq("user_id", user_id).eq("exercise_id", exercise_id).execute()
-        items = result.get("items", [])
-        if not items:
+        pr = personal_records.lookup(token, user_id, exercise_id)
+        if not pr:
             return PRResponse(max_weight_kg=0, max_reps=0, best_volume=0, exercise_id=exercise_id)
-
-        max_weight = max((float(i.get("weight_kg") or 0) for i in items), default=0)
-        max_reps = max((int(i.get("reps") or 0) for i in items), default=0)
-        best_volume = max(
-            (float(i.get("sets") or 0) * float(i.get("reps") or 0) * float(i.get("weight_kg") or 0) for i in items),
-            default=0
-        )
-        return PRResponse(max_weight_kg=max_weight, max_reps=max_reps, best_volume=best_volume, exercise_id=exercise_id)
+        return PRResponse(**{**pr, "exercise_id": exercise_id})
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/exercise-logs/chart/", dependencies=[Depends(JWTBearer())])
-async def get_exercise_chart(exercise_id: str, current_user: dict = Depends(JWTBearer())):
+def get_exercise_chart(exercise_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        result = pocketbase.table("exercise_logs", token=token).eq("user_id", user_id).eq("exercise_id", exercise_id).execute()
-        items = result.get("items", [])
-        items_sorted = sorted(items, key=lambda x: x.get("logged_at", x.get("created", "")))
+        items_sorted = ListQuery("exercise_logs", token, user_id).where("exercise_id", exercise_id)\
+            .order("logged_at|created").fetch()
         return [
             {
                 "id": i.get("id"),
@@ -102,6 +114,8 @@ async def get_exercise_chart(exercise_id: str, current_user: dict = Depends(JWTB
             }
             for i in items_sorted
         ]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -109,7 +123,7 @@ async def get_exercise_chart(exercise_id: str, current_user: dict = Depends(JWTB
 # ── WORKOUT LOG ROUTES ────────────────────────────────────────────────────────
 
 @router.post("/workout-logs/", response_model=WorkoutLogResponse, dependencies=[Depends(JWTBearer())])
-async def create_workout_log(log: WorkoutLogCreate, current_user: dict = Depends(JWTBearer())):
+def create_workout_log(log: WorkoutLogCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
@@ -130,22 +144,33 @@ async def create_workout_log(log: WorkoutLogCreate, current_user: dict = Depends
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/workout-logs/", response_model=List[WorkoutLogResponse], dependencies=[Depends(JWTBearer())])
-async def get_workout_logs(current_user: dict = Depends(JWTBearer())):
+@router.get("/workout-logs/", response_model=Union[List[WorkoutLogResponse], Page[WorkoutLogResponse]],
+            dependencies=[Depends(JWTBearer())])
+def get_workout_logs(
+    response: Response,
+    current_user: dict = Depends(JWTBearer()),
+    paging: PageParams = Depends(),
+):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        result = pocketbase.table("workout_logs", token=token).eq("user_id", user_id).execute()
-        return result.get("items", [])
+        query = ListQuery("workout_logs", token, user_id).order("-logged_date")
+        result = paging.run(query, response)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.delete("/workout-logs/{log_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_workout_log(log_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_workout_log(log_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
-        result = pocketbase.table("workout_logs", token=token).eq("id", log_id).delete()
+        user_id = current_user.get("id")
+        result = pocketbase.table("workout_logs", token=token).eq("id", log_id).eq("user_id", user_id).delete()
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
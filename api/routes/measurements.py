@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Union
 from ..config.database import pocketbase
 from ..models.logs import MeasurementCreate, MeasurementResponse
+from ..models.page import Page
+from ..services.query_plan import ListQuery, PageParams
 from api.auth.auth_bearer import JWTBearer
 import datetime
 
@@ -9,7 +11,7 @@ router = APIRouter()
 
 
 @router.post("/measurements/", response_model=MeasurementResponse, dependencies=[Depends(JWTBearer())])
-async def create_measurement(measurement: MeasurementCreate, current_user: dict = Depends(JWTBearer())):
+def create_measurement(measurement: MeasurementCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
@@ -34,24 +36,33 @@ async def create_measurement(measurement: MeasurementCreate, current_user: dict
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/measurements/", response_model=List[MeasurementResponse], dependencies=[Depends(JWTBearer())])
-async def get_measurements(current_user: dict = Depends(JWTBearer())):
+@router.get("/measurements/", response_model=Union[List[MeasurementResponse], Page[MeasurementResponse]],
+            dependencies=[Depends(JWTBearer())])
+def get_measurements(
+    response: Response,
+    current_user: dict = Depends(JWTBearer()),
+    paging: PageParams = Depends(),
+):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        result = pocketbase.table("measurements", token=token).eq("user_id", user_id).execute()
-        items = result.get("items", [])
-        items_sorted = sorted(items, key=lambda x: x.get("logged_at", x.get("created", "")), reverse=True)
-        return items_sorted
+        query = ListQuery("measurements", token, user_id).cached().order("-logged_at")
+        result = paging.run(query, response)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.delete("/measurements/{measurement_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_measurement(measurement_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_measurement(measurement_id: str, current_user: dict = Depends(JWTBearer())):
     try:
-        token = current_user.get("_token")
-        result = pocketbase.table("measurements", token=token).eq("id", measurement_id).delete()
+        token   = current_user.get("_token")
+        user_id = current_user.get("id")
+        result = pocketbase.table("measurements", token=token).eq("id", measurement_id).eq("user_id", user_id).delete()
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+from ..auth.admin import require_admin
+from ..observability import profiler, querystats, tracing
+from ..observability.metrics import registry, render
+
+router = APIRouter()
+
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus scrape endpoint, aggregated over all workers."""
+    return PlainTextResponse(render(registry.merged()), media_type="text/plain; version=0.0.4")
+
+
+@router.get("/debug/traces", dependencies=[Depends(require_admin)])
+async def slowest_traces(
+    limit:  int = Query(20, ge=1, le=500),
+    route:  Optional[str] = Query(None, description="Only traces for this route template"),
+    min_ms: float = Query(0.0, ge=0, description="Only traces at least this slow"),
+):
+    """Slowest recently kept traces with their per-operation spans and N+1 suspects."""
+    return {
+        "sample_rate": tracing.TRACE_SAMPLE_RATE,
+        "slow_ms":     tracing.TRACE_SLOW_MS,
+        "traces":      tracing.slowest(limit, route, min_ms),
+    }
+
+
+@router.post("/debug/profile", dependencies=[Depends(require_admin)])
+async def start_profile(
+    seconds:     float = Query(10.0, gt=0, description="Capped at PROFILE_MAX_SECONDS"),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format:      str   = Query("collapsed", description="collapsed or speedscope"),
+):
+    """Start the sampling profiler on the worker that serves this request."""
+    try:
+        started = profiler.start(seconds, interval_ms, format)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if started is None:
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    return started
+
+
+@router.get("/debug/profile", dependencies=[Depends(require_admin)])
+async def profile_status():
+    return profiler.status()
+
+
+@router.get("/debug/queries", dependencies=[Depends(require_admin)])
+async def query_report(
+    sort:       str = Query("total_ms", description="total_ms, mean_ms, max_ms, count, rows, bytes or errors"),
+    limit:      int = Query(50, ge=1, le=1000),
+    collection: Optional[str] = Query(None),
+):
+    """Per query-shape statistics across workers and the recent slow-query log."""
+    if sort not in querystats.SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(querystats.SORT_KEYS)}")
+    return querystats.report(sort, limit, collection)
@@ -1,50 +1,60 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Response
 from ..config.database import pocketbase
+from ..services import personal_records
+from ..services.query_plan import ListQuery, PageParams
+from ..services.workouts import weekly_volume
 from api.auth.auth_bearer import JWTBearer
 
 router = APIRouter()
 
 
 @router.get("/personal-records/", dependencies=[Depends(JWTBearer())])
-async def get_all_prs(current_user: dict = Depends(JWTBearer())):
-    """Return all personal records for the current user."""
+def get_all_prs(
+    response: Response,
+    current_user: dict = Depends(JWTBearer()),
+    paging:  PageParams    = Depends(),
+):
+    """Return all personal records for the current user, newest first."""
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
-        result  = pocketbase.table("personal_records", token=token).eq("user_id", user_id).execute()
-        items   = result.get("items", [])
-        items.sort(key=lambda x: x.get("achieved_at", ""), reverse=True)
-        return items
+        query   = ListQuery("personal_records", token, user_id).cached().order("-achieved_at")
+        result  = paging.run(query, response)
+        if isinstance(result, dict):
+            return {**result, "items": [personal_records.public(i) for i in result["items"]]}
+        return [personal_records.public(i) for i in result]
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/personal-records/{exercise_library_id}/", dependencies=[Depends(JWTBearer())])
-async def get_exercise_pr(exercise_library_id: str, current_user: dict = Depends(JWTBearer())):
+def get_exercise_pr(exercise_library_id: str, current_user: dict = Depends(JWTBearer())):
     """Return PR for a specific exercise (by exercise_library_id)."""
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
-        result  = pocketbase.table("personal_records", token=token)\
-                            .eq("user_id", user_id)\
-                            .eq("exercise_library_id", exercise_library_id).execute()
-        items = result.get("items", [])
-        if not items:
+        pr      = personal_records.lookup(token, user_id, exercise_library_id)
+        if not pr:
             return {
                 "exercise_library_id": exercise_library_id,
                 "max_weight_kg":       0,
                 "max_reps":            0,
                 "best_volume":         0,
                 "best_1rm_estimate":   0,
+                "rep_maxes":           {},
                 "achieved_at":         None,
             }
-        return items[0]
+        return pr
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stats/overview/", dependencies=[Depends(JWTBearer())])
-async def get_stats_overview(current_user: dict = Depends(JWTBearer())):
+def get_stats_overview(current_user: dict = Depends(JWTBearer())):
     """Lifetime stats: total sessions, total volume, total PRs."""
     try:
         token   = current_user.get("_token")
@@ -56,7 +66,7 @@ async def get_stats_overview(current_user: dict = Depends(JWTBearer())):
         logs_result = pocketbase.table("exercise_logs", token=token).eq("user_id", user_id).execute()
         logs = logs_result.get("items", [])
 
-        prs_result = pocketbase.table("personal_records", token=token).eq("user_id", user_id).execute()
+        prs_result = pocketbase.table("personal_records", token=token).eq("user_id", user_id).cached().execute()
         prs = prs_result.get("items", [])
 
         total_volume = sum(float(s.get("total_volume_kg") or 0) for s in sessions)
@@ -76,12 +86,14 @@ async def get_stats_overview(current_user: dict = Depends(JWTBearer())):
                 for l in logs if l.get("exercise_library_id") or l.get("exercise_id")
             )),
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stats/weekly/", dependencies=[Depends(JWTBearer())])
-async def get_weekly_stats(current_user: dict = Depends(JWTBearer())):
+def get_weekly_stats(current_user: dict = Depends(JWTBearer())):
     """Weekly volume summary for the last 8 weeks."""
     import datetime
     try:
@@ -91,22 +103,8 @@ async def get_weekly_stats(current_user: dict = Depends(JWTBearer())):
         sessions_result = pocketbase.table("workout_sessions", token=token).eq("user_id", user_id).execute()
         sessions = sessions_result.get("items", [])
 
-        today   = datetime.date.today()
-        weeks   = []
-        for w in range(7, -1, -1):
-            week_start = today - datetime.timedelta(days=today.weekday() + 7 * w)
-            week_end   = week_start + datetime.timedelta(days=6)
-            week_sessions = [
-                s for s in sessions
-                if week_start.isoformat() <= (s.get("session_date") or "") <= week_end.isoformat()
-            ]
-            week_volume = sum(float(s.get("total_volume_kg") or 0) for s in week_sessions)
-            weeks.append({
-                "week_start":    week_start.isoformat(),
-                "week_label":    week_start.strftime("%b %d"),
-                "session_count": len(week_sessions),
-                "volume_kg":     round(week_volume, 2),
-            })
-        return weeks
+        return weekly_volume(sessions, datetime.date.today())
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
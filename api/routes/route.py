@@ -1,33 +1,82 @@
-from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Form
-from typing import List
+from fastapi import APIRouter, HTTPException, UploadFile, File, Depends, Form, Query
+from typing import List, Optional
 from ..config.database import pocketbase
 from ..models.exercise import (
     FolderCreate, FolderResponse,
     SectionCreate, SectionResponse,
-    ExerciseCreate, ExerciseResponse
+    ExerciseResponse
 )
+from ..services.images import (
+    prepare_image, hash_stream, acquire_blob, release_blob, blob_file_url, shared_image_hash, download_blob
+)
+from ..services import thumbnails
 from api.auth.auth_bearer import JWTBearer
-import requests
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+from anyio import from_thread
+import asyncio
 import datetime
+import functools
+import os
 from fastapi import Path
 
 router = APIRouter()
 
+
+def _with_thumbnails(exercise: dict) -> dict:
+    urls = thumbnails.thumbnail_urls(exercise.get("image_hash"))
+    if urls:
+        exercise["thumbnails"] = urls
+    return exercise
+
+
+def _find_section(token: str, user_id: str, folder_id: str, section_id: str) -> Optional[dict]:
+    """The user's section, if it belongs to the folder."""
+    items = pocketbase.table("sections", token=token).eq("id", section_id).eq("folder_id", folder_id)\
+                      .eq("user_id", user_id).execute().get("items", [])
+    return items[0] if items else None
+
+
+async def _store_exercise_image(image: UploadFile) -> dict:
+    """Store (or reuse) an uploaded image; returns the exercise fields that reference it.
+
+    The exercise routes are plain functions on the threadpool, so they call this
+    on the event loop with anyio's from_thread.run.
+
+    Images are hashed before anything is sent, so a picture that is already in the
+    blob store only gains a reference instead of being uploaded again. Thumbnails are
+    rendered in the process pool while the upload is in flight.
+    """
+    upload = prepare_image(image)
+    render = None
+    if thumbnails.available():
+        digest, source_path = await run_in_threadpool(thumbnails.copy_and_hash, upload.fileobj)
+        render = thumbnails.generate_variants(digest, source_path)
+    else:
+        digest = await run_in_threadpool(hash_stream, upload.fileobj)
+
+    store = run_in_threadpool(acquire_blob, digest, upload)
+    if render is not None:
+        blob, _ = await asyncio.gather(store, render)
+    else:
+        blob = await store
+    return {"image_hash": digest, "image_url": blob_file_url(blob)}
+
 # ── FOLDER ROUTES ─────────────────────────────────────────────────────────────
 
 @router.get("/folders/", response_model=List[FolderResponse], dependencies=[Depends(JWTBearer())])
-async def get_folders(current_user: dict = Depends(JWTBearer())):
+def get_folders(current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        result = pocketbase.table("folders", token=token).eq("user_id", user_id).execute()
+        result = pocketbase.table("folders", token=token).eq("user_id", user_id).cached().execute()
         return result.get("items", [])
     except Exception as e:
         print(f"Error getting folders: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/folders/{folder_id}", response_model=FolderResponse, dependencies=[Depends(JWTBearer())])
-async def get_folder(folder_id: str, current_user: dict = Depends(JWTBearer())):
+def get_folder(folder_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
@@ -40,8 +89,48 @@ async def get_folder(folder_id: str, current_user: dict = Depends(JWTBearer())):
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/folders/{folder_id}/tree/", dependencies=[Depends(JWTBearer())])
+def get_folder_tree(
+    folder_id: str,
+    fields: Optional[str] = Query(None, description="Comma-separated exercise fields to return, e.g. id,name,image"),
+    current_user: dict = Depends(JWTBearer())
+):
+    """Folder with its sections and their exercises, fetched in one query per level."""
+    try:
+        token = current_user.get("_token")
+        user_id = current_user.get("id")
+        folder_result = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
+        if not folder_result.get("items"):
+            raise HTTPException(status_code=404, detail="Folder not found")
+        folder = folder_result["items"][0]
+
+        sections = pocketbase.table("sections", token=token).eq("user_id", user_id).eq("folder_id", folder_id)\
+                             .execute().get("items", [])
+        exercises = []
+        if sections:
+            query = pocketbase.table("exercise", token=token).eq("user_id", user_id)\
+                              .in_("section_id", [s["id"] for s in sections])
+            if fields:
+                # id and section_id are needed to attach exercises to their section
+                wanted = {f.strip() for f in fields.split(",") if f.strip()} | {"id", "section_id"}
+                query = query.select(",".join(sorted(wanted)))
+            exercises = query.execute().get("items", [])
+
+        by_section = {s["id"]: [] for s in sections}
+        for ex in exercises:
+            by_section.setdefault(ex.get("section_id"), []).append(_with_thumbnails(ex))
+        return {
+            **folder,
+            "sections": [{**s, "exercises": by_section.get(s["id"], [])} for s in sections],
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"Error getting folder tree: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/folders/", response_model=FolderResponse, dependencies=[Depends(JWTBearer())])
-async def create_folder(folder: FolderCreate, current_user: dict = Depends(JWTBearer())):
+def create_folder(folder: FolderCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
@@ -64,7 +153,7 @@ async def create_folder(folder: FolderCreate, current_user: dict = Depends(JWTBe
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/folders/{id}/", response_model=FolderResponse, dependencies=[Depends(JWTBearer())])
-async def update_folder(id: str, folder: FolderCreate, current_user: dict = Depends(JWTBearer())):
+def update_folder(id: str, folder: FolderCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
@@ -82,27 +171,29 @@ async def update_folder(id: str, folder: FolderCreate, current_user: dict = Depe
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/folders/{id}/", response_model=bool, dependencies=[Depends(JWTBearer())])
-async def delete_folder(id: str, current_user: dict = Depends(JWTBearer())):
+def delete_folder(id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
         result = pocketbase.table("folders", token=token).eq("id", id).eq("user_id", user_id).delete()
+        pocketbase.forget_owner("folders", id, user_id)
         return len(result.get("items", [])) > 0
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 # ── SECTION ROUTES ────────────────────────────────────────────────────────────
 
 @router.get("/folders/{folder_id}/sections/", response_model=List[SectionResponse], dependencies=[Depends(JWTBearer())])
-async def get_sections(folder_id: str, current_user: dict = Depends(JWTBearer())):
+def get_sections(folder_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        result = pocketbase.table("sections", token=token).eq("folder_id", folder_id).execute()
+        result = pocketbase.table("sections", token=token).eq("user_id", user_id).eq("folder_id", folder_id).execute()
         return result.get("items", [])
     except HTTPException:
         raise
@@ -111,18 +202,17 @@ async def get_sections(folder_id: str, current_user: dict = Depends(JWTBearer())
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/folders/{folder_id}/sections/{section_id}/", response_model=SectionResponse, dependencies=[Depends(JWTBearer())])
-async def get_section(folder_id: str, section_id: str, current_user: dict = Depends(JWTBearer())):
+def get_section(folder_id: str, section_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        result = pocketbase.table("sections", token=token).eq("id", section_id).execute()
-        if not result.get("items"):
+        section = _find_section(token, user_id, folder_id, section_id)
+        if not section:
             raise HTTPException(status_code=404, detail="Section not found")
-        return result["items"][0]
+        return section
     except HTTPException:
         raise
     except Exception as e:
@@ -130,15 +220,15 @@ async def get_section(folder_id: str, section_id: str, current_user: dict = Depe
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/folders/{folder_id}/sections/", response_model=SectionResponse, dependencies=[Depends(JWTBearer())])
-async def create_section(folder_id: str, section: SectionCreate, current_user: dict = Depends(JWTBearer())):
+def create_section(folder_id: str, section: SectionCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Folder not found")
 
         section_data = {
+            "user_id": user_id,
             "name": section.name,
             "description": section.description or "",
             "folder_id": folder_id,
@@ -154,13 +244,14 @@ async def create_section(folder_id: str, section: SectionCreate, current_user: d
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/folders/{folder_id}/sections/{section_id}/", response_model=SectionResponse, dependencies=[Depends(JWTBearer())])
-async def update_section(folder_id: str, section_id: str, section: SectionCreate, current_user: dict = Depends(JWTBearer())):
+def update_section(folder_id: str, section_id: str, section: SectionCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Folder not found")
+        if not _find_section(token, user_id, folder_id, section_id):
+            raise HTTPException(status_code=404, detail="Section not found")
 
         result = pocketbase.table("sections", token=token).update({
             "id": section_id,
@@ -177,15 +268,15 @@ async def update_section(folder_id: str, section_id: str, section: SectionCreate
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/folders/{folder_id}/sections/{section_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_section(folder_id: str, section_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_section(folder_id: str, section_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Folder not found")
 
-        result = pocketbase.table("sections", token=token).eq("id", section_id).delete()
+        pocketbase.table("sections", token=token).eq("id", section_id).eq("folder_id", folder_id)\
+                  .eq("user_id", user_id).delete()
         return {"deleted": True}
     except HTTPException:
         raise
@@ -196,16 +287,17 @@ async def delete_section(folder_id: str, section_id: str, current_user: dict = D
 # ── EXERCISE ROUTES ───────────────────────────────────────────────────────────
 
 @router.get("/folders/{folder_id}/sections/{section_id}/exercises/", response_model=List[ExerciseResponse], dependencies=[Depends(JWTBearer())])
-async def get_exercises(folder_id: str, section_id: str, current_user: dict = Depends(JWTBearer())):
+def get_exercises(folder_id: str, section_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Folder not found")
+        if not _find_section(token, user_id, folder_id, section_id):
+            raise HTTPException(status_code=404, detail="Section not found")
 
-        result = pocketbase.table("exercise", token=token).eq("section_id", section_id).execute()
-        return result.get("items", [])
+        result = pocketbase.table("exercise", token=token).eq("user_id", user_id).eq("section_id", section_id).execute()
+        return [_with_thumbnails(ex) for ex in result.get("items", [])]
     except HTTPException:
         raise
     except Exception as e:
@@ -213,7 +305,7 @@ async def get_exercises(folder_id: str, section_id: str, current_user: dict = De
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.post("/folders/{folder_id}/sections/{section_id}/exercises/", response_model=ExerciseResponse)
-async def create_exercise(
+def create_exercise(
     folder_id: str = Path(...),
     section_id: str = Path(...),
     name: str = Form(...),
@@ -227,35 +319,37 @@ async def create_exercise(
         token = current_user.get("_token")
         user_id = current_user.get("id")
 
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=403, detail="Not authorized")
-
-        if image:
-            files = {"image": (image.filename, await image.read(), image.content_type)}
-            upload_response = requests.post(
-                "http://127.0.0.1:8090/api/collections/exercise/records",
-                files=files,
-                data={"name": name, "description": description or "", "section_id": section_id,
-                      "target_sets": target_sets, "target_reps": target_reps},
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            result = upload_response.json()
-            if "id" in result:
-                return result
-            raise HTTPException(status_code=400, detail=f"Failed to upload exercise: {result}")
+        if not _find_section(token, user_id, folder_id, section_id):
+            raise HTTPException(status_code=404, detail="Section not found")
 
         exercise_data = {
+            "user_id": user_id,
             "section_id": section_id,
             "name": name,
             "description": description or "",
             "target_sets": target_sets,
             "target_reps": target_reps,
         }
-        result = pocketbase.table("exercise", token=token).insert(exercise_data)
+        if image:
+            try:
+                exercise_data.update(from_thread.run(_store_exercise_image, image))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Failed to upload exercise: {e}")
+
+        new_hash = exercise_data.get("image_hash")
+        try:
+            result = pocketbase.table("exercise", token=token).insert(exercise_data)
+        except Exception:
+            if new_hash:
+                release_blob(new_hash)
+            raise
         if not result.get("items"):
+            if new_hash:
+                release_blob(new_hash)
             raise HTTPException(status_code=400, detail="Failed to create exercise")
-        return result["items"][0]
+        return _with_thumbnails(result["items"][0])
     except HTTPException:
         raise
     except Exception as e:
@@ -263,7 +357,7 @@ async def create_exercise(
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.put("/folders/{folder_id}/sections/{section_id}/exercises/{exercise_id}/", response_model=ExerciseResponse)
-async def update_exercise(
+def update_exercise(
     folder_id: str = Path(...),
     section_id: str = Path(...),
     exercise_id: str = Path(...),
@@ -278,34 +372,48 @@ async def update_exercise(
         token = current_user.get("_token")
         user_id = current_user.get("id")
 
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=403, detail="Not authorized")
+        if not _find_section(token, user_id, folder_id, section_id):
+            raise HTTPException(status_code=404, detail="Section not found")
+        existing = pocketbase.table("exercise", token=token).eq("id", exercise_id).eq("section_id", section_id)\
+                             .eq("user_id", user_id).execute().get("items", [])
+        if not existing:
+            raise HTTPException(status_code=404, detail="Exercise not found")
 
-        if image:
-            files = {"image": (image.filename, await image.read(), image.content_type)}
-            upload_response = requests.patch(
-                f"http://127.0.0.1:8090/api/collections/exercise/records/{exercise_id}",
-                files=files,
-                data={"name": name, "description": description or "",
-                      "target_sets": target_sets, "target_reps": target_reps},
-                headers={"Authorization": f"Bearer {token}"}
-            )
-            result = upload_response.json()
-            if "id" in result:
-                return result
-            raise HTTPException(status_code=400, detail=f"Failed to update exercise: {result}")
-
-        result = pocketbase.table("exercise", token=token).update({
+        exercise_data = {
             "id": exercise_id,
             "name": name,
             "description": description or "",
             "target_sets": target_sets,
             "target_reps": target_reps,
-        })
+        }
+        previous_hash = None
+        if image:
+            previous_hash = shared_image_hash(existing[0])
+            if existing[0].get("image"):
+                exercise_data["image"] = None  # drop the record's own file in favour of the shared one
+            try:
+                exercise_data.update(from_thread.run(_store_exercise_image, image))
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Failed to update exercise: {e}")
+
+        new_hash = exercise_data.get("image_hash")
+        try:
+            result = pocketbase.table("exercise", token=token).update(exercise_data)
+        except Exception:
+            # Backend error, open circuit or rejected fields: the exercise never pointed at the new blob
+            if new_hash:
+                release_blob(new_hash)
+            raise
         if not result.get("items"):
+            if new_hash:
+                release_blob(new_hash)
             raise HTTPException(status_code=400, detail=f"Failed to update exercise: {result.get('error')}")
-        return result["items"][0]
+        if previous_hash:
+            # Also right when the same picture was re-uploaded: it just gained a reference
+            release_blob(previous_hash)
+        return _with_thumbnails(result["items"][0])
     except HTTPException:
         raise
     except Exception as e:
@@ -313,16 +421,20 @@ async def update_exercise(
         raise HTTPException(status_code=400, detail=str(e))
 
 @router.delete("/folders/{folder_id}/sections/{section_id}/exercises/{exercise_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_exercise(folder_id: str, section_id: str, exercise_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_exercise(folder_id: str, section_id: str, exercise_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token = current_user.get("_token")
         user_id = current_user.get("id")
 
-        folder = pocketbase.table("folders", token=token).eq("id", folder_id).eq("user_id", user_id).execute()
-        if not folder.get("items"):
+        if not pocketbase.owns("folders", folder_id, user_id, token=token):
             raise HTTPException(status_code=403, detail="Not authorized")
 
-        result = pocketbase.table("exercise", token=token).eq("id", exercise_id).delete()
+        result = pocketbase.table("exercise", token=token).eq("id", exercise_id).eq("section_id", section_id)\
+                           .eq("user_id", user_id).delete()
+        for ex in result.get("items", []):
+            image_hash = shared_image_hash(ex)
+            if image_hash:
+                release_blob(image_hash)
         return {"deleted": True}
     except HTTPException:
         raise
@@ -330,6 +442,33 @@ async def delete_exercise(folder_id: str, section_id: str, exercise_id: str, cur
         print(f"Error deleting exercise: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
 
+@router.get("/exercise-images/{digest}/{variant}", tags=["Images"])
+async def get_exercise_image_variant(digest: str, variant: str):
+    """Serve a generated thumbnail. Paths are content addressed, so they never change."""
+    path = thumbnails.variant_path(digest, variant)
+    if not path:
+        raise HTTPException(status_code=404, detail="Image variant not found")
+    if not os.path.isfile(path):
+        # Evicted from this instance's cache (or never rendered here): render again from the original
+        rendered = thumbnails.available() and \
+            await thumbnails.regenerate(digest, functools.partial(download_blob, digest))
+        if not rendered or not os.path.isfile(path):
+            raise HTTPException(status_code=404, detail="Image variant not found")
+    thumbnails.touch(path)
+    media_type = "image/webp" if variant.endswith(".webp") else "image/jpeg"
+    return FileResponse(path, media_type=media_type, headers={"Cache-Control": thumbnails.CACHE_CONTROL})
+
+@router.get("/files/{collection}/{record_id}/{filename}", tags=["Images"])
+def get_stored_file(collection: str, record_id: str, filename: str):
+    """Files of the SQLite backend, at the path PocketBase would serve them from."""
+    if pocketbase.backend != "sqlite":
+        raise HTTPException(status_code=404, detail="File not found")
+    from ..config.sqlite_backend import file_path
+    path = file_path(collection, record_id, filename)
+    if not path:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(path)
+
 @router.get("/health", tags=["Health"])
 async def health_check():
     return {"status": "ok", "timestamp": datetime.datetime.now().isoformat()}
@@ -1,126 +1,19 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
+from typing import List, Optional, Union
 from pydantic import BaseModel
-from enum import Enum
 from ..config.database import pocketbase
+from ..data import catalog
+from ..data.workout_types import WorkoutType, WORKOUT_TYPE_META
+from ..models.page import Page
+from ..services import session_tags
+from ..services.query_plan import ListQuery, PageParams
+from ..services.workouts import parse_tags
 from api.auth.auth_bearer import JWTBearer
 import datetime
 
 router = APIRouter()
 
 
-# ── WORKOUT TYPES ─────────────────────────────────────────────────────────────
-
-class WorkoutType(str, Enum):
-    # HIIT / Cardio
-    HIIT                = "hiit"
-    # Gym / Equipment
-    GYM                 = "gym"
-    MACHINE             = "machine"
-    EQUIPMENT           = "equipment"
-    # Skill-level general
-    BEGINNER            = "beginner"
-    INTERMEDIATE        = "intermediate"
-    PRO                 = "pro"
-    # Yoga
-    YOGA                = "yoga"
-    MAT_YOGA            = "mat_yoga"
-    BEGINNER_YOGA       = "beginner_yoga"
-    INTERMEDIATE_YOGA   = "intermediate_yoga"
-    MORNING_YOGA        = "morning_yoga"
-    RELAXATION_YOGA     = "relaxation_yoga"
-    STRESS_RELIEF_YOGA  = "stress_relief_yoga"
-
-
-# Metadata: label, category, level, searchable tags
-WORKOUT_TYPE_META: dict = {
-    WorkoutType.HIIT: {
-        "label":    "HIIT",
-        "category": "cardio",
-        "level":    "intermediate",
-        "tags":     ["hiit", "cardio", "high-intensity", "fat-burn", "interval"],
-    },
-    WorkoutType.GYM: {
-        "label":    "Gym Workout",
-        "category": "gym",
-        "level":    "all",
-        "tags":     ["gym", "weights", "strength", "resistance"],
-    },
-    WorkoutType.MACHINE: {
-        "label":    "Machine Workout",
-        "category": "gym",
-        "level":    "all",
-        "tags":     ["machine", "gym", "equipment", "isolation", "cable"],
-    },
-    WorkoutType.EQUIPMENT: {
-        "label":    "Equipment Workout",
-        "category": "gym",
-        "level":    "all",
-        "tags":     ["equipment", "dumbbells", "barbells", "free-weights", "kettlebell"],
-    },
-    WorkoutType.BEGINNER: {
-        "label":    "Beginner Level",
-        "category": "general",
-        "level":    "beginner",
-        "tags":     ["beginner", "starter", "easy", "no-equipment", "bodyweight"],
-    },
-    WorkoutType.INTERMEDIATE: {
-        "label":    "Intermediate Level",
-        "category": "general",
-        "level":    "intermediate",
-        "tags":     ["intermediate", "moderate", "progression"],
-    },
-    WorkoutType.PRO: {
-        "label":    "Pro / Advanced",
-        "category": "general",
-        "level":    "advanced",
-        "tags":     ["pro", "advanced", "intense", "high-performance", "athlete"],
-    },
-    WorkoutType.YOGA: {
-        "label":    "Yoga",
-        "category": "yoga",
-        "level":    "all",
-        "tags":     ["yoga", "flexibility", "mindfulness", "balance", "stretch"],
-    },
-    WorkoutType.MAT_YOGA: {
-        "label":    "Mat Yoga",
-        "category": "yoga",
-        "level":    "all",
-        "tags":     ["mat-yoga", "yoga", "floor", "flexibility", "core"],
-    },
-    WorkoutType.BEGINNER_YOGA: {
-        "label":    "Beginner Yoga",
-        "category": "yoga",
-        "level":    "beginner",
-        "tags":     ["beginner-yoga", "yoga", "starter", "easy", "gentle"],
-    },
-    WorkoutType.INTERMEDIATE_YOGA: {
-        "label":    "Intermediate Yoga",
-        "category": "yoga",
-        "level":    "intermediate",
-        "tags":     ["intermediate-yoga", "yoga", "balance", "strength"],
-    },
-    WorkoutType.MORNING_YOGA: {
-        "label":    "Morning Yoga",
-        "category": "yoga",
-        "level":    "all",
-        "tags":     ["morning-yoga", "yoga", "energizing", "wake-up", "sunrise"],
-    },
-    WorkoutType.RELAXATION_YOGA: {
-        "label":    "Relaxation Yoga",
-        "category": "yoga",
-        "level":    "all",
-        "tags":     ["relaxation", "yoga", "calm", "restore", "yin", "restorative"],
-    },
-    WorkoutType.STRESS_RELIEF_YOGA: {
-        "label":    "Stress Relief Yoga",
-        "category": "yoga",
-        "level":    "all",
-        "tags":     ["stress-relief", "yoga", "mindfulness", "anxiety", "calm", "breathwork"],
-    },
-}
-
-
 # ── SCHEMAS ───────────────────────────────────────────────────────────────────
 
 class WorkoutSessionCreate(BaseModel):
@@ -161,33 +54,19 @@ class WorkoutTypeInfo(BaseModel):
 
 @router.get("/workout-types/", response_model=List[WorkoutTypeInfo])
 async def list_workout_types(
+    request:  Request,
     category: Optional[str] = Query(None, description="Filter by category: cardio, gym, general, yoga"),
     level:    Optional[str] = Query(None, description="Filter by level: beginner, intermediate, advanced, all"),
     tag:      Optional[str] = Query(None, description="Filter by tag keyword"),
 ):
     """Return all available workout types with their tags. Supports filter by category, level, or tag."""
-    result = []
-    for wtype, meta in WORKOUT_TYPE_META.items():
-        if category and meta["category"] != category:
-            continue
-        if level and meta["level"] not in (level, "all"):
-            continue
-        if tag and tag.lower() not in [t.lower() for t in meta["tags"]]:
-            continue
-        result.append(WorkoutTypeInfo(
-            type=wtype.value,
-            label=meta["label"],
-            category=meta["category"],
-            level=meta["level"],
-            tags=meta["tags"],
-        ))
-    return result
+    return catalog.workout_types(category, level, tag).response(request)
 
 
 # ── SESSION ROUTES ────────────────────────────────────────────────────────────
 
 @router.post("/workout-sessions/", response_model=WorkoutSessionResponse, dependencies=[Depends(JWTBearer())])
-async def create_session(session: WorkoutSessionCreate, current_user: dict = Depends(JWTBearer())):
+def create_session(session: WorkoutSessionCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
@@ -214,8 +93,15 @@ async def create_session(session: WorkoutSessionCreate, current_user: dict = Dep
             raise HTTPException(status_code=400, detail="Failed to create session")
 
         item = result["items"][0]
+        try:
+            session_tags.add(token, user_id, item["id"], tags)
+        except ValueError as e:
+            # Without its tag rows the session would be missing from tag filters; don't keep it
+            session_tags.remove(token, user_id, item["id"])
+            pocketbase.table("workout_sessions", token=token).eq("id", item["id"]).eq("user_id", user_id).delete()
+            raise HTTPException(status_code=400, detail=f"Failed to create session: {e}")
         # Deserialize tags back to list for the response
-        item["tags"] = [t for t in item.get("tags", "").split(",") if t]
+        item["tags"] = parse_tags(item.get("tags", ""))
         return item
     except HTTPException:
         raise
@@ -223,8 +109,10 @@ async def create_session(session: WorkoutSessionCreate, current_user: dict = Dep
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/workout-sessions/", response_model=List[WorkoutSessionResponse], dependencies=[Depends(JWTBearer())])
-async def get_sessions(
+@router.get("/workout-sessions/", response_model=Union[List[WorkoutSessionResponse], Page[WorkoutSessionResponse]],
+            dependencies=[Depends(JWTBearer())])
+def get_sessions(
+    response:      Response,
     current_user:  dict = Depends(JWTBearer()),
     workout_type:  Optional[WorkoutType] = Query(None, description="Filter by workout type"),
     category:      Optional[str]         = Query(None, description="Filter by category"),
@@ -232,41 +120,36 @@ async def get_sessions(
     tag:           Optional[str]         = Query(None, description="Filter by tag keyword"),
     sort_by:       Optional[str]         = Query("session_date", description="Sort field: session_date, workout_type, workout_name"),
     sort_order:    Optional[str]         = Query("desc", description="Sort order: asc or desc"),
+    paging:        PageParams            = Depends(),
 ):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
-        result  = pocketbase.table("workout_sessions", token=token).eq("user_id", user_id).execute()
-        items   = result.get("items", [])
-
-        # Deserialize tags string → list
-        for item in items:
-            raw_tags = item.get("tags", "")
-            item["tags"] = [t for t in raw_tags.split(",") if t] if isinstance(raw_tags, str) else (raw_tags or [])
-
-        # ── Filters ──
-        if workout_type:
-            items = [i for i in items if i.get("workout_type") == workout_type.value]
-        if category:
-            items = [i for i in items if i.get("category") == category]
-        if level:
-            items = [i for i in items if i.get("level") == level]
-        if tag:
-            items = [i for i in items if tag.lower() in [t.lower() for t in i.get("tags", [])]]
-
-        # ── Sort ──
         reverse = sort_order.lower() != "asc"
         valid_sort_fields = {"session_date", "workout_type", "workout_name", "created"}
         field = sort_by if sort_by in valid_sort_fields else "session_date"
-        items.sort(key=lambda x: x.get(field, ""), reverse=reverse)
 
-        return items
+        # Filters and sort run in the backend where it can express them (see services/query_plan.py)
+        query = ListQuery("workout_sessions", token, user_id)\
+            .where("workout_type", workout_type.value if workout_type else None)\
+            .where("category", category)\
+            .where("level", level)\
+            .tagged(tag)\
+            .order(("-" if reverse else "") + field)
+        result = paging.run(query, response)
+
+        # Deserialize tags string → list
+        for item in (result["items"] if isinstance(result, dict) else result):
+            item["tags"] = parse_tags(item.get("tags", ""))
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/workout-sessions/{session_id}/", dependencies=[Depends(JWTBearer())])
-async def get_session(session_id: str, current_user: dict = Depends(JWTBearer())):
+def get_session(session_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
@@ -275,8 +158,7 @@ async def get_session(session_id: str, current_user: dict = Depends(JWTBearer())
         if not s_result.get("items"):
             raise HTTPException(status_code=404, detail="Session not found")
         session = s_result["items"][0]
-        raw_tags = session.get("tags", "")
-        session["tags"] = [t for t in raw_tags.split(",") if t] if isinstance(raw_tags, str) else (raw_tags or [])
+        session["tags"] = parse_tags(session.get("tags", ""))
 
         logs_result = pocketbase.table("exercise_logs", token=token).eq("session_id", session_id).execute()
         return {**session, "exercise_logs": logs_result.get("items", [])}
@@ -287,11 +169,14 @@ async def get_session(session_id: str, current_user: dict = Depends(JWTBearer())
 
 
 @router.delete("/workout-sessions/{session_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_session(session_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_session(session_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
         pocketbase.table("workout_sessions", token=token).eq("id", session_id).eq("user_id", user_id).delete()
+        session_tags.remove(token, user_id, session_id)
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
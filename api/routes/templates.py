@@ -1,10 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Depends, Response
+from typing import List, Union
 from ..config.database import pocketbase
 from ..models.templates import (
     TemplateCreate, TemplateUpdate, TemplateResponse,
     TemplateExerciseCreate, TemplateExerciseResponse
 )
+from ..models.page import Page
+from ..services.query_plan import ListQuery, PageParams
 from api.auth.auth_bearer import JWTBearer
 import datetime
 
@@ -13,21 +15,28 @@ router = APIRouter()
 
 # ── TEMPLATE ROUTES ───────────────────────────────────────────────────────────
 
-@router.get("/templates/", response_model=List[TemplateResponse], dependencies=[Depends(JWTBearer())])
-async def list_templates(current_user: dict = Depends(JWTBearer())):
+@router.get("/templates/", response_model=Union[List[TemplateResponse], Page[TemplateResponse]],
+            dependencies=[Depends(JWTBearer())])
+def list_templates(
+    response: Response,
+    current_user: dict = Depends(JWTBearer()),
+    paging:  PageParams    = Depends(),
+):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
-        result  = pocketbase.table("workout_templates", token=token).eq("user_id", user_id).execute()
-        items   = result.get("items", [])
-        items.sort(key=lambda x: x.get("last_used_at") or x.get("created", ""), reverse=True)
-        return items
+        # Most recent activity first: last_used_at, or created for templates never used
+        query   = ListQuery("workout_templates", token, user_id).cached().order("-last_used_at|created")
+        result  = paging.run(query, response)
+        return result
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.post("/templates/", response_model=TemplateResponse, dependencies=[Depends(JWTBearer())])
-async def create_template(template: TemplateCreate, current_user: dict = Depends(JWTBearer())):
+def create_template(template: TemplateCreate, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
@@ -52,18 +61,19 @@ async def create_template(template: TemplateCreate, current_user: dict = Depends
 
 
 @router.get("/templates/{template_id}/", dependencies=[Depends(JWTBearer())])
-async def get_template(template_id: str, current_user: dict = Depends(JWTBearer())):
+def get_template(template_id: str, current_user: dict = Depends(JWTBearer())):
     """Returns template info + exercises list."""
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
 
-        t_result = pocketbase.table("workout_templates", token=token).eq("id", template_id).eq("user_id", user_id).execute()
+        t_result = pocketbase.table("workout_templates", token=token).eq("id", template_id).eq("user_id", user_id).cached().execute()
         if not t_result.get("items"):
             raise HTTPException(status_code=404, detail="Template not found")
         template = t_result["items"][0]
 
-        ex_result = pocketbase.table("template_exercises", token=token).eq("template_id", template_id).execute()
+        ex_result = pocketbase.table("template_exercises", token=token).eq("user_id", user_id)\
+                              .eq("template_id", template_id).cached().execute()
         exercises = sorted(ex_result.get("items", []), key=lambda x: x.get("order_index", 0))
 
         return {**template, "exercises": exercises}
@@ -74,14 +84,13 @@ async def get_template(template_id: str, current_user: dict = Depends(JWTBearer(
 
 
 @router.put("/templates/{template_id}/", response_model=TemplateResponse, dependencies=[Depends(JWTBearer())])
-async def update_template(template_id: str, template: TemplateUpdate, current_user: dict = Depends(JWTBearer())):
+def update_template(template_id: str, template: TemplateUpdate, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
 
         # Verify ownership
-        check = pocketbase.table("workout_templates", token=token).eq("id", template_id).eq("user_id", user_id).execute()
-        if not check.get("items"):
+        if not pocketbase.owns("workout_templates", template_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Template not found")
 
         data = {"id": template_id}
@@ -102,14 +111,17 @@ async def update_template(template_id: str, template: TemplateUpdate, current_us
 
 
 @router.delete("/templates/{template_id}/", dependencies=[Depends(JWTBearer())])
-async def delete_template(template_id: str, current_user: dict = Depends(JWTBearer())):
+def delete_template(template_id: str, current_user: dict = Depends(JWTBearer())):
     try:
         token   = current_user.get("_token")
         user_id = current_user.get("id")
         pocketbase.table("workout_templates", token=token).eq("id", template_id).eq("user_id", user_id).delete()
+        pocketbase.forget_owner("workout_templates", template_id, user_id)
         # Delete exercises too
-        pocketbase.table("template_exercises", token=token).eq("template_id", template_id).delete()
+        pocketbase.table("template_exercises", token=token).eq("user_id", user_id).eq("template_id", template_id).delete()
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -118,7 +130,7 @@ async def delete_template(template_id: str, current_user: dict = Depends(JWTBear
 
 @router.post("/templates/{template_id}/exercises/",
              response_model=TemplateExerciseResponse, dependencies=[Depends(JWTBearer())])
-async def add_exercise_to_template(
+def add_exercise_to_template(
     template_id: str,
     exercise: TemplateExerciseCreate,
     current_user: dict = Depends(JWTBearer())
@@ -128,11 +140,11 @@ async def add_exercise_to_template(
         user_id = current_user.get("id")
 
         # Verify template ownership
-        check = pocketbase.table("workout_templates", token=token).eq("id", template_id).eq("user_id", user_id).execute()
-        if not check.get("items"):
+        if not pocketbase.owns("workout_templates", template_id, user_id, token=token):
             raise HTTPException(status_code=404, detail="Template not found")
 
         data = {
+            "user_id":             user_id,
             "template_id":         template_id,
             "exercise_library_id": exercise.exercise_library_id,
             "exercise_name":       exercise.exercise_name,
@@ -154,14 +166,19 @@ async def add_exercise_to_template(
 
 @router.put("/templates/{template_id}/exercises/{exercise_id}/",
             response_model=TemplateExerciseResponse, dependencies=[Depends(JWTBearer())])
-async def update_template_exercise(
+def update_template_exercise(
     template_id: str,
     exercise_id: str,
     exercise: TemplateExerciseCreate,
     current_user: dict = Depends(JWTBearer())
 ):
     try:
-        token = current_user.get("_token")
+        token   = current_user.get("_token")
+        user_id = current_user.get("id")
+        existing = pocketbase.table("template_exercises", token=token).eq("id", exercise_id)\
+                             .eq("user_id", user_id).eq("template_id", template_id).execute()
+        if not existing.get("items"):
+            raise HTTPException(status_code=404, detail="Exercise not found")
         data  = {
             "id":                  exercise_id,
             "exercise_library_id": exercise.exercise_library_id,
@@ -183,14 +200,18 @@ async def update_template_exercise(
 
 
 @router.delete("/templates/{template_id}/exercises/{exercise_id}/", dependencies=[Depends(JWTBearer())])
-async def remove_exercise_from_template(
+def remove_exercise_from_template(
     template_id: str,
     exercise_id: str,
     current_user: dict = Depends(JWTBearer())
 ):
     try:
-        token = current_user.get("_token")
-        pocketbase.table("template_exercises", token=token).eq("id", exercise_id).eq("template_id", template_id).delete()
+        token   = current_user.get("_token")
+        user_id = current_user.get("id")
+        pocketbase.table("template_exercises", token=token).eq("id", exercise_id).eq("user_id", user_id)\
+                  .eq("template_id", template_id).delete()
         return {"deleted": True}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
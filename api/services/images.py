@@ -0,0 +1,208 @@
+import hashlib
+import os
+from typing import BinaryIO, Optional
+from fastapi import HTTPException, UploadFile
+from fastapi.responses import JSONResponse
+from ..config.database import pocketbase
+
+try:
+    import magic
+except ImportError:  # python-magic or the libmagic shared library is missing
+    magic = None
+
+MAX_IMAGE_BYTES = 10 * 1024 * 1024
+SNIFF_BYTES = 2048
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/gif", "image/heic", "image/heif"}
+# Room for the multipart boundaries and the text fields sent alongside the image
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# ISO-BMFF brands (bytes 8-12, after "ftyp") of HEIC and of other HEIF images
+_HEIC_BRANDS = {b"heic", b"heix", b"hevc", b"hevx", b"heim", b"heis"}
+_HEIF_BRANDS = {b"mif1", b"msf1"}
+
+# One record per distinct image (unique on `hash`); exercises point at it via image_url.
+BLOB_COLLECTION = "image_blobs"
+# Tries at finding or storing a blob while concurrent releases delete it
+ACQUIRE_ATTEMPTS = 5
+
+
+class ImageUpload:
+    """A validated image still sitting in the UploadFile spool."""
+
+    def __init__(self, filename: str, content_type: str, fileobj: BinaryIO, size: int):
+        self.filename = filename
+        self.content_type = content_type
+        self.fileobj = fileobj
+        self.size = size
+
+
+def _signature_mime(head: bytes) -> Optional[str]:
+    """The allowed image type whose magic bytes `head` starts with, if any."""
+    if head.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if head.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[4:8] == b"ftyp":
+        if head[8:12] in _HEIC_BRANDS:
+            return "image/heic"
+        if head[8:12] in _HEIF_BRANDS:
+            return "image/heif"
+    return None
+
+
+def sniff_mime(head: bytes) -> Optional[str]:
+    """Detect the MIME type from the first bytes only, never from the client's claim."""
+    if magic is not None and head:
+        try:
+            return magic.from_buffer(head, mime=True)
+        except Exception:
+            pass
+    return _signature_mime(head)
+
+
+def prepare_image(image: UploadFile, max_bytes: int = MAX_IMAGE_BYTES) -> ImageUpload:
+    """Check size and type of an uploaded image without reading it into memory."""
+    fileobj = image.file
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty image upload")
+    if size > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Image exceeds {max_bytes // (1024 * 1024)} MB limit")
+
+    head = fileobj.read(SNIFF_BYTES)
+    fileobj.seek(0)
+    content_type = sniff_mime(head)
+    if content_type not in ALLOWED_IMAGE_TYPES:
+        raise HTTPException(status_code=415, detail=f"Unsupported image type: {content_type}")
+    return ImageUpload(image.filename, content_type, fileobj, size)
+
+
+class UploadSizeLimit:
+    """ASGI middleware capping multipart bodies before they are spooled.
+
+    prepare_image() only sees an upload once the form parser has copied all of
+    it to disk, so a body declared larger than `max_bytes` is refused from its
+    Content-Length, and one that grows past it is cut off mid-stream with 413.
+    """
+
+    def __init__(self, app, max_bytes: int = MAX_IMAGE_BYTES + FORM_OVERHEAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(status_code=413, detail=f"Upload exceeds {MAX_IMAGE_BYTES // (1024 * 1024)} MB limit")
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        headers = dict(scope["headers"])
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+        length = headers.get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            error = self._too_large()
+            await JSONResponse(status_code=error.status_code, content={"detail": error.detail})(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    # Raised inside the form parse, which FastAPI passes through as this response
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+def hash_stream(fileobj: BinaryIO, chunk_size: int = 64 * 1024) -> str:
+    hasher = hashlib.sha256()
+    fileobj.seek(0)
+    while True:
+        chunk = fileobj.read(chunk_size)
+        if not chunk:
+            break
+        hasher.update(chunk)
+    fileobj.seek(0)
+    return hasher.hexdigest()
+
+
+def blob_file_url(blob: dict) -> str:
+    return pocketbase.file_url(BLOB_COLLECTION, blob["id"], blob.get("file", ""))
+
+
+def _blobs():
+    # Blobs are shared between users, so no user token may reach them (schema.api_rules)
+    return pocketbase.service_table(BLOB_COLLECTION)
+
+
+def _bump_refs(blob: dict, delta: int) -> Optional[dict]:
+    """Apply `delta` to ref_count; the updated blob, or None once it has been deleted."""
+    # PocketBase applies "field+" / "field-" atomically on the server
+    modifier = "ref_count+" if delta > 0 else "ref_count-"
+    items = _blobs().update({"id": blob["id"], modifier: abs(delta)}).get("items", [])
+    return items[0] if items else None
+
+
+def _drop_ref(blob: dict):
+    """Drop one reference and delete the blob if that was the last one."""
+    updated = _bump_refs(blob, -1)
+    if updated is not None and int(updated.get("ref_count") or 0) <= 0:
+        # Filtered, so a blob an acquire has just taken again survives
+        _blobs().eq("id", blob["id"]).lte("ref_count", 0).delete()
+
+
+def acquire_blob(digest: str, upload: ImageUpload) -> dict:
+    """Return the stored image for `digest` with one more reference, uploading it only if nobody has yet."""
+    for _ in range(ACQUIRE_ATTEMPTS):
+        existing = _blobs().eq("hash", digest).execute().get("items", [])
+        if existing:
+            blob = _bump_refs(existing[0], 1)
+            if blob is not None and int(blob.get("ref_count") or 0) > 1:
+                return blob
+            if blob is not None:
+                # The count was 0: its last release is deleting it. Back out and store a fresh one.
+                _drop_ref(blob)
+            continue
+        try:
+            result = _blobs().upload(
+                {"hash": digest, "ref_count": 1, "content_type": upload.content_type, "size": upload.size},
+                "file", upload,
+            )
+            return result["items"][0]
+        except ValueError:
+            # An identical upload won the race (or a dying blob still holds the hash): look again
+            continue
+    raise ValueError(f"Could not store image {digest[:12]}: it kept changing underneath")
+
+
+def release_blob(digest: str):
+    """Drop one reference; the blob (and its file) is deleted with the last one."""
+    existing = _blobs().eq("hash", digest).execute().get("items", [])
+    if existing:
+        _drop_ref(existing[0])
+
+
+def download_blob(digest: str, out: BinaryIO) -> bool:
+    """Write the stored original for `digest` to `out`; False if there is none."""
+    existing = _blobs().eq("hash", digest).execute().get("items", [])
+    return bool(existing) and _blobs().download(existing[0], "file", out)
+
+
+def shared_image_hash(exercise: dict) -> Optional[str]:
+    """image_hash of an exercise whose picture lives in the blob store, not in its own file field."""
+    if exercise.get("image") or not exercise.get("image_url"):
+        return None
+    return exercise.get("image_hash") or None
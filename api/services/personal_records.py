@@ -0,0 +1,195 @@
+"""
+Personal records, kept incrementally per (user, exercise).
+
+Each exercise has one personal_records row holding its running bests:
+heaviest weight, most reps, best Epley 1RM estimate and best session volume.
+The row also holds rep_maxes, the best weight at each rep count from 1 to 12,
+and holders, which records the log (or, for volume, the session) behind each
+record. Both are JSON text.
+
+record() folds newly inserted logs into the row. That costs one indexed row
+read, plus a write and a read back when a record improves, however long the
+history. forget() runs after a log is deleted. It rebuilds the row from the
+exercise's logs (an indexed read on (user_id, exercise_id)) only when the
+deleted log held a record, and reads the logs again after writing in case one
+arrived meanwhile; any other delete leaves the row as it is.
+
+Rows written before rep_maxes and holders existed are rebuilt from the logs
+the first time they are touched, and an exercise logged before rows were kept
+at all gets its row built when it is first looked up (or by
+pb_setup.py --backfill-personal-records).
+
+The (user_id, exercise_library_id) index is unique. Two requests can still
+read the row at the same time. If both try to insert it, the loser's insert
+fails; it then reloads the winner's row and folds its logs into that. If both
+update it, the last write wins. So record() reads the row back after writing,
+and folds its logs in again if a concurrent write lost them. Duplicate rows
+left from before the index was unique are merged when they are next read.
+"""
+
+import json
+from typing import List, Optional
+
+from ..config.database import pocketbase
+from ..data import catalog
+from .workouts import add_logs, empty_pr, holds_record
+
+COLLECTION = "personal_records"
+RECORD_FIELDS = ("max_weight_kg", "max_reps", "best_volume", "best_1rm_estimate")
+LOG_FIELDS = "id,exercise_id,sets,reps,weight_kg,session_id"
+# Writes record() tries while other requests keep changing the same row
+WRITE_ATTEMPTS = 5
+
+
+def _row(token: str, user_id: str, exercise_id: str) -> Optional[dict]:
+    items = pocketbase.table(COLLECTION, token=token).eq("user_id", user_id)\
+                      .eq("exercise_library_id", exercise_id).execute().get("items", [])
+    if len(items) > 1:
+        return _merge(token, user_id, exercise_id, items)
+    return items[0] if items else None
+
+
+def _merge(token: str, user_id: str, exercise_id: str, rows: List[dict]) -> dict:
+    """Collapse duplicate rows into the first one, rebuilt from the logs."""
+    keep = rows[0]
+    fields = {**from_logs(_logs(token, user_id, exercise_id)),
+              "exercise_name": next((r["exercise_name"] for r in rows if r.get("exercise_name")), ""),
+              "achieved_at": max(r.get("achieved_at") or "" for r in rows)}
+    result = pocketbase.table(COLLECTION, token=token).update({"id": keep["id"], **fields})
+    for row in rows[1:]:
+        pocketbase.table(COLLECTION, token=token).eq("id", row["id"]).delete()
+    return (result.get("items") or [{**keep, **fields}])[0]
+
+
+def _logs(token: str, user_id: str, exercise_id: str) -> List[dict]:
+    return pocketbase.table("exercise_logs", token=token).eq("user_id", user_id).eq("exercise_id", exercise_id)\
+                     .select(LOG_FIELDS).execute().get("items", [])
+
+
+def _load(row: dict) -> dict:
+    pr = empty_pr()
+    for field in RECORD_FIELDS:
+        pr[field] = type(pr[field])(row.get(field) or 0)
+    pr["rep_maxes"] = json.loads(row.get("rep_maxes") or "{}")
+    pr["holders"] = json.loads(row.get("holders") or "{}")
+    return pr
+
+
+def _fields(pr: dict) -> dict:
+    return {**{f: pr[f] for f in RECORD_FIELDS},
+            "rep_maxes": json.dumps(pr["rep_maxes"], separators=(",", ":")),
+            "holders": json.dumps(pr["holders"], separators=(",", ":"))}
+
+
+def _rebuild(token: str, user_id: str, exercise_id: str, skip_ids=()) -> dict:
+    pr = empty_pr()
+    add_logs(pr, [log for log in _logs(token, user_id, exercise_id) if log["id"] not in skip_ids])
+    return pr
+
+
+def from_logs(logs: List[dict]) -> dict:
+    """Stored record fields for an exercise with exactly these logs."""
+    pr = empty_pr()
+    add_logs(pr, logs)
+    return _fields(pr)
+
+
+def record(token: str, user_id: str, exercise_id: str, exercise_name: str, logs: List[dict],
+           achieved_at: str) -> bool:
+    """Fold just-inserted `logs` of one exercise into its records. True if any record improved."""
+    improved_any = False
+    error = None
+    for _ in range(WRITE_ATTEMPTS):
+        row = _row(token, user_id, exercise_id)
+        rebuilt = row is None or not row.get("holders")
+        if rebuilt:
+            # No row yet, or one from before holders existed: start from the earlier logs
+            pr = _rebuild(token, user_id, exercise_id, skip_ids={log["id"] for log in logs})
+        else:
+            pr = _load(row)
+        improved = add_logs(pr, logs)
+        if not (improved or rebuilt):
+            # The stored row (ours, or a concurrent writer's) already counts these logs
+            return improved_any
+        improved_any = improved_any or improved
+
+        table = pocketbase.table(COLLECTION, token=token)
+        try:
+            if row:
+                name = {} if row.get("exercise_name") or not exercise_name else {"exercise_name": exercise_name}
+                table.update({"id": row["id"], **_fields(pr), **name,
+                              "achieved_at": achieved_at if improved else row.get("achieved_at", "")})
+            else:
+                table.insert({"user_id": user_id, "exercise_library_id": exercise_id, "exercise_name": exercise_name,
+                              **_fields(pr), "achieved_at": achieved_at if improved else ""})
+            error = None
+        except ValueError as e:
+            # Another request inserted the row first: load it and fold the logs into that
+            error = e
+    if error is not None:
+        raise error
+    return improved_any
+
+
+def forget(token: str, user_id: str, log: dict):
+    """Correct the records after `log` was deleted, if it held one of them."""
+    exercise_id = log.get("exercise_id")
+    if not exercise_id:
+        return
+    row = _row(token, user_id, exercise_id)
+    if row is None or (row.get("holders") and not holds_record(_load(row), log)):
+        return
+    exercise_name = row.get("exercise_name", "")
+    pr = _rebuild(token, user_id, exercise_id)
+    for _ in range(WRITE_ATTEMPTS):
+        written = _fields(pr)
+        table = pocketbase.table(COLLECTION, token=token)
+        if not pr["holders"]:
+            if row is not None:
+                table.eq("id", row["id"]).delete()
+                row = None
+        elif row is not None:
+            table.update({"id": row["id"], **written})
+        else:
+            try:
+                table.insert({"user_id": user_id, "exercise_library_id": exercise_id, "exercise_name": exercise_name,
+                              **written, "achieved_at": ""})
+            except ValueError:
+                return  # a concurrent record() created the row and folds its own logs in
+        # A log inserted while the rebuild was reading is missing from what was just written
+        pr = _rebuild(token, user_id, exercise_id)
+        if _fields(pr) == written:
+            return
+
+
+def exercise_name(token: str, user_id: str, exercise_id: str) -> str:
+    """Name of a seed or custom library exercise; blank if it is neither."""
+    name = catalog.seed_exercise_name(exercise_id)
+    if name:
+        return name
+    items = pocketbase.table("custom_exercises", token=token).eq("id", exercise_id).eq("created_by", user_id)\
+                      .execute().get("items", [])
+    return items[0].get("name", "") if items else ""
+
+
+def public(row: dict) -> dict:
+    """A stored row as the API returns it: rep_maxes as {reps: weight_kg}, holders dropped."""
+    item = {k: v for k, v in row.items() if k != "holders"}
+    rep_maxes = json.loads(row.get("rep_maxes") or "{}")
+    item["rep_maxes"] = {reps: best["weight_kg"] for reps, best in sorted(rep_maxes.items(), key=lambda i: int(i[0]))}
+    return item
+
+
+def lookup(token: str, user_id: str, exercise_id: str) -> Optional[dict]:
+    """The exercise's records (public form), or None if it has no logs.
+
+    Read uncached, so a record another worker has just written is seen at once.
+    """
+    row = _row(token, user_id, exercise_id)
+    if row is None or not row.get("holders"):
+        if row is None and not _rebuild(token, user_id, exercise_id)["holders"]:
+            return None
+        # Logged before rows were kept (or before holders existed): build and store it now
+        record(token, user_id, exercise_id, exercise_name(token, user_id, exercise_id), [], "")
+        row = _row(token, user_id, exercise_id)
+    return public(row) if row else None
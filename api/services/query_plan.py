@@ -0,0 +1,179 @@
+"""
+Query planning for the history list endpoints.
+
+A route describes a list read over one user's records: equality filters, an
+optional session tag and a sort. ListQuery gives the backend as much of that
+as it can express and finishes the rest in memory:
+
+    filters   on schema fields become backend filters; anything else is
+              filtered in memory after the read
+    tag       resolves to session ids through the session_tags index, and
+              only those sessions are read
+    sort      plain fields go to the backend. Computed orders the backend
+              has no expression for ("last_used_at|created": last_used_at,
+              or created where it is blank) are sorted in memory
+    page      a keyset page from the backend when the filters and sort were
+              all pushed down; otherwise the rows are paged in memory with
+              the same cursors (database.page_items)
+
+explain() reports the split, and which declared index (schema.py) serves
+the pushed filter and sort. The routes return it in the X-Query-Plan header
+when called with ?explain=true.
+
+PageParams is the ?limit/?cursor/?explain dependency the list routes share:
+PageParams.run(query, response) returns a page when limit or cursor is given
+and the legacy plain list otherwise, and sets X-Query-Plan when asked.
+"""
+
+import json
+from typing import Any, List, Optional, Tuple, Union
+
+from fastapi import Query, Response
+
+from ..config.database import MAX_PAGE_SIZE, keyset_sort, page_items, pocketbase, sort_items, sort_value
+from ..config.schema import COLLECTIONS_BY_NAME, index_name
+from . import session_tags
+
+# Every PocketBase record has these besides its schema fields
+BASE_FIELDS = {"id", "created", "updated"}
+
+
+def choose_index(collection: str, eq_fields: List[str], sort_field: Optional[str]) -> Tuple[Optional[str], bool]:
+    """The declared index that serves the most of an equality filter plus sort: (name, index sorts too)."""
+    best, best_score, best_sorts = None, 0, False
+    for spec in COLLECTIONS_BY_NAME.get(collection, {}).get("indexes", []):
+        fields = spec["fields"]
+        prefix = 0
+        while prefix < len(fields) and fields[prefix] in eq_fields:
+            prefix += 1
+        if not prefix:
+            continue
+        sorts = prefix < len(fields) and fields[prefix] == sort_field
+        score = prefix + sorts
+        if score > best_score:
+            best, best_score, best_sorts = index_name(collection, spec), score, sorts
+    return best, best_sorts
+
+
+class ListQuery:
+    """One planned list read over a user's records in `collection`."""
+
+    def __init__(self, collection: str, token: str, user_id: str, owner_field: str = "user_id"):
+        self.collection = collection
+        self.token = token
+        self.user_id = user_id
+        self.filters: List[Tuple[str, Any]] = [(owner_field, user_id)]
+        self.tag: Optional[str] = None
+        self.sort: List[str] = []
+        self.cache = False
+        schema = COLLECTIONS_BY_NAME.get(collection, {}).get("schema", [])
+        self.fields = BASE_FIELDS | {f["name"] for f in schema}
+        self.plan: Optional[dict] = None
+
+    def where(self, field: str, value: Any):
+        """Equality filter; skipped when `value` is None or blank, like an absent query param."""
+        if value is not None and value != "":
+            self.filters.append((field, value))
+        return self
+
+    def tagged(self, tag: Optional[str]):
+        self.tag = tag or None
+        return self
+
+    def order(self, *fields: str):
+        self.sort = list(fields)
+        return self
+
+    def cached(self):
+        """Serve the backend read through the shared read cache (Table.cached)."""
+        self.cache = True
+        return self
+
+    def _pushable_sort(self) -> bool:
+        return all("|" not in f and f.lstrip("+-") in self.fields for f in self.sort)
+
+    def _table(self, pushed: List[Tuple[str, Any]]):
+        table = pocketbase.table(self.collection, token=self.token)
+        for field, value in pushed:
+            table.eq(field, value)
+        if self.cache:
+            table.cached()
+        return table
+
+    def _run(self, limit: Optional[int], cursor: Optional[str], paged: bool):
+        pushed = [(f, v) for f, v in self.filters if f in self.fields]
+        residual = [(f, v) for f, v in self.filters if f not in self.fields]
+        backend_sort = self._pushable_sort() and not self.tag
+        backend_page = backend_sort and not residual
+        table = self._table(pushed)
+        sort = keyset_sort(self.sort) if paged else self.sort
+        index, index_sorts = choose_index(self.collection, [f for f, _ in pushed],
+                                          self.sort[0].lstrip("+-") if backend_sort and self.sort else None)
+        in_memory = [f"filter {f}" for f, _ in residual]
+        self.plan = {"collection": self.collection, "index": index, "index_sorts": index_sorts,
+                     "tag_index": self.tag, "in_memory": in_memory}
+
+        if self.tag:
+            rows = session_tags.fetch(table, session_tags.matching(self.token, self.user_id, self.tag))
+            self.plan["backend"] = f"{table.query_shape()} && id IN(?)"
+        else:
+            if backend_sort and self.sort:
+                table.order(*sort)
+            if backend_page:
+                if paged:
+                    result = table.page(limit, cursor)
+                    self.plan["backend"] = table.query_shape()
+                    return result
+                if limit:
+                    table.limit(limit)
+            rows = table.execute().get("items", [])
+            self.plan["backend"] = table.query_shape()
+
+        rows = [r for r in rows if all(sort_value(r, f) == v for f, v in residual)]
+        if self.sort and not backend_sort:
+            in_memory.append(f"sort {','.join(sort)}")
+        if paged:
+            in_memory.append("page")
+            return page_items(rows, self.sort, limit, cursor)
+        if not backend_sort:
+            rows = sort_items(rows, self.sort)
+        if limit and not backend_page:
+            in_memory.append("limit")
+            rows = rows[:limit]
+        return rows
+
+    def fetch(self, limit: Optional[int] = None) -> List[dict]:
+        """Every matching row (or the first `limit`) in sort order."""
+        return self._run(limit, None, paged=False)
+
+    def page(self, limit: Optional[int] = None, cursor: Optional[str] = None) -> dict:
+        """{"items": [...], "next_cursor": ...}, see Table.page()."""
+        return self._run(limit, cursor, paged=True)
+
+    def explain(self) -> str:
+        """The plan of the last fetch()/page() as compact JSON."""
+        return json.dumps(self.plan, separators=(",", ":"))
+
+
+class PageParams:
+    """?limit, ?cursor and ?explain for a list route; use as `paging: PageParams = Depends()`."""
+
+    def __init__(
+        self,
+        limit:   Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; the response becomes {items, next_cursor}"),
+        cursor:  Optional[str] = Query(None, description="next_cursor from the previous page"),
+        explain: bool          = Query(False, description="Return the query plan in the X-Query-Plan header"),
+    ):
+        self.limit = limit
+        self.cursor = cursor
+        self.explain = explain
+
+    def run(self, query: ListQuery, response: Response, legacy_limit: Optional[int] = None) -> Union[dict, List[dict]]:
+        """A page of `query` if limit or cursor was given, else the plain list (its first `legacy_limit`)."""
+        if self.limit or self.cursor:
+            result = query.page(self.limit, self.cursor)
+        else:
+            result = query.fetch(legacy_limit)
+        if self.explain:
+            response.headers["X-Query-Plan"] = query.explain()
+        return result
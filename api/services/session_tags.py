@@ -0,0 +1,80 @@
+"""
+Workout session tags, one session_tags row per (session, tag).
+
+workout_sessions.tags keeps the comma-joined copy that responses show, but
+filtering uses these rows. A tag filter is then an indexed (user_id, tag)
+read that returns only the matching session ids, rather than a scan of every
+session the user has.
+
+matching() serves a (user, tag) posting list from tag_index, the inverted
+index for hot users kept in cache.py, and reads it from the backend on a
+miss. add() and remove() bump the user's version, so every worker drops all
+of that user's posting lists at once.
+"""
+
+import copy
+from typing import Iterable, List
+
+from ..config.cache import tag_index
+from ..config.database import Table, pocketbase
+
+COLLECTION = "session_tags"
+# Tries per tag row before add() gives up
+INSERT_ATTEMPTS = 2
+# Session ids per in_() read; keeps the PocketBase filter string short
+FETCH_CHUNK = 100
+
+
+def normalise(tags: Iterable[str]) -> List[str]:
+    """Lowercased, stripped and de-duplicated, in order."""
+    return list(dict.fromkeys(t.strip().lower() for t in tags if t and t.strip()))
+
+
+def _insert(token: str, row: dict):
+    error = None
+    for _ in range(INSERT_ATTEMPTS):
+        try:
+            if pocketbase.table(COLLECTION, token=token).insert(row).get("items"):
+                return
+        except Exception as e:
+            error = e
+    raise ValueError(f"Failed to store tag '{row['tag']}' for session {row['session_id']}: {error or 'no record returned'}")
+
+
+def add(token: str, user_id: str, session_id: str, tags: Iterable[str]):
+    """Write one row per tag; raises ValueError if a row cannot be stored, leaving the rows written so far."""
+    try:
+        for tag in normalise(tags):
+            _insert(token, {"user_id": user_id, "session_id": session_id, "tag": tag})
+    finally:
+        tag_index.bump(user_id)
+
+
+def remove(token: str, user_id: str, session_id: str):
+    pocketbase.table(COLLECTION, token=token).eq("session_id", session_id).eq("user_id", user_id).delete()
+    tag_index.bump(user_id)
+
+
+def matching(token: str, user_id: str, tag: str) -> List[str]:
+    """Ids of the user's sessions tagged `tag` (case-insensitive)."""
+    key = (user_id, tag.strip().lower())
+    # Read before the backend so a write landing mid-read leaves this entry outdated
+    version = tag_index.version(user_id)
+    entry = tag_index.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+    rows = pocketbase.table(COLLECTION, token=token).eq("user_id", user_id).eq("tag", key[1])\
+                     .select("session_id").execute().get("items", [])
+    session_ids = [r["session_id"] for r in rows]
+    tag_index.set(key, [version, session_ids])
+    return session_ids
+
+
+def fetch(query: Table, session_ids: List[str]) -> List[dict]:
+    """Rows of `query` (the other filters already applied) among `session_ids`, read in chunks."""
+    items = []
+    for start in range(0, len(session_ids), FETCH_CHUNK):
+        chunk = copy.copy(query)
+        chunk.conditions = query.conditions + [("id", "in", session_ids[start:start + FETCH_CHUNK])]
+        items.extend(chunk.execute().get("items", []))
+    return items
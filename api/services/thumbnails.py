@@ -0,0 +1,249 @@
+"""
+Thumbnail / responsive variant generation for exercise images.
+
+Variants are content addressed: the sha256 of the original image names a
+directory holding one file per (size, format). Rendering happens in a process
+pool so Pillow never runs on the event loop. Pillow is optional; without it
+uploads simply carry no variants.
+
+The directory is only a cache: cleanup evicts the least recently served sets,
+and another instance never had them. A request for a missing variant renders
+the set again from the original in the blob store (regenerate()).
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Callable, Dict, Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:
+    Image = None
+
+THUMBNAIL_SIZES = (64, 256, 640)
+THUMBNAIL_FORMATS = ("webp", "jpeg")
+CACHE_DIR = os.environ.get("THUMBNAIL_CACHE_DIR", os.path.join(tempfile.gettempdir(), "exercise_thumbnails"))
+CACHE_MAX_BYTES = int(os.environ.get("THUMBNAIL_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+CLEANUP_INTERVAL_SECONDS = 300
+CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST_RE = re.compile(r"^[0-9a-f]{64}$")
+_VARIANT_RE = re.compile(r"^(\d+)\.(webp|jpeg)$")
+
+_pool: Optional[ProcessPoolExecutor] = None
+_last_cleanup = 0.0
+# digest -> the render in flight, so concurrent misses on one image render it once
+_regenerating: Dict[str, "asyncio.Task"] = {}
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    # Created lazily so each (possibly forked) worker owns its own pool
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=max(1, min(2, os.cpu_count() or 1)))
+    return _pool
+
+
+def variant_dir(digest: str) -> str:
+    return os.path.join(CACHE_DIR, digest[:2], digest)
+
+
+def variant_path(digest: str, variant: str) -> Optional[str]:
+    """Resolve `<size>.<format>` for a digest, or None if either part is malformed."""
+    if not _DIGEST_RE.match(digest) or not _VARIANT_RE.match(variant):
+        return None
+    return os.path.join(variant_dir(digest), variant)
+
+
+def thumbnail_urls(digest: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    if not digest:
+        return None
+    return {
+        str(size): {fmt: f"/api/exercise-images/{digest}/{size}.{fmt}" for fmt in THUMBNAIL_FORMATS}
+        for size in THUMBNAIL_SIZES
+    }
+
+
+def _new_source() -> Tuple[BinaryIO, str]:
+    """A fresh source file in the cache dir for a render to read; removed once it has."""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix="src-", dir=CACHE_DIR)
+    return os.fdopen(fd, "wb"), path
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def copy_and_hash(fileobj: BinaryIO, chunk_size: int = 64 * 1024) -> Tuple[str, str]:
+    """Copy the upload spool into the cache dir, hashing as it goes. Returns (digest, path)."""
+    hasher = hashlib.sha256()
+    fileobj.seek(0)
+    out, path = _new_source()
+    with out:
+        while True:
+            chunk = fileobj.read(chunk_size)
+            if not chunk:
+                break
+            hasher.update(chunk)
+            out.write(chunk)
+    fileobj.seek(0)
+    return hasher.hexdigest(), path
+
+
+def _render_variants(source_path: str, out_dir: str) -> int:
+    """Runs in a worker process. Writes every missing variant; returns how many were written."""
+    os.makedirs(out_dir, exist_ok=True)
+    written = 0
+    with Image.open(source_path) as original:
+        original = ImageOps.exif_transpose(original)
+        for size in THUMBNAIL_SIZES:
+            for fmt in THUMBNAIL_FORMATS:
+                target = os.path.join(out_dir, f"{size}.{fmt}")
+                if os.path.exists(target):
+                    continue
+                img = original.copy()
+                img.thumbnail((size, size))
+                if fmt == "jpeg" and img.mode not in ("RGB", "L"):
+                    img = img.convert("RGB")
+                tmp = f"{target}.{os.getpid()}.tmp"
+                img.save(tmp, format=fmt.upper(), quality=80, optimize=True)
+                os.replace(tmp, target)
+                written += 1
+    return written
+
+
+def has_variants(digest: str) -> bool:
+    out_dir = variant_dir(digest)
+    return all(os.path.exists(os.path.join(out_dir, f"{size}.{fmt}"))
+               for size in THUMBNAIL_SIZES for fmt in THUMBNAIL_FORMATS)
+
+
+async def generate_variants(digest: str, source_path: str) -> bool:
+    """Render all variants for `digest` off the event loop, then drop the source copy."""
+    try:
+        out_dir = variant_dir(digest)
+        if has_variants(digest):
+            return True
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(_get_pool(), _render_variants, source_path, out_dir)
+        return True
+    except Exception as e:
+        print(f"Thumbnail generation failed for {digest}: {str(e)}")
+        return False
+    finally:
+        _remove(source_path)
+        schedule_cleanup()
+
+
+async def regenerate(digest: str, download: Callable[[BinaryIO], bool]) -> bool:
+    """Render the variants for `digest` again from its original, which `download` writes to a file.
+
+    Runs once per digest however many requests miss at the same time.
+    """
+    task = _regenerating.get(digest)
+    if task is None:
+        task = asyncio.ensure_future(_regenerate(digest, download))
+        _regenerating[digest] = task
+        task.add_done_callback(lambda _: _regenerating.pop(digest, None))
+    return await asyncio.shield(task)
+
+
+async def _regenerate(digest: str, download: Callable[[BinaryIO], bool]) -> bool:
+    out, source_path = _new_source()
+    try:
+        with out:
+            found = await asyncio.get_running_loop().run_in_executor(None, download, out)
+    except Exception as e:
+        print(f"Fetching the original of {digest} failed: {str(e)}")
+        found = False
+    if not found:
+        _remove(source_path)
+        return False
+    return await generate_variants(digest, source_path)
+
+
+def touch(path: str):
+    """Mark a variant as recently served so cleanup evicts colder ones first."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+def schedule_cleanup():
+    """Run maybe_cleanup on a background thread, at most once per CLEANUP_INTERVAL_SECONDS."""
+    global _last_cleanup
+    now = time.time()
+    if now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+        return
+    _last_cleanup = now
+    threading.Thread(target=_cleanup_quietly, name="thumbnail-cleanup", daemon=True).start()
+
+
+def _cleanup_quietly():
+    try:
+        maybe_cleanup(force=True)
+    except Exception as e:
+        print(f"Thumbnail cache cleanup failed: {str(e)}")
+
+
+def maybe_cleanup(max_bytes: int = CACHE_MAX_BYTES, force: bool = False) -> int:
+    """Evict least recently served variant sets until the cache fits in `max_bytes`."""
+    global _last_cleanup
+    now = time.time()
+    if not force and now - _last_cleanup < CLEANUP_INTERVAL_SECONDS:
+        return 0
+    _last_cleanup = now
+    if not os.path.isdir(CACHE_DIR):
+        return 0
+
+    # Renders and other workers change the tree while it is walked: skip whatever vanishes
+    entries = []
+    total = 0
+    for prefix in os.listdir(CACHE_DIR):
+        prefix_dir = os.path.join(CACHE_DIR, prefix)
+        try:
+            if not os.path.isdir(prefix_dir):
+                # Orphaned source copies from a crashed render
+                if prefix.startswith("src-") and now - os.path.getmtime(prefix_dir) > CLEANUP_INTERVAL_SECONDS:
+                    os.remove(prefix_dir)
+                continue
+            digests = os.listdir(prefix_dir)
+        except OSError:
+            continue
+        for digest in digests:
+            path = os.path.join(prefix_dir, digest)
+            size, newest = 0, 0.0
+            try:
+                for name in os.listdir(path):
+                    stat = os.stat(os.path.join(path, name))
+                    size += stat.st_size
+                    newest = max(newest, stat.st_mtime)
+            except OSError:
+                continue
+            entries.append((newest, size, path))
+            total += size
+
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
@@ -0,0 +1,168 @@
+"""
+Pure workout computations used by the routes.
+
+Nothing in here touches PocketBase or FastAPI, so these can be benchmarked
+in isolation (see benchmarks/micro.py).
+"""
+
+import bisect
+import datetime
+from typing import Iterable, List, Optional
+
+
+# ── EXERCISE LIBRARY ──────────────────────────────────────────────────────────
+
+def filter_exercises(exercises: Iterable[dict], search: Optional[str], muscle_group: Optional[str],
+                     equipment: Optional[str], difficulty: Optional[str], **extra) -> List[dict]:
+    """Matching exercises copied with `extra` fields merged in."""
+    if search:
+        search = search.lower()
+    result = []
+    for ex in exercises:
+        if search and search not in ex["name"].lower():
+            continue
+        if muscle_group and ex["muscle_group"] != muscle_group:
+            continue
+        if equipment and ex["equipment"] != equipment:
+            continue
+        if difficulty and ex["difficulty"] != difficulty:
+            continue
+        result.append({**ex, **extra})
+    return result
+
+
+# ── SESSIONS ──────────────────────────────────────────────────────────────────
+
+def parse_tags(raw) -> List[str]:
+    """Tags are stored as a comma-separated string; older records may hold a list."""
+    if isinstance(raw, str):
+        return [t for t in raw.split(",") if t]
+    return raw or []
+
+
+def filter_sessions(items: List[dict], workout_type: Optional[str] = None, category: Optional[str] = None,
+                    level: Optional[str] = None, tag: Optional[str] = None) -> List[dict]:
+    """Sessions (with tags already parsed) matching every given filter."""
+    if not (workout_type or category or level or tag):
+        return items
+    tag = tag.lower() if tag else None
+    result = []
+    for i in items:
+        if workout_type and i.get("workout_type") != workout_type:
+            continue
+        if category and i.get("category") != category:
+            continue
+        if level and i.get("level") != level:
+            continue
+        if tag and not any(t.lower() == tag for t in i.get("tags", [])):
+            continue
+        result.append(i)
+    return result
+
+
+# ── FINISHING A WORKOUT ───────────────────────────────────────────────────────
+
+def set_volume(s: dict) -> float:
+    return float(s.get("reps") or 0) * float(s.get("weight_kg") or 0)
+
+
+def epley_1rm(weight: float, reps: int) -> float:
+    return round(weight * (1 + reps / 30), 2) if reps > 0 else weight
+
+
+def group_sets_by_exercise(completed: List[dict]) -> dict:
+    """{exercise_library_id: [sets]} keeping set order; sets without an id are skipped."""
+    grouped = {}
+    for s in completed:
+        ex_id = s.get("exercise_library_id")
+        if ex_id:
+            grouped.setdefault(ex_id, []).append(s)
+    return grouped
+
+
+# ── PERSONAL RECORDS ──────────────────────────────────────────────────────────
+
+# Rep counts that get their own best-weight record
+REP_MAX_RANGE = 12
+
+
+def log_volume(log: dict) -> float:
+    return float(log.get("sets") or 0) * float(log.get("reps") or 0) * float(log.get("weight_kg") or 0)
+
+
+def volume_ref(log: dict) -> str:
+    """What a volume record belongs to: the log's session, or the log itself when it has none."""
+    return log.get("session_id") or log["id"]
+
+
+def empty_pr() -> dict:
+    """The records of an exercise with no logs. `holders` maps each record to the log
+    (for best_volume, the volume_ref) that set it."""
+    return {"max_weight_kg": 0.0, "max_reps": 0, "best_volume": 0.0, "best_1rm_estimate": 0.0,
+            "rep_maxes": {}, "holders": {}}
+
+
+def add_logs(pr: dict, logs: Iterable[dict]) -> bool:
+    """Fold exercise logs (with ids) into `pr` in place. True if any record improved.
+    Volume is per session: the logs of one session_id are summed."""
+    improved = False
+    volumes = {}
+    for log in logs:
+        weight = float(log.get("weight_kg") or 0)
+        reps = int(log.get("reps") or 0)
+        for field, value in (("max_weight_kg", weight), ("max_reps", reps),
+                             ("best_1rm_estimate", epley_1rm(weight, reps))):
+            if value > pr[field]:
+                pr[field] = value
+                pr["holders"][field] = log["id"]
+                improved = True
+        if weight > 0 and 1 <= reps <= REP_MAX_RANGE:
+            best = pr["rep_maxes"].get(str(reps))
+            if best is None or weight > best["weight_kg"]:
+                pr["rep_maxes"][str(reps)] = {"weight_kg": weight, "log_id": log["id"]}
+                improved = True
+        ref = volume_ref(log)
+        volumes[ref] = volumes.get(ref, 0.0) + log_volume(log)
+    for ref, volume in volumes.items():
+        if volume > pr["best_volume"]:
+            pr["best_volume"] = round(volume, 2)
+            pr["holders"]["best_volume"] = ref
+            improved = True
+    return improved
+
+
+def holds_record(pr: dict, log: dict) -> bool:
+    """Whether deleting `log` can lower one of the records in `pr`."""
+    refs = set(pr["holders"].values())
+    refs.update(best["log_id"] for best in pr["rep_maxes"].values())
+    return log["id"] in refs or volume_ref(log) in refs
+
+
+# ── STATS ─────────────────────────────────────────────────────────────────────
+
+def weekly_volume(sessions: Iterable[dict], today: datetime.date, weeks: int = 8) -> List[dict]:
+    """Session count and volume per Monday-start week, oldest first, for the
+    `weeks` weeks ending with the current one. One pass over `sessions`."""
+    starts = [today - datetime.timedelta(days=today.weekday() + 7 * w) for w in range(weeks - 1, -1, -1)]
+    start_keys = [d.isoformat() for d in starts]
+    end_keys = [(d + datetime.timedelta(days=6)).isoformat() for d in starts]
+    counts = [0] * weeks
+    volumes = [0.0] * weeks
+
+    for s in sessions:
+        date = s.get("session_date") or ""
+        i = bisect.bisect_right(start_keys, date) - 1
+        if i < 0 or date > end_keys[i]:
+            continue
+        counts[i] += 1
+        volumes[i] += float(s.get("total_volume_kg") or 0)
+
+    return [
+        {
+            "week_start":    start_keys[i],
+            "week_label":    starts[i].strftime("%b %d"),
+            "session_count": counts[i],
+            "volume_kg":     round(volumes[i], 2),
+        }
+        for i in range(weeks)
+    ]
@@ -0,0 +1,110 @@
+"""
+Compare the PocketBase and embedded SQLite storage backends on the access
+patterns the routes use: inserting exercise logs, keyed list reads by user,
+by (user, exercise) and by session, and single-record updates.
+
+    python -m benchmarks.compare_backends --rows 2000 --reads 500
+    python -m benchmarks.compare_backends --token <pocketbase user token> --user-id <id>
+
+PocketBase is skipped unless a user token is given (its collection rules
+need an authenticated user). SQLite runs against a throwaway database file
+through a service table, so no token has to be verified; the routes' reads
+carry the same user_id condition the owner rule would add.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+
+from api.config import sqlite_backend
+from api.config.database import PocketBaseClient
+
+
+def _percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def _report(backend, op, samples):
+    ms = [s * 1000 for s in samples]
+    print(f"{backend:<11} {op:<22} n={len(ms):<6} mean={statistics.mean(ms):8.3f}ms "
+          f"p50={_percentile(ms, 50):8.3f}ms p95={_percentile(ms, 95):8.3f}ms p99={_percentile(ms, 99):8.3f}ms")
+
+
+def _timed(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def run(client: PocketBaseClient, name: str, user_id: str, token: str, rows: int, reads: int, seed: int):
+    rng = random.Random(seed)
+    exercise_ids = [f"bench-ex-{i}" for i in range(20)]
+    session_ids = [f"bench-session-{i}" for i in range(max(1, rows // 20))]
+    if token:
+        table = lambda: client.table("exercise_logs", token=token)
+    else:
+        table = lambda: client.service_table("exercise_logs")
+
+    insert_times, ids = [], []
+    for i in range(rows):
+        data = {
+            "user_id": user_id,
+            "exercise_id": rng.choice(exercise_ids),
+            "session_id": rng.choice(session_ids),
+            "sets": 1,
+            "reps": rng.randint(1, 12),
+            "weight_kg": round(rng.uniform(10, 200), 1),
+            "notes": "",
+            "logged_at": f"2024-01-01T00:00:{i % 60:02d}Z",
+        }
+        start = time.perf_counter()
+        result = table().insert(data)
+        insert_times.append(time.perf_counter() - start)
+        ids.append(result["items"][0]["id"])
+    _report(name, "insert", insert_times)
+
+    _report(name, "list by user", [_timed(lambda: table().eq("user_id", user_id).execute()) for _ in range(reads)])
+    _report(name, "list by user+exercise", [
+        _timed(lambda: table().eq("user_id", user_id).eq("exercise_id", rng.choice(exercise_ids)).execute())
+        for _ in range(reads)
+    ])
+    _report(name, "list by session", [
+        _timed(lambda: table().eq("session_id", rng.choice(session_ids)).execute()) for _ in range(reads)
+    ])
+    _report(name, "get by id", [_timed(lambda: table().eq("id", rng.choice(ids)).execute()) for _ in range(reads)])
+    _report(name, "update by id", [
+        _timed(lambda: table().update({"id": rng.choice(ids), "notes": "x"})) for _ in range(reads)
+    ])
+
+    start = time.perf_counter()
+    table().eq("user_id", user_id).delete()
+    print(f"{name:<11} cleanup                {time.perf_counter() - start:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare storage backends")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--reads", type=int, default=300)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--token", help="PocketBase user token; PocketBase is skipped without it")
+    parser.add_argument("--user-id", default="benchuser000001")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sqlite_backend.SQLITE_PATH = os.path.join(tmp, "bench.db")
+        sqlite_backend.SQLITE_FILES_DIR = os.path.join(tmp, "files")
+        run(PocketBaseClient(backend="sqlite"), "sqlite", args.user_id, None, args.rows, args.reads, args.seed)
+
+    if args.token:
+        run(PocketBaseClient(backend="pocketbase"), "pocketbase", args.user_id, args.token,
+            args.rows, args.reads, args.seed)
+    else:
+        print("pocketbase  skipped (pass --token to include it)")
+
+
+if __name__ == "__main__":
+    main()
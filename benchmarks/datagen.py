@@ -0,0 +1,142 @@
+"""
+Synthetic user histories for load tests.
+
+generate_user() returns {collection: [records]} for one user with a
+configurable number of years of training: workout sessions with their logged
+sets, body measurements, templates, personal records and a workout folder.
+Everything is derived from the seed, so the same arguments always produce
+the same data.
+"""
+
+import base64
+import datetime
+import json
+import random
+from typing import Dict, List
+
+from api.data.exercise_seed import SEED_EXERCISES
+
+_STRENGTH_IDS = [ex["id"] for ex in SEED_EXERCISES if ex["category"] == "strength"]
+_NAMES = {ex["id"]: ex["name"] for ex in SEED_EXERCISES}
+
+
+def fake_token(user_id: str, ttl_days: int = 7) -> str:
+    """A JWT-shaped token the fake PocketBase accepts for `user_id`."""
+    encode = lambda obj: base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    exp = int(datetime.datetime.now(datetime.timezone.utc).timestamp()) + ttl_days * 86400
+    return f"{encode({'alg': 'HS256'})}.{encode({'id': user_id, 'type': 'authRecord', 'exp': exp})}.signature"
+
+
+def _id(rng: random.Random, prefix: str) -> str:
+    return (prefix + "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(15)))[:15]
+
+
+def generate_user(user_id: str, years: float = 1.0, sessions_per_week: float = 3.0,
+                  exercises_per_session: int = 5, sets_per_exercise: int = 3,
+                  measurements_per_month: int = 4, templates: int = 4,
+                  seed: int = 0, today: datetime.date = None) -> Dict[str, List[dict]]:
+    rng = random.Random(f"{seed}:{user_id}")
+    today = today or datetime.date.today()
+    data: Dict[str, List[dict]] = {
+        "workout_sessions": [], "exercise_logs": [], "measurements": [],
+        "workout_templates": [], "template_exercises": [], "personal_records": [],
+        "folders": [], "session_tags": [],
+    }
+
+    # Each user trains a stable subset of exercises with a slowly rising working weight
+    programme = rng.sample(_STRENGTH_IDS, min(len(_STRENGTH_IDS), exercises_per_session * 3))
+    base_weight = {ex_id: rng.uniform(20, 100) for ex_id in programme}
+    best: Dict[str, dict] = {}
+
+    days = int(years * 365)
+    session_probability = sessions_per_week / 7
+    for offset in range(days, -1, -1):
+        day = today - datetime.timedelta(days=offset)
+        if rng.random() >= session_probability:
+            continue
+        progress = 1 + 0.3 * (days - offset) / max(days, 1)
+        session_id = _id(rng, "ws")
+        exercises = rng.sample(programme, min(len(programme), exercises_per_session))
+        volume, set_count = 0.0, 0
+        for ex_id in exercises:
+            for set_number in range(sets_per_exercise):
+                reps = rng.randint(3, 12)
+                weight = round(base_weight[ex_id] * progress * rng.uniform(0.9, 1.05) / 2.5) * 2.5
+                volume += reps * weight
+                set_count += 1
+                data["exercise_logs"].append({
+                    "id": _id(rng, "el"),
+                    "user_id": user_id,
+                    "exercise_id": ex_id,
+                    "exercise_library_id": ex_id,
+                    "exercise_name": _NAMES[ex_id],
+                    "sets": 1,
+                    "reps": reps,
+                    "weight_kg": weight,
+                    "notes": "",
+                    "logged_at": f"{day.isoformat()}T18:{set_number:02d}:00Z",
+                    "session_id": session_id,
+                    "is_pr": False,
+                })
+                record = best.setdefault(ex_id, {"max_weight_kg": 0, "max_reps": 0, "best_volume": 0,
+                                                  "best_1rm_estimate": 0, "achieved_at": ""})
+                if weight > record["max_weight_kg"]:
+                    record.update(max_weight_kg=weight, achieved_at=f"{day.isoformat()}T18:00:00Z")
+                record["max_reps"] = max(record["max_reps"], reps)
+                record["best_volume"] = max(record["best_volume"], reps * weight)
+                record["best_1rm_estimate"] = max(record["best_1rm_estimate"], round(weight * (1 + reps / 30), 2))
+        data["workout_sessions"].append({
+            "id": session_id,
+            "user_id": user_id,
+            "workout_id": "quick",
+            "workout_name": rng.choice(["Push", "Pull", "Legs", "Upper", "Lower", "Full Body"]),
+            "workout_type": "gym",
+            "category": "gym",
+            "level": "all",
+            "tags": "gym,weights,strength,resistance",
+            "session_date": day.isoformat(),
+            "notes": "",
+            "duration_seconds": rng.randint(2400, 5400),
+            "total_volume_kg": round(volume, 2),
+            "set_count": set_count,
+            "exercise_count": len(exercises),
+        })
+        for tag in ("gym", "weights", "strength", "resistance"):
+            data["session_tags"].append({"id": _id(rng, "st"), "user_id": user_id, "session_id": session_id, "tag": tag})
+
+    weight = rng.uniform(60, 95)
+    for offset in range(days, -1, max(1, 30 // max(measurements_per_month, 1))):
+        weight += rng.uniform(-0.4, 0.3)
+        day = today - datetime.timedelta(days=offset)
+        data["measurements"].append({
+            "id": _id(rng, "me"), "user_id": user_id, "weight_kg": round(weight, 1),
+            "body_fat_pct": round(rng.uniform(10, 25), 1), "chest_cm": None, "waist_cm": round(rng.uniform(70, 95), 1),
+            "hips_cm": None, "arms_cm": None, "legs_cm": None, "logged_at": f"{day.isoformat()}T07:00:00Z",
+        })
+
+    for t in range(templates):
+        template_id = _id(rng, "wt")
+        data["workout_templates"].append({
+            "id": template_id, "user_id": user_id, "name": f"Template {t + 1}", "workout_type": "gym",
+            "estimated_duration_min": 60, "difficulty": "intermediate", "description": "", "last_used_at": "",
+        })
+        for order, ex_id in enumerate(rng.sample(programme, min(len(programme), exercises_per_session))):
+            data["template_exercises"].append({
+                "id": _id(rng, "te"), "user_id": user_id, "template_id": template_id, "exercise_library_id": ex_id,
+                "exercise_name": _NAMES[ex_id], "order_index": order, "target_sets": sets_per_exercise,
+                "target_reps": 8, "target_weight_kg": round(base_weight[ex_id] / 2.5) * 2.5, "rest_seconds": 90,
+            })
+
+    for ex_id, record in best.items():
+        data["personal_records"].append({
+            "id": _id(rng, "pr"), "user_id": user_id, "exercise_library_id": ex_id,
+            "exercise_name": _NAMES[ex_id], **record,
+        })
+
+    data["folders"].append({"id": _id(rng, "fo"), "user_id": user_id, "name": "My Workouts"})
+    return data
+
+
+def generate_users(count: int, seed: int = 0, **kwargs) -> Dict[str, Dict[str, List[dict]]]:
+    """{user_id: history} for `count` users."""
+    return {f"benchuser{i:06d}": generate_user(f"benchuser{i:06d}", seed=seed, **kwargs) for i in range(count)}
@@ -0,0 +1,528 @@
+"""
+In-memory stand-in for the subset of the PocketBase REST API the app uses.
+
+Supported:
+    GET    /api/collections/{c}/records          filter, sort, fields, page, perPage, skipTotal
+    GET    /api/collections/{c}/records/{id}
+    POST   /api/collections/{c}/records          JSON or multipart (file fields)
+    PATCH  /api/collections/{c}/records/{id}     JSON or multipart, "field+"/"field-" modifiers
+    DELETE /api/collections/{c}/records/{id}
+    POST   /api/collections/users/auth-refresh   accepts any JWT-shaped token with an `id`
+    POST   /api/admins/auth-with-password        accepts any credentials
+    GET    /api/files/{c}/{id}/{filename}
+    GET    /api/health
+
+Like PocketBase, the unique indexes and number fields declared in
+api/config/schema.py are enforced; collection rules are not.
+
+Every request can be delayed (latency + jitter) and failed at a configurable
+rate, all driven by a seeded RNG so runs are reproducible. Point the app at it
+with POCKETBASE_URL=http://127.0.0.1:<port>.
+
+    python -m benchmarks.fake_pocketbase --port 8090 --latency-ms 2 --jitter-ms 1 --error-rate 0.01
+
+or in-process:
+
+    server = FakePocketBase(latency_ms=2).start()
+    ...
+    server.stop()
+"""
+
+import argparse
+import base64
+import datetime
+import email.parser
+import json
+import random
+import re
+import secrets
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlparse
+
+from api.config.schema import COLLECTIONS_BY_NAME
+
+MAX_PER_PAGE = 1000
+_ID_ALPHABET = string.ascii_lowercase + string.digits
+
+
+# ── FILTER PARSER ─────────────────────────────────────────────────────────────
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?:
+        (?P<string>"(?:[^"\\]|\\.)*"|'(?:[^'\\]|\\.)*')
+      | (?P<number>-?\d+(?:\.\d+)?)
+      | (?P<op>&&|\|\||!=|>=|<=|!~|=|>|<|~|\(|\))
+      | (?P<ident>[A-Za-z_@][\w.@]*)
+    )""", re.VERBOSE)
+
+
+def _tokenize(text: str) -> List[Tuple[str, Any]]:
+    tokens, pos = [], 0
+    text = text.strip()
+    while pos < len(text):
+        match = _TOKEN_RE.match(text, pos)
+        if not match or match.end() == pos:
+            raise ValueError(f"Invalid filter near: {text[pos:pos + 20]!r}")
+        pos = match.end()
+        kind = match.lastgroup
+        value = match.group(kind)
+        if kind == "string":
+            value = re.sub(r"\\(.)", r"\1", value[1:-1])
+        elif kind == "number":
+            value = float(value) if "." in value else int(value)
+        elif kind == "ident" and value in ("true", "false", "null"):
+            kind, value = "literal", {"true": True, "false": False, "null": None}[value]
+        tokens.append((kind, value))
+    return tokens
+
+
+def _compare(left: Any, op: str, right: Any) -> bool:
+    if left is None:
+        left = ""
+    if right is None:
+        right = ""
+    if isinstance(right, bool) or isinstance(left, bool):
+        left, right = bool(left), bool(right)
+    elif isinstance(right, (int, float)) and not isinstance(left, (int, float)):
+        try:
+            left = float(left)
+        except (TypeError, ValueError):
+            left, right = str(left), str(right)
+    elif isinstance(left, (int, float)) and isinstance(right, str):
+        left = str(left)
+    if op == "=":
+        return left == right
+    if op == "!=":
+        return left != right
+    if op in ("~", "!~"):
+        found = str(right).lower().strip("%") in str(left).lower()
+        return found if op == "~" else not found
+    try:
+        return {">": left > right, ">=": left >= right, "<": left < right, "<=": left <= right}[op]
+    except TypeError:
+        return False
+
+
+def compile_filter(text: str) -> Callable[[dict], bool]:
+    """Compile a PocketBase filter expression into a predicate over records."""
+    if not text or not text.strip():
+        return lambda record: True
+    tokens = _tokenize(text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else (None, None)
+
+    def take():
+        nonlocal pos
+        token = peek()
+        pos += 1
+        return token
+
+    def operand(token):
+        kind, value = token
+        if kind == "ident":
+            return lambda r, v=value: r.get(v)
+        if kind in ("string", "number", "literal"):
+            return lambda r, v=value: v
+        raise ValueError(f"Unexpected token {value!r}")
+
+    def primary():
+        if peek() == ("op", "("):
+            take()
+            node = expression()
+            if take() != ("op", ")"):
+                raise ValueError("Unbalanced parentheses in filter")
+            return node
+        left = operand(take())
+        kind, op = take()
+        if kind != "op" or op not in ("=", "!=", ">", ">=", "<", "<=", "~", "!~"):
+            raise ValueError(f"Expected comparison operator, got {op!r}")
+        right = operand(take())
+        return lambda r: _compare(left(r), op, right(r))
+
+    def conjunction():
+        nodes = [primary()]
+        while peek() == ("op", "&&"):
+            take()
+            nodes.append(primary())
+        return lambda r: all(n(r) for n in nodes)
+
+    def expression():
+        nodes = [conjunction()]
+        while peek() == ("op", "||"):
+            take()
+            nodes.append(conjunction())
+        return lambda r: any(n(r) for n in nodes)
+
+    predicate = expression()
+    if pos != len(tokens):
+        raise ValueError("Unexpected trailing tokens in filter")
+    return predicate
+
+
+def sort_records(records: List[dict], sort: str) -> List[dict]:
+    for field in reversed([f.strip() for f in sort.split(",") if f.strip()]):
+        descending = field.startswith("-")
+        name = field.lstrip("+-")
+        records = sorted(records, key=lambda r: (r.get(name) is None, r.get(name) if r.get(name) is not None else ""),
+                         reverse=descending)
+    return records
+
+
+# ── STORE ─────────────────────────────────────────────────────────────────────
+
+def _now() -> str:
+    return datetime.datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3] + "Z"
+
+
+def _number(value: Any):
+    # Multipart bodies carry numbers as strings
+    if isinstance(value, str):
+        return float(value) if "." in value else int(value or 0)
+    return value or 0
+
+
+class NotUnique(ValueError):
+    """A write that would break one of the collection's unique indexes."""
+
+    def __init__(self, fields):
+        super().__init__("Failed to create record.")
+        self.fields = fields
+
+
+def _numbers(name: str, data: dict) -> dict:
+    """`data` with the collection's number fields cast, as PocketBase does for multipart values."""
+    numeric = {f["name"] for f in COLLECTIONS_BY_NAME.get(name, {}).get("schema", []) if f["type"] == "number"}
+    return {k: _number(v) if k in numeric and isinstance(v, str) else v for k, v in data.items()}
+
+
+class RecordStore:
+    """Collections of records kept in memory; thread-safe."""
+
+    def __init__(self):
+        self.collections: Dict[str, Dict[str, dict]] = {}
+        self.files: Dict[Tuple[str, str, str], bytes] = {}
+        self.lock = threading.Lock()
+
+    def _collection(self, name: str) -> Dict[str, dict]:
+        return self.collections.setdefault(name, {})
+
+    def _check_unique(self, name: str, record: dict):
+        for spec in COLLECTIONS_BY_NAME.get(name, {}).get("indexes", []):
+            if not spec["unique"]:
+                continue
+            key = tuple(record.get(f) for f in spec["fields"])
+            if any(other["id"] != record["id"] and tuple(other.get(f) for f in spec["fields"]) == key
+                   for other in self._collection(name).values()):
+                raise NotUnique(spec["fields"])
+
+    def list(self, name: str, filter_text: str = "", sort: str = "") -> List[dict]:
+        predicate = compile_filter(filter_text)
+        with self.lock:
+            records = [dict(r) for r in self._collection(name).values() if predicate(r)]
+        return sort_records(records, sort) if sort else records
+
+    def get(self, name: str, record_id: str) -> Optional[dict]:
+        with self.lock:
+            record = self._collection(name).get(record_id)
+            return dict(record) if record else None
+
+    def create(self, name: str, data: dict, files: Dict[str, Tuple[str, bytes]] = None) -> dict:
+        record_id = data.pop("id", None) or "".join(secrets.choice(_ID_ALPHABET) for _ in range(15))
+        now = _now()
+        record = {**_numbers(name, data), "id": record_id, "collectionId": name, "collectionName": name,
+                  "created": now, "updated": now}
+        with self.lock:
+            self._check_unique(name, record)
+            for field, (filename, content) in (files or {}).items():
+                record[field] = filename
+                self.files[(name, record_id, filename)] = content
+            self._collection(name)[record_id] = record
+        return dict(record)
+
+    def update(self, name: str, record_id: str, data: dict,
+               files: Dict[str, Tuple[str, bytes]] = None) -> Optional[dict]:
+        with self.lock:
+            record = self._collection(name).get(record_id)
+            if record is None:
+                return None
+            record = dict(record)
+            for key, value in _numbers(name, data).items():
+                if key.endswith("+") or key.endswith("-"):
+                    field = key[:-1]
+                    delta = _number(value)
+                    record[field] = _number(record.get(field)) + (delta if key.endswith("+") else -delta)
+                else:
+                    record[key] = value
+            self._check_unique(name, record)
+            self._collection(name)[record_id] = record
+            for field, (filename, content) in (files or {}).items():
+                record[field] = filename
+                self.files[(name, record_id, filename)] = content
+            record["updated"] = _now()
+            return dict(record)
+
+    def delete(self, name: str, record_id: str) -> bool:
+        with self.lock:
+            removed = self._collection(name).pop(record_id, None)
+            if removed is None:
+                return False
+            for key in [k for k in self.files if k[0] == name and k[1] == record_id]:
+                del self.files[key]
+            return True
+
+    def load(self, name: str, records: List[dict]):
+        """Bulk-load records (as produced by a data generator) without going through HTTP."""
+        now = _now()
+        with self.lock:
+            collection = self._collection(name)
+            for data in records:
+                record = {"collectionId": name, "collectionName": name, "created": now, "updated": now, **data}
+                if "id" not in record:
+                    record["id"] = "".join(secrets.choice(_ID_ALPHABET) for _ in range(15))
+                collection[record["id"]] = record
+
+
+# ── HTTP ──────────────────────────────────────────────────────────────────────
+
+_RECORDS_RE = re.compile(r"^/api/collections/([^/]+)/records(?:/([^/]+))?/?$")
+_FILES_RE = re.compile(r"^/api/files/([^/]+)/([^/]+)/([^/]+)$")
+
+
+def _admin_token() -> str:
+    """An unsigned JWT-shaped superuser token, valid for an hour."""
+    encode = lambda part: base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b"=").decode()
+    payload = {"id": "fakeadmin00000", "type": "admin", "exp": int(time.time()) + 3600}
+    return f"{encode({'alg': 'none', 'typ': 'JWT'})}.{encode(payload)}.fake"
+
+
+def _token_user_id(header: str) -> Optional[str]:
+    if not header.startswith("Bearer "):
+        return None
+    parts = header[7:].split(".")
+    if len(parts) != 3:
+        return None
+    try:
+        payload = parts[1] + "=" * (-len(parts[1]) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload)).get("id")
+    except Exception:
+        return None
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "FakePocketBase/0.1"
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out as separate writes; without TCP_NODELAY a kept-alive
+    # client connection stalls ~40ms per response on Nagle + delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def fake(self) -> "FakePocketBase":
+        return self.server.fake
+
+    def _send(self, status: int, payload: Any = None, content_type: str = "application/json"):
+        body = b"" if payload is None else (
+            payload if isinstance(payload, bytes) else json.dumps(payload).encode("utf-8"))
+        self.send_response(status)
+        if status != 204:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def _error(self, status: int, message: str, data: dict = None):
+        self._send(status, {"code": status, "message": message, "data": data or {}})
+
+    def _read_body(self) -> Tuple[dict, Dict[str, Tuple[str, bytes]]]:
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        content_type = self.headers.get("Content-Type", "")
+        if content_type.startswith("multipart/form-data"):
+            message = email.parser.BytesParser().parsebytes(
+                f"Content-Type: {content_type}\r\n\r\n".encode("latin-1") + raw)
+            data, files = {}, {}
+            for part in message.get_payload():
+                name = part.get_param("name", header="content-disposition")
+                filename = part.get_filename()
+                content = part.get_payload(decode=True) or b""
+                if filename:
+                    files[name] = (filename, content)
+                else:
+                    data[name] = content.decode("utf-8")
+            return data, files
+        return (json.loads(raw) if raw else {}), {}
+
+    def _dispatch(self, method: str):
+        if not self.fake.before_request(self):
+            return
+        url = urlparse(self.path)
+        path = unquote(url.path)
+
+        if path == "/api/health":
+            return self._send(200, {"code": 200, "message": "API is healthy."})
+        if method == "POST" and path == "/api/collections/users/auth-refresh":
+            user_id = _token_user_id(self.headers.get("Authorization", ""))
+            if not user_id:
+                return self._error(401, "The request requires valid record authorization token to be set.")
+            record = self.fake.store.get("users", user_id) or {"id": user_id, "email": f"{user_id}@example.com"}
+            return self._send(200, {"token": self.headers["Authorization"][7:], "record": record})
+        if method == "POST" and path == "/api/admins/auth-with-password":
+            self._read_body()
+            return self._send(200, {"token": _admin_token(), "admin": {"id": "fakeadmin00000"}})
+
+        files_match = _FILES_RE.match(path)
+        if method == "GET" and files_match:
+            content = self.fake.store.files.get(files_match.groups())
+            if content is None:
+                return self._error(404, "The requested resource wasn't found.")
+            return self._send(200, content, content_type="application/octet-stream")
+
+        match = _RECORDS_RE.match(path)
+        if not match:
+            return self._error(404, "The requested resource wasn't found.")
+        collection, record_id = match.groups()
+        store = self.fake.store
+
+        if method == "GET" and record_id:
+            record = store.get(collection, record_id)
+            return self._send(200, record) if record else self._error(404, "The requested resource wasn't found.")
+        if method == "GET":
+            return self._list(collection, parse_qs(url.query))
+        try:
+            if method == "POST" and not record_id:
+                data, files = self._read_body()
+                return self._send(200, store.create(collection, data, files))
+            if method == "PATCH" and record_id:
+                data, files = self._read_body()
+                record = store.update(collection, record_id, data, files)
+                return self._send(200, record) if record else self._error(404, "The requested resource wasn't found.")
+        except NotUnique as e:
+            return self._error(400, str(e), {f: {"code": "validation_not_unique", "message": "Value must be unique."}
+                                             for f in e.fields})
+        if method == "DELETE" and record_id:
+            return self._send(204) if store.delete(collection, record_id) else \
+                self._error(404, "The requested resource wasn't found.")
+        return self._error(405, "Method not allowed.")
+
+    def _list(self, collection: str, query: Dict[str, List[str]]):
+        arg = lambda name, default="": query.get(name, [default])[0]
+        try:
+            records = self.fake.store.list(collection, arg("filter"), arg("sort"))
+        except ValueError as e:
+            return self._error(400, "Something went wrong while processing your request. Invalid filter parameters.",
+                               {"filter": str(e)})
+        per_page = max(1, min(int(arg("perPage", "30")), self.fake.max_per_page))
+        page = max(1, int(arg("page", "1")))
+        total = len(records)
+        items = records[(page - 1) * per_page: page * per_page]
+        fields = [f.strip() for f in arg("fields").split(",") if f.strip()]
+        if fields and "*" not in fields:
+            items = [{k: v for k, v in item.items() if k in fields} for item in items]
+        skip_total = arg("skipTotal") in ("1", "true")
+        self._send(200, {
+            "page": page, "perPage": per_page, "totalItems": -1 if skip_total else total,
+            "totalPages": -1 if skip_total else (total + per_page - 1) // per_page, "items": items,
+        })
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PATCH(self):
+        self._dispatch("PATCH")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+
+class FakePocketBase:
+    """Loopback PocketBase stand-in with injectable latency and errors."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0,
+                 jitter_ms: float = 0.0, error_rate: float = 0.0, seed: int = 1,
+                 max_per_page: int = MAX_PER_PAGE, store: RecordStore = None):
+        self.host = host
+        self.port = port
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.max_per_page = max_per_page
+        self.store = store or RecordStore()
+        self.request_count = 0
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def before_request(self, handler: _Handler) -> bool:
+        """Apply injected latency/errors; returns False if the request was failed."""
+        with self._rng_lock:
+            self.request_count += 1
+            delay = max(0.0, self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            handler._error(500, "Injected failure.")
+            return False
+        return True
+
+    def start(self) -> "FakePocketBase":
+        self._server = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._server.daemon_threads = True
+        self._server.fake = self
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-pocketbase", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-memory PocketBase stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Mean injected latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0.0, help="Uniform +/- jitter around the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 500")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    server = FakePocketBase(args.host, args.port, args.latency_ms, args.jitter_ms, args.error_rate, args.seed)
+    server.start()
+    print(f"Fake PocketBase listening on {server.url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
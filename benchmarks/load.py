@@ -0,0 +1,220 @@
+"""
+Load-test runner.
+
+Starts the in-memory PocketBase stand-in, seeds it with synthetic user
+histories, serves the API with uvicorn on a loopback port and drives the
+scripted scenarios from concurrent virtual users. Prints throughput and
+p50/p95/p99 latency per endpoint and stores the run as JSON so results can be
+compared across commits.
+
+    python -m benchmarks.load --users 20 --years 2 --concurrency 8 --duration 30
+    python -m benchmarks.load --scenarios app_launch,stats_dashboard --pb-latency-ms 2
+    python -m benchmarks.load --compare benchmarks/results/a.json benchmarks/results/b.json
+"""
+
+import argparse
+import datetime
+import json
+import os
+import random
+import socket
+import statistics
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from .datagen import fake_token, generate_users
+from .fake_pocketbase import FakePocketBase
+from .scenarios import SCENARIOS, ApiClient, Recorder
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return "unknown"
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(recorder: Recorder, elapsed: float) -> Dict[str, dict]:
+    summary = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        ordered = sorted(s * 1000 for s in samples)
+        summary[endpoint] = {
+            "count": len(ordered),
+            "errors": recorder.errors.get(endpoint, 0),
+            "rps": round(len(ordered) / elapsed, 2),
+            "mean_ms": round(statistics.mean(ordered), 3),
+            "p50_ms": round(_percentile(ordered, 50), 3),
+            "p95_ms": round(_percentile(ordered, 95), 3),
+            "p99_ms": round(_percentile(ordered, 99), 3),
+            "max_ms": round(ordered[-1], 3),
+        }
+    return summary
+
+
+def print_summary(summary: Dict[str, dict], elapsed: float):
+    total = sum(s["count"] for s in summary.values())
+    errors = sum(s["errors"] for s in summary.values())
+    print(f"\n{'endpoint':<48} {'count':>7} {'err':>5} {'rps':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    for endpoint, s in summary.items():
+        print(f"{endpoint:<48} {s['count']:>7} {s['errors']:>5} {s['rps']:>8.1f} "
+              f"{s['p50_ms']:>8.2f}ms {s['p95_ms']:>8.2f}ms {s['p99_ms']:>8.2f}ms")
+    print(f"\n{total} requests, {errors} errors in {elapsed:.1f}s -> {total / elapsed:.1f} req/s")
+
+
+def start_api(pocketbase_url: str, port: int):
+    """Serve index:app in a background thread, pointed at `pocketbase_url`."""
+    os.environ["POCKETBASE_URL"] = pocketbase_url
+    import uvicorn
+
+    config = uvicorn.Config("index:app", host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, name="api", daemon=True)
+    thread.start()
+    deadline = time.time() + 30
+    while not server.started:
+        if time.time() > deadline:
+            raise RuntimeError("API server did not start")
+        time.sleep(0.05)
+    return server
+
+
+def seed(fake: FakePocketBase, users: Dict[str, dict]) -> List[dict]:
+    """Load histories into the fake and return per-user handles for the scenarios."""
+    handles = []
+    for user_id, history in users.items():
+        for collection, records in history.items():
+            fake.store.load(collection, records)
+        handles.append({
+            "user_id": user_id,
+            "token": fake_token(user_id),
+            "template_ids": [t["id"] for t in history["workout_templates"]],
+            "exercise_ids": sorted({log["exercise_library_id"] for log in history["exercise_logs"]}),
+        })
+    return handles
+
+
+def run_load(api_url: str, users: List[dict], scenarios: List[str], concurrency: int,
+             duration: float, iterations: int, seed_value: int) -> (Recorder, float):
+    recorder = Recorder()
+    deadline = time.time() + duration if duration else None
+
+    def virtual_user(worker: int):
+        rng = random.Random(seed_value * 1000 + worker)
+        # One active workout per user at a time, so pin each worker to its own users
+        mine = users[worker::concurrency] or users
+        done = 0
+        while (deadline and time.time() < deadline) or (not deadline and done < iterations):
+            user = rng.choice(mine)
+            client = ApiClient(api_url, user["token"], recorder, rng)
+            SCENARIOS[rng.choice(scenarios)](client, user)
+            done += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(virtual_user, range(concurrency)))
+    return recorder, time.perf_counter() - start
+
+
+def compare(before_path: str, after_path: str):
+    with open(before_path) as f:
+        before = json.load(f)
+    with open(after_path) as f:
+        after = json.load(f)
+    print(f"{'endpoint':<48} {'p50 before':>11} {'p50 after':>11} {'p95 before':>11} {'p95 after':>11} {'Δp95':>8}")
+    for endpoint in sorted(set(before["endpoints"]) | set(after["endpoints"])):
+        b = before["endpoints"].get(endpoint)
+        a = after["endpoints"].get(endpoint)
+        if not a or not b:
+            print(f"{endpoint:<48} {'only in ' + ('before' if b else 'after'):>11}")
+            continue
+        delta = (a["p95_ms"] - b["p95_ms"]) / b["p95_ms"] * 100 if b["p95_ms"] else 0.0
+        print(f"{endpoint:<48} {b['p50_ms']:>10.2f}ms {a['p50_ms']:>10.2f}ms "
+              f"{b['p95_ms']:>10.2f}ms {a['p95_ms']:>10.2f}ms {delta:>+7.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="API load test against a local PocketBase stand-in")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--years", type=float, default=1.0, help="Years of history per synthetic user")
+    parser.add_argument("--sessions-per-week", type=float, default=3.0)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Comma-separated scenario names")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to run (0 to use --iterations)")
+    parser.add_argument("--iterations", type=int, default=50, help="Scenarios per virtual user when --duration 0")
+    parser.add_argument("--pb-latency-ms", type=float, default=0.0)
+    parser.add_argument("--pb-jitter-ms", type=float, default=0.0)
+    parser.add_argument("--pb-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--rate-limits", default="off",
+                        help="RATE_LIMITS for the API; virtual users have no think time, so off by default")
+    parser.add_argument("--output", help="Result file (default: benchmarks/results/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="Compare two result files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown scenarios: {', '.join(unknown)}")
+
+    fake = FakePocketBase(latency_ms=args.pb_latency_ms, jitter_ms=args.pb_jitter_ms,
+                          error_rate=args.pb_error_rate, seed=args.seed).start()
+    histories = generate_users(args.users, seed=args.seed, years=args.years,
+                               sessions_per_week=args.sessions_per_week)
+    users = seed(fake, histories)
+    rows = sum(len(records) for history in histories.values() for records in history.values())
+    print(f"Seeded {args.users} users / {rows} records into fake PocketBase at {fake.url}")
+
+    api_port = _free_port()
+    os.environ["RATE_LIMITS"] = args.rate_limits
+    server = start_api(fake.url, api_port)
+    try:
+        recorder, elapsed = run_load(f"http://127.0.0.1:{api_port}", users, scenarios, args.concurrency,
+                                     args.duration, args.iterations, args.seed)
+    finally:
+        server.should_exit = True
+        fake.stop()
+
+    summary = summarize(recorder, elapsed)
+    print_summary(summary, elapsed)
+
+    result = {
+        "commit": _git_commit(),
+        "timestamp": datetime.datetime.utcnow().isoformat() + "Z",
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "seeded_records": rows,
+        "backend_requests": fake.request_count,
+        "elapsed_seconds": round(elapsed, 3),
+        "endpoints": summary,
+    }
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.datetime.utcnow():%Y%m%d-%H%M%S}-{result['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(result, f, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+Micro-benchmarks for the pure-Python hot paths the routes call.
+
+Each case builds its input from a fixed seed at a given size, then reports
+throughput (calls/sec over a minimum wall time) and, from one traced call,
+peak traced memory and the number of allocated blocks the result still
+holds when the call returns (tracemalloc).
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --sizes 100,10000 --only weekly_volume,finish_prs
+    python -m benchmarks.micro --json /tmp/micro.json
+"""
+
+import argparse
+import base64
+import datetime
+import json
+import random
+import time
+import tracemalloc
+from typing import Callable, Dict, Tuple
+
+from api.auth.auth_handler import decode_token_payload
+from api.data.exercise_seed import SEED_EXERCISES
+from api.services.workouts import (
+    add_logs, empty_pr, filter_exercises, filter_sessions, group_sets_by_exercise,
+    parse_tags, set_volume, weekly_volume,
+)
+
+TODAY = datetime.date(2025, 6, 15)
+_TAGS = ["gym", "weights", "strength", "resistance", "yoga", "cardio", "hiit", "mobility", "core", "stretch"]
+
+
+def _catalog(rng: random.Random, size: int):
+    # The seed list repeated to `size` entries with unique ids, like a large custom library
+    return [{**SEED_EXERCISES[i % len(SEED_EXERCISES)], "id": f"ex{i}"} for i in range(size)]
+
+
+def _sessions(rng: random.Random, size: int):
+    return [
+        {
+            "session_date": (TODAY - datetime.timedelta(days=rng.randint(0, 120))).isoformat(),
+            "total_volume_kg": round(rng.uniform(0, 20000), 1),
+            "workout_type": rng.choice(["gym", "yoga", "hiit"]),
+            "category": rng.choice(["gym", "yoga", "cardio"]),
+            "level": rng.choice(["all", "beginner", "advanced"]),
+            "tags": ",".join(rng.sample(_TAGS, 4)),
+        }
+        for _ in range(size)
+    ]
+
+
+def _completed_sets(rng: random.Random, size: int):
+    exercise_ids = [ex["id"] for ex in SEED_EXERCISES[:max(1, size // 4)]]
+    return [
+        {
+            "id": f"log{i}",
+            "exercise_library_id": rng.choice(exercise_ids),
+            "exercise_name": "x",
+            "sets": 1,
+            "reps": rng.randint(1, 12),
+            "weight_kg": round(rng.uniform(5, 200), 1),
+        }
+        for i in range(size)
+    ]
+
+
+def _tokens(rng: random.Random, size: int):
+    encode = lambda obj: base64.urlsafe_b64encode(json.dumps(obj).encode()).decode().rstrip("=")
+    header = encode({"alg": "HS256", "typ": "JWT"})
+    return [
+        f"{header}.{encode({'id': f'user{rng.getrandbits(48):012x}', 'type': 'authRecord', 'collectionId': '_pb_users_auth_', 'exp': 1900000000 + i})}.sig"
+        for i in range(size)
+    ]
+
+
+def case_exercise_filter(rng, size):
+    catalog = _catalog(rng, size)
+    return lambda: filter_exercises(catalog, "press", None, "dumbbell", None, is_custom=False, created_by=None)
+
+
+def case_session_tags(rng, size):
+    raw = _sessions(rng, size)
+
+    def run():
+        items = [{**s, "tags": parse_tags(s["tags"])} for s in raw]
+        return filter_sessions(items, None, "gym", None, "Strength")
+    return run
+
+
+def case_finish_prs(rng, size):
+    completed = _completed_sets(rng, size)
+
+    def run():
+        total = sum(set_volume(s) for s in completed)
+        prs = [add_logs(empty_pr(), sets) for sets in group_sets_by_exercise(completed).values()]
+        return total, prs
+    return run
+
+
+def case_weekly_volume(rng, size):
+    sessions = _sessions(rng, size)
+    return lambda: weekly_volume(sessions, TODAY)
+
+
+def case_jwt_decode(rng, size):
+    tokens = _tokens(rng, size)
+    return lambda: [decode_token_payload(t) for t in tokens]
+
+
+CASES: Dict[str, Callable[[random.Random, int], Callable]] = {
+    "exercise_filter": case_exercise_filter,
+    "session_tags":    case_session_tags,
+    "finish_prs":      case_finish_prs,
+    "weekly_volume":   case_weekly_volume,
+    "jwt_decode":      case_jwt_decode,
+}
+
+
+def measure(fn: Callable, min_time: float) -> Tuple[float, int, int]:
+    """(calls/sec, peak traced bytes, retained blocks after one call)"""
+    fn()  # warm up
+    calls, start = 0, time.perf_counter()
+    while True:
+        fn()
+        calls += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    del result
+    return calls / elapsed, peak, blocks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for pure hot paths")
+    parser.add_argument("--sizes", default="10,1000,10000", help="Comma-separated input sizes")
+    parser.add_argument("--only", help="Comma-separated case names (default: all)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--min-time", type=float, default=0.5, help="Seconds to time each case/size")
+    parser.add_argument("--json", help="Also write results to this file")
+    args = parser.parse_args()
+
+    names = [n.strip() for n in args.only.split(",")] if args.only else list(CASES)
+    unknown = [n for n in names if n not in CASES]
+    if unknown:
+        parser.error(f"Unknown cases: {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(",")]
+
+    results = []
+    print(f"{'case':<16} {'size':>7} {'ops/sec':>12} {'items/sec':>13} {'peak KiB':>10} {'retained blocks':>16}")
+    for name in names:
+        for size in sizes:
+            fn = CASES[name](random.Random(args.seed), size)
+            ops, peak, blocks = measure(fn, args.min_time)
+            results.append({"case": name, "size": size, "ops_per_sec": round(ops, 2),
+                            "peak_bytes": peak, "retained_blocks": blocks})
+            print(f"{name:<16} {size:>7} {ops:>12.1f} {ops * size:>13.0f} {peak / 1024:>10.1f} {blocks:>16}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"seed": args.seed, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Scripted user journeys for the load runner.
+
+Each scenario takes an ApiClient bound to one synthetic user and issues the
+requests the mobile app makes for that screen. Requests are recorded under
+their route template (e.g. "PUT /api/active-workout/{id}/sets/{id}/") so
+latencies aggregate per endpoint rather than per URL.
+"""
+
+import random
+import threading
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List
+
+import requests
+
+
+class Recorder:
+    """Thread-safe collection of (endpoint, seconds, status) samples."""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, seconds: float, ok: bool):
+        with self._lock:
+            self.samples[endpoint].append(seconds)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class ApiClient:
+    def __init__(self, base_url: str, token: str, recorder: Recorder, rng: random.Random):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        self.session.headers["Authorization"] = f"Bearer {token}"
+        self.recorder = recorder
+        self.rng = rng
+
+    def call(self, method: str, endpoint: str, path: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = self.session.request(method, self.base_url + path, timeout=30, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        self.recorder.record(f"{method} {endpoint}", time.perf_counter() - start, ok)
+        if response is not None and ok and response.content:
+            try:
+                return response.json()
+            except ValueError:
+                return None
+        return None
+
+
+def app_launch(client: ApiClient, user: dict):
+    """Home screen: resume an in-progress workout, templates, library, PRs, headline stats."""
+    client.call("GET", "/api/active-workout/current/", "/api/active-workout/current/")
+    client.call("GET", "/api/templates/", "/api/templates/")
+    client.call("GET", "/api/exercise-library/", "/api/exercise-library/")
+    client.call("GET", "/api/personal-records/", "/api/personal-records/")
+    client.call("GET", "/api/stats/overview/", "/api/stats/overview/")
+
+
+def live_workout(client: ApiClient, user: dict, finish: bool = False):
+    """Start from a template, tick through every set, optionally finish."""
+    template_id = client.rng.choice(user["template_ids"]) if user["template_ids"] else None
+    session = client.call("POST", "/api/active-workout/", "/api/active-workout/",
+                          json={"workout_name": "Load test", "template_id": template_id})
+    if not session:
+        return
+    session_id = session["id"]
+    current = client.call("GET", "/api/active-workout/{id}/", f"/api/active-workout/{session_id}/") or {}
+    for s in current.get("sets", []):
+        client.call("PUT", "/api/active-workout/{id}/sets/{id}/", f"/api/active-workout/{session_id}/sets/{s['id']}/",
+                    json={"reps": s.get("reps") or 8, "weight_kg": s.get("weight_kg") or 20, "is_completed": True})
+    client.call("POST", "/api/active-workout/{id}/sets/", f"/api/active-workout/{session_id}/sets/",
+                json={"exercise_library_id": "plank", "exercise_name": "Plank", "set_number": 1,
+                      "reps": 1, "weight_kg": 0, "is_completed": True})
+    client.call("GET", "/api/active-workout/current/", "/api/active-workout/current/")
+    if finish:
+        client.call("POST", "/api/active-workout/{id}/finish/", f"/api/active-workout/{session_id}/finish/")
+    else:
+        client.call("DELETE", "/api/active-workout/{id}/", f"/api/active-workout/{session_id}/")
+
+
+def finish_workout(client: ApiClient, user: dict):
+    live_workout(client, user, finish=True)
+
+
+def stats_dashboard(client: ApiClient, user: dict):
+    """Progress tab: overview, weekly volume, history and one exercise chart."""
+    client.call("GET", "/api/stats/overview/", "/api/stats/overview/")
+    client.call("GET", "/api/stats/weekly/", "/api/stats/weekly/")
+    client.call("GET", "/api/workout-sessions/", "/api/workout-sessions/")
+    client.call("GET", "/api/measurements/", "/api/measurements/")
+    if user["exercise_ids"]:
+        exercise_id = client.rng.choice(user["exercise_ids"])
+        client.call("GET", "/api/exercise-logs/chart/", "/api/exercise-logs/chart/",
+                    params={"exercise_id": exercise_id})
+        client.call("GET", "/api/personal-records/{id}/", f"/api/personal-records/{exercise_id}/")
+
+
+SCENARIOS: Dict[str, Callable[[ApiClient, dict], None]] = {
+    "app_launch": app_launch,
+    "live_workout": live_workout,
+    "finish_workout": finish_workout,
+    "stats_dashboard": stats_dashboard,
+}
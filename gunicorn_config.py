@@ -1,3 +1,17 @@
-workers = 4
-worker_class = "uvicorn.workers.UvicornWorker"
-bind = "0.0.0.0:$PORT"
\ No newline at end of file
+# gunicorn -c gunicorn_config.py index:app
+# Settings are computed in api/config/server.py (workers from CPU/memory, uvloop/httptools, preload).
+from api.config.server import gunicorn_settings, report
+
+_settings = gunicorn_settings()
+_detected = _settings.pop("_detected")
+globals().update(_settings)
+
+
+def on_starting(server):
+    # Start each server run with empty per-worker metrics files
+    from api.observability.metrics import registry
+    registry.clear()
+
+
+def when_ready(server):
+    print(report({**_settings, "_detected": _detected}))
@@ -1,3 +1,4 @@
+import time
 from fastapi import FastAPI
 from api.routes import route
 from api.routes import logs
@@ -7,10 +8,20 @@ from api.routes import exercise_library
 from api.routes import templates
 from api.routes import active_workout
 from api.routes import personal_records
+from api.routes import observability
+from api.config import compression, ratelimit
+from api.config.database import request_scope
+from api.services import images
+from api.observability import metrics, profiler, tracing
+from api.auth.admin import is_admin
 from fastapi.middleware.cors import CORSMiddleware
 
 app = FastAPI()
 
+# Refuse oversized image uploads before the form parser spools them to disk. Added first, so
+# it sits innermost: its 413 is raised in the route's own body read, under the other middleware
+app.add_middleware(images.UploadSizeLimit)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -26,6 +37,53 @@ app.add_middleware(
 
 )
 
+# Memoize identical PocketBase reads for the lifetime of each request
+@app.middleware("http")
+async def pocketbase_request_scope(request, call_next):
+    with request_scope():
+        return await call_next(request)
+
+# Span per request plus one per table operation. Admins can force a trace with
+# X-Trace: 1 or start the sampling profiler on this worker with X-Profile: <seconds>
+@app.middleware("http")
+async def trace_requests(request, call_next):
+    admin = "x-admin-token" in request.headers and is_admin(request.headers["x-admin-token"])
+    if admin and request.headers.get("x-profile"):
+        profiler.start_from_header(request.headers["x-profile"])
+    force = admin and request.headers.get("x-trace") == "1"
+    reset_token = tracing.begin_trace(request.method, request.url.path, force=force)
+    trace_id = tracing.current_trace_id()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        if force:
+            response.headers["X-Trace-Id"] = trace_id
+        return response
+    finally:
+        tracing.end_trace(reset_token, metrics.route_template(request.scope), status)
+
+# gzip/brotli for JSON responses over COMPRESS_MIN_BYTES, level chosen per route class
+app.add_middleware(compression.CompressionMiddleware)
+
+# Shed new API requests while PocketBase already has too many calls in flight (across all
+# workers); health, metrics and debug endpoints stay reachable to diagnose the overload
+app.add_middleware(ratelimit.AdmissionControl, prefix="/api/")
+
+# Per-route latency/status and backend calls per request; registered last so it wraps everything
+@app.middleware("http")
+async def record_metrics(request, call_next):
+    start = time.perf_counter()
+    reset_token = metrics.begin_request(request.scope)
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.end_request(reset_token, metrics.route_template(request.scope), request.method, status,
+                            time.perf_counter() - start)
+
 app.include_router(route.router, prefix="/api")
 app.include_router(logs.router, prefix="/api")
 app.include_router(measurements.router, prefix="/api")
@@ -34,6 +92,7 @@ app.include_router(exercise_library.router, prefix="/api")
 app.include_router(templates.router, prefix="/api")
 app.include_router(active_workout.router, prefix="/api")
 app.include_router(personal_records.router, prefix="/api")
+app.include_router(observability.router)
 
 @app.get("/health")
 async def health_check():
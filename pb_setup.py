@@ -1,30 +1,46 @@
 #!/usr/bin/env python3
 """
-PocketBase Collection Setup Script - FIXED VERSION
+PocketBase Collection Setup Script - declarative migrator
+
+Collections, fields and indexes are declared in api/config/schema.py. For each
+one this script creates the collection if it is missing, otherwise it diffs
+the live definition and PATCHes in only the missing fields and indexes, and
+the API rules where they differ from schema.api_rules. Fields are never
+dropped, and an index is only redefined when its declared uniqueness changed,
+so it is safe to run repeatedly.
+
+Child collections (sections, exercise, template_exercises, active_session_sets)
+now carry their own user_id. Run once with --backfill-owners after upgrading:
+their owner-only rules hide rows whose user_id is still blank.
+
+The personal_records (user_id, exercise_library_id) index is now unique.
+PocketBase refuses it while duplicate rows exist, so run once with
+--merge-duplicate-records first; it rebuilds each such pair from its logs.
+Exercises logged before records were kept per row get theirs with
+--backfill-personal-records (otherwise each is built on its first lookup).
 """
 
+import re
 import requests
 import argparse
 import sys
 
+from api.config.schema import COLLECTIONS, api_rules, index_name, index_sql, to_pocketbase
+from api.data.catalog import seed_exercise_name
+from api.services.personal_records import from_logs
+from api.services.workouts import parse_tags
+
 PB_URL = "http://127.0.0.1:8090"
 
-# Your collections (same as before)
-COLLECTIONS = [
-    {
-        "name": "workout_templates",
-        "type": "base",
-        "schema": [
-            {"name": "user_id",                "type": "text",   "required": True},
-            {"name": "name",                   "type": "text",   "required": True},
-            {"name": "workout_type",           "type": "text",   "required": False},
-            {"name": "estimated_duration_min", "type": "number", "required": False},
-            {"name": "difficulty",             "type": "text",   "required": False},
-            {"name": "description",            "type": "text",   "required": False},
-            {"name": "last_used_at",           "type": "text",   "required": False},
-        ]
-    },
-    # ... (add all other collections from your original script)
+_INDEX_NAME_RE = re.compile(r"INDEX\s+(?:IF\s+NOT\s+EXISTS\s+)?[`\"\[]?(\w+)", re.IGNORECASE)
+_UNIQUE_RE = re.compile(r"^\s*CREATE\s+UNIQUE\s", re.IGNORECASE)
+
+# (collection, parent link field, parent collection) in backfill order: a parent is filled before its children
+OWNER_LINKS = [
+    ("sections", "folder_id", "folders"),
+    ("exercise", "section_id", "sections"),
+    ("template_exercises", "template_id", "workout_templates"),
+    ("active_session_sets", "session_id", "active_workout_sessions"),
 ]
 
 def login_as_admin(email, password):
@@ -34,10 +50,10 @@ def login_as_admin(email, password):
         "identity": email,
         "password": password
     }
-    
+
     print(f"Logging in as admin at {login_url}...")
     response = requests.post(login_url, json=login_data)
-    
+
     if response.status_code == 200:
         token = response.json().get("token")
         print("✅ Admin login successful")
@@ -47,17 +63,27 @@ def login_as_admin(email, password):
         print(response.text)
         sys.exit(1)
 
-def create_collection(token, collection):
-    """Create a single collection"""
-    url = f"{PB_URL}/api/collections"
-    headers = {
+def _headers(token):
+    return {
         "Authorization": f"Bearer {token}",
         "Content-Type": "application/json"
     }
-    
+
+def fetch_collection(token, name):
+    """Return the live collection definition, or None if it does not exist"""
+    response = requests.get(f"{PB_URL}/api/collections/{name}", headers=_headers(token))
+    if response.status_code == 404:
+        return None
+    response.raise_for_status()
+    return response.json()
+
+def create_collection(token, collection):
+    """Create a single collection"""
+    url = f"{PB_URL}/api/collections"
+
     print(f"Creating collection '{collection['name']}'...")
-    response = requests.post(url, json=collection, headers=headers)
-    
+    response = requests.post(url, json=to_pocketbase(collection), headers=_headers(token))
+
     if response.status_code in [200, 201]:
         print(f"✅ Created '{collection['name']}'")
         return True
@@ -66,20 +92,208 @@ def create_collection(token, collection):
         print(response.text)
         return False
 
+def _index_of(sql):
+    match = _INDEX_NAME_RE.search(sql)
+    return match.group(1) if match else None
+
+def diff_collection(live, collection):
+    """Fields and index definitions declared in the schema but missing from `live` (or, for an index,
+    differing in uniqueness), and the rules that differ"""
+    live_fields = {f["name"] for f in live.get("schema", [])}
+    missing_fields = [f for f in collection["schema"] if f["name"] not in live_fields]
+
+    live_indexes = {_index_of(sql): sql for sql in live.get("indexes", [])}
+    missing_indexes = []
+    for spec in collection["indexes"]:
+        live_sql = live_indexes.get(index_name(collection["name"], spec))
+        if live_sql is None or bool(_UNIQUE_RE.match(live_sql)) != spec["unique"]:
+            missing_indexes.append(index_sql(collection["name"], spec))
+    changed_rules = {k: v for k, v in api_rules(collection).items() if live.get(k) != v}
+    return missing_fields, missing_indexes, changed_rules
+
+def migrate_collection(token, collection, dry_run=False):
+    """Create or extend one collection; returns True if it is now up to date"""
+    live = fetch_collection(token, collection["name"])
+    if live is None:
+        if dry_run:
+            print(f"➕ Would create '{collection['name']}'")
+            return True
+        return create_collection(token, collection)
+
+    missing_fields, missing_indexes, changed_rules = diff_collection(live, collection)
+    if not missing_fields and not missing_indexes and not changed_rules:
+        print(f"✔️  '{collection['name']}' is up to date")
+        return True
+
+    for field in missing_fields:
+        print(f"   + field {collection['name']}.{field['name']} ({field['type']})")
+    for sql in missing_indexes:
+        print(f"   + {sql}")
+    for rule, value in changed_rules.items():
+        print(f"   ~ {rule}: {live.get(rule)!r} -> {value!r}")
+    if dry_run:
+        return True
+
+    # Send the full lists back: PocketBase replaces schema/indexes wholesale on PATCH.
+    # A same-named live index is replaced by its new definition.
+    replaced = {_index_of(sql) for sql in missing_indexes}
+    kept_indexes = [sql for sql in live.get("indexes", []) if _index_of(sql) not in replaced]
+    payload = {
+        "schema": live.get("schema", []) + missing_fields,
+        "indexes": kept_indexes + missing_indexes,
+        **changed_rules,
+    }
+    response = requests.patch(f"{PB_URL}/api/collections/{live['id']}", json=payload, headers=_headers(token))
+    if response.status_code == 200:
+        print(f"✅ Updated '{collection['name']}'")
+        return True
+    print(f"❌ Failed to update '{collection['name']}': {response.status_code}")
+    print(response.text)
+    return False
+
+def fetch_all(token, collection, fields):
+    """Every record of a collection, page by page"""
+    items, page = [], 1
+    while True:
+        response = requests.get(f"{PB_URL}/api/collections/{collection}/records", headers=_headers(token),
+                                params={"page": page, "perPage": 500, "fields": fields})
+        response.raise_for_status()
+        data = response.json()
+        items.extend(data.get("items", []))
+        if page >= data.get("totalPages", 1):
+            return items
+        page += 1
+
+def backfill_session_tags(token, dry_run=False):
+    """Create the session_tags rows for sessions saved before tags had their own collection"""
+    existing = {(r["session_id"], r["tag"]) for r in fetch_all(token, "session_tags", "session_id,tag")}
+    missing = []
+    for session in fetch_all(token, "workout_sessions", "id,user_id,tags"):
+        for tag in dict.fromkeys(t.strip().lower() for t in parse_tags(session.get("tags")) if t.strip()):
+            if (session["id"], tag) not in existing:
+                missing.append({"user_id": session["user_id"], "session_id": session["id"], "tag": tag})
+
+    print(f"🏷️  {len(missing)} session tag rows missing")
+    if dry_run:
+        return True
+    failed = 0
+    for row in missing:
+        response = requests.post(f"{PB_URL}/api/collections/session_tags/records", json=row, headers=_headers(token))
+        if response.status_code not in [200, 201]:
+            failed += 1
+            print(f"❌ Failed tag '{row['tag']}' for session {row['session_id']}: {response.status_code}")
+    print(f"✅ Created {len(missing) - failed}/{len(missing)} session tag rows")
+    return failed == 0
+
+def backfill_owners(token, dry_run=False):
+    """Copy user_id from the parent record onto child records created before they had one"""
+    failed = 0
+    for collection, link, parent in OWNER_LINKS:
+        owners = {r["id"]: r.get("user_id", "") for r in fetch_all(token, parent, "id,user_id")}
+        missing = [r for r in fetch_all(token, collection, f"id,user_id,{link}")
+                   if not r.get("user_id") and owners.get(r.get(link))]
+        print(f"👤 {len(missing)} {collection} rows without an owner")
+        if dry_run:
+            continue
+        for row in missing:
+            response = requests.patch(f"{PB_URL}/api/collections/{collection}/records/{row['id']}",
+                                      json={"user_id": owners[row[link]]}, headers=_headers(token))
+            if response.status_code != 200:
+                failed += 1
+                print(f"❌ Failed owner for {collection} {row['id']}: {response.status_code}")
+    return failed == 0
+
+def merge_duplicate_records(token, dry_run=False):
+    """Collapse personal_records rows that repeat a (user, exercise) into one rebuilt from the logs"""
+    groups = {}
+    for row in fetch_all(token, "personal_records", "id,user_id,exercise_library_id,exercise_name,achieved_at"):
+        groups.setdefault((row["user_id"], row["exercise_library_id"]), []).append(row)
+    duplicated = {key: rows for key, rows in groups.items() if len(rows) > 1}
+    print(f"🏆 {len(duplicated)} exercises with duplicate personal record rows")
+    if dry_run or not duplicated:
+        return True
+
+    logs = {}
+    for log in fetch_all(token, "exercise_logs", "id,user_id,exercise_id,sets,reps,weight_kg,session_id"):
+        logs.setdefault((log["user_id"], log["exercise_id"]), []).append(log)
+    failed = 0
+    for key, rows in duplicated.items():
+        fields = {**from_logs(logs.get(key, [])),
+                  "exercise_name": next((r["exercise_name"] for r in rows if r.get("exercise_name")), ""),
+                  "achieved_at": max(r.get("achieved_at") or "" for r in rows)}
+        response = requests.patch(f"{PB_URL}/api/collections/personal_records/records/{rows[0]['id']}",
+                                  json=fields, headers=_headers(token))
+        if response.status_code != 200:
+            failed += 1
+            print(f"❌ Failed to merge records for {key}: {response.status_code}")
+            continue
+        for row in rows[1:]:
+            requests.delete(f"{PB_URL}/api/collections/personal_records/records/{row['id']}", headers=_headers(token))
+    print(f"✅ Merged {len(duplicated) - failed}/{len(duplicated)} duplicated personal records")
+    return failed == 0
+
+def backfill_personal_records(token, dry_run=False):
+    """Create the personal_records row of every (user, exercise) that has logs but no row"""
+    existing = {(r["user_id"], r["exercise_library_id"])
+                for r in fetch_all(token, "personal_records", "user_id,exercise_library_id")}
+    logs = {}
+    for log in fetch_all(token, "exercise_logs", "id,user_id,exercise_id,sets,reps,weight_kg,session_id"):
+        if log.get("exercise_id"):
+            logs.setdefault((log["user_id"], log["exercise_id"]), []).append(log)
+    missing = [key for key in logs if key not in existing]
+
+    print(f"🏆 {len(missing)} personal record rows missing")
+    if dry_run:
+        return True
+    failed = 0
+    for user_id, exercise_id in missing:
+        row = {"user_id": user_id, "exercise_library_id": exercise_id,
+               "exercise_name": seed_exercise_name(exercise_id) or "",
+               **from_logs(logs[(user_id, exercise_id)]), "achieved_at": ""}
+        response = requests.post(f"{PB_URL}/api/collections/personal_records/records", json=row, headers=_headers(token))
+        if response.status_code not in [200, 201]:
+            failed += 1
+            print(f"❌ Failed records for {exercise_id} of {user_id}: {response.status_code}")
+    print(f"✅ Created {len(missing) - failed}/{len(missing)} personal record rows")
+    return failed == 0
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="PocketBase Collection Setup")
     parser.add_argument("--email", required=True, help="Admin email")
     parser.add_argument("--password", required=True, help="Admin password")
+    parser.add_argument("--url", default=PB_URL, help="PocketBase base URL")
+    parser.add_argument("--dry-run", action="store_true", help="Print the plan without applying it")
+    parser.add_argument("--backfill-session-tags", action="store_true",
+                        help="Also create session_tags rows for sessions that have none")
+    parser.add_argument("--backfill-owners", action="store_true",
+                        help="Also fill user_id on sections, exercises, template exercises and active sets")
+    parser.add_argument("--merge-duplicate-records", action="store_true",
+                        help="First merge duplicate personal_records rows so their index can become unique")
+    parser.add_argument("--backfill-personal-records", action="store_true",
+                        help="Also create personal_records rows for exercises logged before they were kept")
     args = parser.parse_args()
-    
+    PB_URL = args.url.rstrip("/")
+
     # Login first
     token = login_as_admin(args.email, args.password)
-    
-    # Create all collections
+
+    if args.merge_duplicate_records:
+        merge_duplicate_records(token, dry_run=args.dry_run)
+
+    # Create or extend all collections
     success_count = 0
     for collection in COLLECTIONS:
-        if create_collection(token, collection):
+        if migrate_collection(token, collection, dry_run=args.dry_run):
             success_count += 1
-    
-    print(f"\n✅ Done! Created {success_count}/{len(COLLECTIONS)} collections.")
-    print("Restart your FastAPI server to use the new endpoints.")
\ No newline at end of file
+
+    if args.backfill_owners:
+        backfill_owners(token, dry_run=args.dry_run)
+
+    if args.backfill_session_tags:
+        backfill_session_tags(token, dry_run=args.dry_run)
+
+    if args.backfill_personal_records:
+        backfill_personal_records(token, dry_run=args.dry_run)
+
+    print(f"\n✅ Done! {success_count}/{len(COLLECTIONS)} collections up to date.")
+    print("Restart your FastAPI server to use the new endpoints.")